@@ -0,0 +1 @@
+python3 src/build_daemon.py "$@"
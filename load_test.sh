@@ -0,0 +1 @@
+python3 src/load_test.py "$@"
@@ -0,0 +1 @@
+python3 src/static_server.py "$@"
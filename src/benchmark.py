@@ -0,0 +1,278 @@
+"""Micro-benchmarks for each parsing and rendering stage, run with ./bench.sh"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import time
+
+from block_handling import (
+    markdown_to_text_blocks,
+    block_to_block_type,
+    block_to_html_node,
+    BlockType,
+)
+from filesystem import MemoryFileSystem
+from htmlnode import ParentNode
+import template
+from template import convert_markdown_to_html, generate_page
+from textnode import text_to_textnodes
+
+WORDS = (
+    "the ring elves dwarves hobbits shire mordor gondor rohan wizard journey "
+    "mountain river forest tower king council fellowship road home shadow"
+).split()
+CORPUS_KINDS = ("link_heavy", "list_heavy", "code_heavy", "long_paragraphs", "mixed")
+
+
+def generate_corpus(kind, size, seed=0):
+    """Returns roughly size characters of valid markdown of the given kind"""
+    rng = random.Random(seed)
+    makers = {
+        "link_heavy": lambda: link_heavy_block(rng),
+        "list_heavy": lambda: list_block(rng),
+        "code_heavy": lambda: code_block(rng),
+        "long_paragraphs": lambda: paragraph_block(rng, 200),
+        "mixed": lambda: mixed_block(rng),
+    }
+    if kind not in makers:
+        raise ValueError(f"Unknown corpus kind: {kind}")
+    blocks = ["# Benchmark"]
+    length = len(blocks[0])
+    while length < size:
+        block = makers[kind]()
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def inline_text(rng, count):
+    """Words with the occasional bold, italic, code, link or image span"""
+    parts = []
+    for _ in range(count):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f"**{word}**"
+        elif roll < 0.1:
+            word = f"*{word}*"
+        elif roll < 0.13:
+            word = f"`{word}`"
+        elif roll < 0.16:
+            word = f"[{word}](/{word})"
+        elif roll < 0.17:
+            word = f"![{word}](/images/{word}.png)"
+        parts.append(word)
+    return " ".join(parts)
+
+
+def link_heavy_block(rng):
+    links = [f"[{words(rng, 2)}](/{rng.choice(WORDS)}/{i})" for i in range(40)]
+    return " and ".join(links)
+
+
+def list_block(rng):
+    count = rng.randint(3, 20)
+    if rng.random() < 0.5:
+        return "\n".join(f"{i}. {inline_text(rng, 8)}" for i in range(1, count + 1))
+    return "\n".join(f"{rng.choice('*-')} {inline_text(rng, 8)}" for _ in range(count))
+
+
+def code_block(rng):
+    lines = [f"    {words(rng, 6)}();" for _ in range(rng.randint(3, 30))]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def paragraph_block(rng, count):
+    return inline_text(rng, count)
+
+
+def mixed_block(rng):
+    roll = rng.random()
+    if roll < 0.1:
+        return f"{'#' * rng.randint(2, 6)} {words(rng, 4)}"
+    if roll < 0.2:
+        return "\n".join(f"> {inline_text(rng, 10)}" for _ in range(rng.randint(1, 4)))
+    if roll < 0.4:
+        return list_block(rng)
+    if roll < 0.5:
+        return code_block(rng)
+    return paragraph_block(rng, rng.randint(20, 120))
+
+
+def inline_texts(blocks):
+    """Returns the text of each paragraph and list item, as handed to text_to_textnodes"""
+    texts = []
+    for block in blocks:
+        block_type = block_to_block_type(block)
+        if block_type == BlockType.PARAGRAPH:
+            texts.append(block)
+        elif block_type == BlockType.UNORDERED_LIST:
+            texts.extend(line[2:] for line in block.split("\n"))
+        elif block_type == BlockType.ORDERED_LIST:
+            texts.extend(line[line.index(". ") + 2 :] for line in block.split("\n"))
+    return texts
+
+
+def stage_benchmarks(markdown):
+    """Returns (name, function, ops, bytes) for each stage, prepared so only that stage is timed"""
+    blocks = markdown_to_text_blocks(markdown)
+    texts = inline_texts(blocks)
+    node = ParentNode("div", [block_to_html_node(block) for block in blocks])
+    markdown_bytes = len(markdown.encode())
+    blocks_bytes = sum(len(block.encode()) for block in blocks)
+    texts_bytes = sum(len(text.encode()) for text in texts)
+    # The whole page build, read to write, without the disk's share of the time
+    fs = MemoryFileSystem(
+        {
+            "/site/content/index.md": markdown,
+            "/site/template.html": "<title>{{ Title }}</title>{{ Content }}",
+        }
+    )
+    return [
+        (
+            "markdown_to_text_blocks",
+            lambda: markdown_to_text_blocks(markdown),
+            1,
+            markdown_bytes,
+        ),
+        (
+            "block_to_block_type",
+            lambda: [block_to_block_type(block) for block in blocks],
+            len(blocks),
+            blocks_bytes,
+        ),
+        (
+            "text_to_textnodes",
+            lambda: [text_to_textnodes(text) for text in texts],
+            len(texts),
+            texts_bytes,
+        ),
+        (
+            "block_to_html_node",
+            lambda: [block_to_html_node(block) for block in blocks],
+            len(blocks),
+            blocks_bytes,
+        ),
+        ("ParentNode.to_html", node.to_html, 1, len(node.to_html().encode())),
+        (
+            "convert_markdown_to_html",
+            lambda: convert_markdown_to_html(markdown),
+            1,
+            markdown_bytes,
+        ),
+        (
+            "generate_page_in_memory",
+            lambda: generate_page_quietly(fs),
+            1,
+            markdown_bytes,
+        ),
+    ]
+
+
+def generate_page_quietly(fs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_page(
+            "/site/content/index.md",
+            "/site/template.html",
+            "/site/public/index.html",
+            fs=fs,
+        )
+    return None
+
+
+def measure(function, repeat, warmup):
+    """Returns the per-run times of function after warmup runs"""
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(kinds, size, repeat=5, warmup=1, stages=None):
+    """Times every stage with the block cache off, so repeated runs convert every block again"""
+    cache_size = template.block_cache_size()
+    template.set_block_cache_size(0)
+    try:
+        return run_stages(kinds, size, repeat, warmup, stages)
+    finally:
+        template.set_block_cache_size(cache_size)
+
+
+def run_stages(kinds, size, repeat, warmup, stages):
+    results = []
+    for kind in kinds:
+        markdown = generate_corpus(kind, size)
+        for name, function, ops, size_bytes in stage_benchmarks(markdown):
+            if stages is not None and name not in stages:
+                continue
+            times = measure(function, repeat, warmup)
+            best = min(times)
+            results.append(
+                {
+                    "kind": kind,
+                    "stage": name,
+                    "bytes": size_bytes,
+                    "best_seconds": best,
+                    "median_seconds": statistics.median(times),
+                    "mb_per_second": size_bytes / 1_000_000 / best,
+                    "ops_per_second": ops / best,
+                }
+            )
+    return results
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {(row["kind"], row["stage"]): row for row in baseline}
+    print(f"{'kind':<16} {'stage':<26} {'MB/s':>10} {'ops/s':>12} {'median ms':>10}")
+    for row in results:
+        line = (
+            f"{row['kind']:<16} {row['stage']:<26} {row['mb_per_second']:>10.2f} "
+            f"{row['ops_per_second']:>12.0f} {row['median_seconds'] * 1000:>10.2f}"
+        )
+        old = previous.get((row["kind"], row["stage"]))
+        if old is not None:
+            line += f"  x{row['mb_per_second'] / old['mb_per_second']:.2f}"
+        print(line)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each markdown stage")
+    parser.add_argument("--kind", choices=CORPUS_KINDS, action="append")
+    parser.add_argument("--stage", action="append", help="only run these stages")
+    parser.add_argument("--size", type=int, default=256, help="corpus size in KB")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="show speedups against an earlier --json file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.kind or CORPUS_KINDS, args.size * 1000, args.repeat, args.warmup, args.stage
+    )
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump({"size": args.size * 1000, "results": results}, file, indent=1)
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 import re
+from collections import OrderedDict
 from enum import Enum
 from textnode import TextNode, TextType
 from htmlnode import ParentNode, LeafNode
 
+# Bump when parsing or rendering changes so cached blocks aren't reused
+PARSER_VERSION = 2
+
+SEARCH_TERM_REGEX = re.compile(r"\w\w+")
+# A word in a heading says more about the page than one in its body
+HEADING_TERM_WEIGHT = 5
+
 
 class BlockType(Enum):
     def __str__(self):
@@ -17,133 +25,360 @@ class BlockType(Enum):
 
 
 def markdown_to_text_blocks(markdown):
-    blocks_regex = re.compile(r"(?m)^\s*$")
-    matched_blocks = re.split(blocks_regex, markdown)
-    full_blocks = filter(lambda x: x != "", matched_blocks)
-    blocks = [block.strip() for block in full_blocks]
-    return blocks
+    return ["\n".join(lines) for _, lines in iter_blocks(markdown.split("\n"))]
+
+
+def iter_blocks(lines, fences=True):
+    """Yields (BlockType, lines) for each block, reading the markdown one line at a time."""
+    for _, block_type, block_lines in iter_numbered_blocks(lines, fences):
+        yield block_type, block_lines
+
+
+def iter_numbered_blocks(lines, fences=True):
+    """iter_blocks, with the 1-based line number each block starts on in front"""
+    block = []
+    first_line = 0
+    in_fence = False
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if in_fence:
+            block.append(line)
+            if line.rstrip().endswith("```"):
+                in_fence = False
+            continue
+        if line.strip() == "":
+            if len(block) != 0:
+                yield (first_line, *finish_block(block))
+                block = []
+            continue
+        if len(block) == 0:
+            first_line = line_number
+            if fences and opens_code_fence(line):
+                in_fence = True
+        block.append(line)
+
+    if in_fence:
+        # The fence was never closed, so split on the blank lines it swallowed
+        for line_number, block_type, block_lines in iter_numbered_blocks(
+            block, fences=False
+        ):
+            yield (first_line + line_number - 1, block_type, block_lines)
+        return
+    if len(block) != 0:
+        yield (first_line, *finish_block(block))
+
+
+def opens_code_fence(line):
+    """A fence opens on ``` followed by no other backticks, as is_code_block requires"""
+    stripped = line.strip()
+    return stripped.startswith("```") and "`" not in stripped[3:]
+
+
+def finish_block(lines):
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return (block_lines_to_block_type(lines), lines)
 
 
 def block_to_block_type(text) -> BlockType:
-    if is_block_type_heading(text):
-        return BlockType.HEADING
-    if is_block_type_code(text):
-        return BlockType.CODE
-    if is_block_type_quote(text):
-        return BlockType.QUOTE
-    if is_block_type_unordered_list(text):
-        return BlockType.UNORDERED_LIST
-    if is_block_type_ordered_list(text):
-        return BlockType.ORDERED_LIST
+    return block_lines_to_block_type(text.split("\n"))
+
+
+def block_lines_to_block_type(lines) -> BlockType:
+    """Classifies a block by the first characters of its lines"""
+    first = lines[0]
+    if first.startswith("#"):
+        if len(lines) == 1 and is_heading_line(first):
+            return BlockType.HEADING
+    elif first.startswith("```"):
+        if is_code_block(lines):
+            return BlockType.CODE
+    elif first.startswith(">"):
+        if all(line.startswith(">") for line in lines):
+            return BlockType.QUOTE
+    elif first.startswith("* ") or first.startswith("- "):
+        if all(line.startswith("* ") or line.startswith("- ") for line in lines):
+            return BlockType.UNORDERED_LIST
+    elif first[:1].isdigit():
+        if is_ordered_list(lines):
+            return BlockType.ORDERED_LIST
     return BlockType.PARAGRAPH
 
 
+def is_heading_line(line):
+    hash_count = len(line) - len(line.lstrip("#"))
+    return 1 <= hash_count <= 6 and line[hash_count : hash_count + 1] == " " and len(
+        line
+    ) > hash_count + 1
+
+
+def is_code_block(lines):
+    first = lines[0]
+    last = lines[-1]
+    if len(lines) == 1:
+        return len(first) > 6 and first.endswith("```") and "`" not in first[3:-3]
+    if not last.endswith("```") or "`" in first[3:] or "`" in last[:-3]:
+        return False
+    return all("`" not in line for line in lines[1:-1])
+
+
+def is_ordered_list(lines):
+    for number, line in enumerate(lines, 1):
+        digits = ordered_list_number(line)
+        if digits is None or int(digits) != number:
+            return False
+    return True
+
+
+def ordered_list_number(line):
+    """Returns the digits before the ". " that starts an ordered list line, or None"""
+    digit_count = 0
+    while digit_count < len(line) and line[digit_count] in "0123456789":
+        digit_count += 1
+    if digit_count == 0 or line[digit_count : digit_count + 2] != ". ":
+        return None
+    return line[:digit_count]
+
+
+class BlockCache:
+    """Bounded LRU cache of rendered html fragments, keyed by block text and parser version"""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, block_type, lines, images=None):
+        """Returns the block's html, rendering it only if it isn't cached"""
+        return self.render_fragment(block_type, lines, images)[0]
+
+    def render_fragment(self, block_type, lines, images=None, timer=None):
+        """Returns the block's (html, block_link_targets, block_search_terms), cached when enabled."""
+        start = timer.start() if timer is not None else None
+        context = images.cache_context(lines) if images is not None else None
+        key = (PARSER_VERSION, context, tuple(lines))
+        fragment = self.fragments.get(key)
+        if fragment is not None:
+            self.hits += 1
+            self.fragments.move_to_end(key)
+            if timer is not None:
+                timer.add("inline_parsing", start)
+            return fragment
+
+        self.misses += 1
+        node = block_lines_to_html_node(block_type, lines, images)
+        targets = block_link_targets(node, lines)
+        terms = block_search_terms(node)
+        if timer is not None:
+            start = timer.add("inline_parsing", start)
+        html = node.to_html()
+        if timer is not None:
+            timer.add("rendering", start)
+        fragment = (html, targets, terms)
+        self.fragments[key] = fragment
+        if len(self.fragments) > self.max_size:
+            self.fragments.popitem(last=False)
+            self.evictions += 1
+        return fragment
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.fragments),
+        }
+
+    def merge_stats(self, stats):
+        """Adds counters from a cache in another process"""
+        self.hits += stats["hits"]
+        self.misses += stats["misses"]
+        self.evictions += stats["evictions"]
+        return None
+
+    def clear(self):
+        self.fragments.clear()
+        return None
+
+
+def markdown_lines_to_html_nodes(lines):
+    """Yields an html node per block of the markdown lines"""
+    for block_type, block_lines in iter_blocks(lines):
+        yield block_lines_to_html_node(block_type, block_lines)
+
+
+def block_link_targets(node, lines):
+    """Returns (line offset, tag, url) for every link and image in a block's node."""
+    targets = []
+    # Targets come in order, so each one is at its predecessor's position or later
+    line = 0
+    column = 0
+    stack = [node]
+    while len(stack) != 0:
+        node = stack.pop()
+        if node.children is not None:
+            stack.extend(reversed(node.children))
+            continue
+        if node.tag == "a":
+            url = node.props["href"]
+        elif node.tag == "img":
+            url = node.props["src"]
+        else:
+            continue
+        marker = f"]({url})"
+        for offset in range(line, len(lines)):
+            found = lines[offset].find(marker, column if offset == line else 0)
+            if found != -1:
+                line = offset
+                column = found + len(marker)
+                break
+        targets.append((line, node.tag, url))
+    return tuple(targets)
+
+
+def block_search_terms(node):
+    """Returns {term: count} for the lowercased words of a block's text and image alt text"""
+    terms = {}
+    stack = [node]
+    while len(stack) != 0:
+        node = stack.pop()
+        if node.children is not None:
+            stack.extend(node.children)
+            continue
+        text = node.props["alt"] if node.tag == "img" else node.value
+        for term in SEARCH_TERM_REGEX.findall(text.lower()):
+            terms[term] = terms.get(term, 0) + 1
+    return terms
+
+
+def add_search_terms(terms, block_type, block_terms):
+    """Adds a block's term counts to a page's term weights"""
+    weight = HEADING_TERM_WEIGHT if block_type == BlockType.HEADING else 1
+    for term, count in block_terms.items():
+        terms[term] = terms.get(term, 0) + count * weight
+    return None
+
+
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    lines = block.split("\n")
+    return block_lines_to_html_node(block_lines_to_block_type(lines), lines)
+
+
+def block_lines_to_html_node(block_type, lines, images=None):
+    """images is the page's PageImages when <img> tags get sizes"""
     match block_type:
         case BlockType.PARAGRAPH:
-            return paragraph_to_html_node(block)
+            return paragraph_to_html_node("\n".join(lines), images)
         case BlockType.HEADING:
-            return heading_to_html_node(block)
+            return heading_to_html_node(lines[0], images)
         case BlockType.CODE:
-            return code_to_html_node(block)
+            return code_to_html_node("\n".join(lines))
         case BlockType.QUOTE:
-            return quote_to_html_node(block)
+            return quote_lines_to_html_node(lines, images)
         case BlockType.UNORDERED_LIST:
-            return unordered_list_to_html_node(block)
+            return unordered_list_lines_to_html_node(lines, images)
         case BlockType.ORDERED_LIST:
-            return ordered_list_to_html_node(block)
+            return ordered_list_lines_to_html_node(lines, images)
 
 
-def paragraph_to_html_node(block):
-    return ParentNode("p", TextNode(block, TextType.TEXT).to_html_nodes())
+def paragraph_to_html_node(block, images=None):
+    return ParentNode("p", TextNode(block, TextType.TEXT).to_html_nodes(images))
 
 
-def heading_to_html_node(block):
-    heading_regex = re.compile(r"(^#+ )[^\n]+$")
-    hashes = heading_regex.findall(block)
-    hash_count = hashes[0].count("#")
+def heading_to_html_node(block, images=None):
+    hash_count = len(block) - len(block.lstrip("#"))
     text = block[hash_count + 1 :]
-    return ParentNode(f"h{hash_count}", TextNode(text, TextType.TEXT).to_html_nodes())
+    return ParentNode(
+        f"h{hash_count}", TextNode(text, TextType.TEXT).to_html_nodes(images)
+    )
 
 
 def code_to_html_node(block):
-    code_regex = re.compile(r"^```([^`]+)```$")
-    text = code_regex.findall(block)[0]
+    text = block[3:-3]
     return ParentNode("pre", TextNode(text, TextType.CODE).to_html_nodes())
 
 
 def quote_to_html_node(block):
-    quote_regex = re.compile(r"> ?(.+)")
-    text_list = quote_regex.findall(block)
+    return quote_lines_to_html_node(block.split("\n"))
+
+
+def quote_lines_to_html_node(lines, images=None):
+    text_list = []
+    for line in lines:
+        start = line.find(">")
+        if start == -1:
+            continue
+        text = line[start + 1 :]
+        if len(text) > 1 and text[0] == " ":
+            text = text[1:]
+        if text != "":
+            text_list.append(text)
     text = "\n".join(text_list)
-    return ParentNode("blockquote", TextNode(text, TextType.TEXT).to_html_nodes())
+    return ParentNode(
+        "blockquote", TextNode(text, TextType.TEXT).to_html_nodes(images)
+    )
 
 
 def unordered_list_to_html_node(block):
-    unordered_regex = re.compile(r"[\*-] (.*)\n*")
-    text_list = unordered_regex.findall(block)
+    return unordered_list_lines_to_html_node(block.split("\n"))
+
+
+def unordered_list_lines_to_html_node(lines, images=None):
     list_items = [
-        ParentNode("li", TextNode(text, TextType.TEXT).to_html_nodes())
-        for text in text_list
+        ParentNode("li", TextNode(line[2:], TextType.TEXT).to_html_nodes(images))
+        for line in lines
     ]
     return ParentNode("ul", list_items)
 
 
 def ordered_list_to_html_node(block):
-    unordered_regex = re.compile(r"\d+\. (.*)\n*")
-    text_list = unordered_regex.findall(block)
+    return ordered_list_lines_to_html_node(block.split("\n"))
+
+
+def ordered_list_lines_to_html_node(lines, images=None):
     list_items = [
-        ParentNode("li", TextNode(text, TextType.TEXT).to_html_nodes())
-        for text in text_list
+        ParentNode(
+            "li",
+            TextNode(line[line.index(". ") + 2 :], TextType.TEXT).to_html_nodes(images),
+        )
+        for line in lines
     ]
     return ParentNode("ol", list_items)
 
 
 def is_block_type_heading(text):
     # Headings start with 1-6 # characters, followed by a space and then the heading text.
-    heading_regex = re.compile(r"(^#+ )[^\n]+$")
-    hashes = heading_regex.findall(text)
-    if len(hashes) != 1:
-        return False
-    hash_count = hashes[0].count("#")
-    if hash_count <= 0 or hash_count > 6:
-        return False
-    return True
+    line = text[:-1] if text.endswith("\n") else text
+    return "\n" not in line and is_heading_line(line)
 
 
 def is_block_type_code(text):
     # Code blocks must start with 3 backticks and end with 3 backticks.
-    code_regex = re.compile(r"^```[^`]+```$")
-    match = code_regex.fullmatch(text)
-    return match != None
+    return (
+        len(text) > 6
+        and text.startswith("```")
+        and text.endswith("```")
+        and "`" not in text[3:-3]
+    )
 
 
 def is_block_type_quote(text):
     # Every line in a quote block must start with a > character.
-    quote_regex = re.compile(r"^(?:>.*\n*)+$")
-    match = quote_regex.fullmatch(text)
-    return match != None
+    lines = [line for line in text.split("\n") if line != ""]
+    return text.startswith(">") and all(line.startswith(">") for line in lines)
 
 
 def is_block_type_unordered_list(text):
     # Every line in an unordered list block must start with a * or - character, followed by a space.
-    unordered_regex = re.compile(r"^(?:[\*-] .*\n*)+$")
-    match = unordered_regex.fullmatch(text)
-    return match != None
+    lines = [line for line in text.split("\n") if line != ""]
+    return (text.startswith("* ") or text.startswith("- ")) and all(
+        line.startswith("* ") or line.startswith("- ") for line in lines
+    )
 
 
 def is_block_type_ordered_list(text):
     # Every line in an ordered list block must start with a number followed by a . character and a space. The number must start at 1 and increment by 1 for each line.
-    unordered_regex = re.compile(r"^(?:\d+\. .*\n*)+$")
-    match = unordered_regex.fullmatch(text)
-    if match == None:
-        return False
-    unordered_regex = re.compile(r"(\d+?)\. .*\n*")
-    matches = unordered_regex.findall(text)
-    ordered_number = 1
-    for number in matches:
-        if int(number) != ordered_number:
-            return False
-        ordered_number += 1
-    return True
+    lines = [line for line in text.split("\n") if line != ""]
+    return text[:1].isdigit() and is_ordered_list(lines)
@@ -0,0 +1,72 @@
+"""Thin client for src/build_daemon.py, run with ./rebuild.sh [--full | --status | --stop | path ...]"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = os.path.join(".build", "daemon.sock")
+
+
+def send_request(socket_path, request, timeout=None):
+    """Sends one request to the daemon and returns its decoded response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as reader:
+            line = reader.readline()
+    if line == b"":
+        raise Exception("The build daemon closed the connection without answering")
+    return json.loads(line)
+
+
+def format_timing(timing):
+    stages = ", ".join(
+        f"{name} {ms:.1f} ms" for name, ms in timing.items() if name != "total"
+    )
+    return f"Built in {timing['total']:.1f} ms ({stages})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask the build daemon for a build")
+    parser.add_argument("paths", nargs="*", help="changed files or folders to rebuild")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--full", action="store_true", help="build the whole site")
+    group.add_argument("--status", action="store_true")
+    group.add_argument("--stop", action="store_true")
+    args = parser.parse_args()
+
+    if args.full:
+        request = {"action": "full"}
+    elif args.status:
+        request = {"action": "status"}
+    elif args.stop:
+        request = {"action": "stop"}
+    elif len(args.paths) != 0:
+        # The daemon may run from another folder
+        request = {"action": "build", "paths": [os.path.abspath(p) for p in args.paths]}
+    else:
+        parser.error("give paths to rebuild, or --full, --status or --stop")
+    if len(args.paths) != 0 and request["action"] != "build":
+        parser.error("paths can't be combined with --full, --status or --stop")
+
+    try:
+        response = send_request(args.socket, request)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"No build daemon is listening on {args.socket}, start one with ./daemon.sh")
+        sys.exit(2)
+    if not response["ok"]:
+        print(f"Build failed: {response['error']}")
+        sys.exit(1)
+    if "timing_ms" in response:
+        print(format_timing(response["timing_ms"]))
+    elif args.status:
+        print(json.dumps(response, indent=1, sort_keys=True))
+    return None
+
+
+if __name__ == "__main__":
+    main()
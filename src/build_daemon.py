@@ -0,0 +1,295 @@
+"""Long-lived build process answering one-line JSON build requests over a Unix socket"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from build_manifest import BUILD_DIR
+from dependency_graph import update_dependency_graph, refresh_dependency_graph
+import image_size
+from image_size import load_image_sizes
+from link_checker import collect_site_targets, check_links, format_broken_links
+from main import add_build_flags
+from precompress import precompress_public
+from search_index import update_search_index
+from static_to_public import sync_static_to_public
+import template
+from template import generate_pages_incrementally
+from watch import rebuild_changed
+
+
+class BuildDaemon(socketserver.UnixStreamServer):
+    def __init__(
+        self,
+        socket_path,
+        root,
+        jobs=1,
+        image_sizes=False,
+        check_links=False,
+        search_index=False,
+        static_hash=False,
+        static_hardlink=False,
+        precompress=False,
+    ):
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, BuildRequestHandler)
+        self.socket_path = socket_path
+        self.root = root
+        self.content_dir = os.path.join(root, "content")
+        self.static_dir = os.path.join(root, "static")
+        self.template_path = os.path.join(root, "template.html")
+        self.public_dir = os.path.join(root, "public")
+        self.jobs = jobs
+        self.image_sizes = image_sizes
+        self.check_links = check_links
+        self.search_index = search_index
+        self.static_hash = static_hash
+        self.static_hardlink = static_hardlink
+        self.precompress = precompress
+        self.started = time.monotonic()
+        self.requests = 0
+        template.set_link_collection(check_links)
+        template.set_search_collection(search_index)
+        if image_sizes:
+            self.load_image_sizes()
+
+    def build_path(self, name):
+        return os.path.join(self.root, BUILD_DIR, name)
+
+    def run(self, request):
+        """Carries out one decoded request and returns the response"""
+        self.requests += 1
+        action = request.get("action")
+        start = time.perf_counter()
+        timing = {}
+        try:
+            if action == "build":
+                paths = request.get("paths")
+                if not isinstance(paths, list) or len(paths) == 0:
+                    raise ValueError("build needs a non-empty list of paths")
+                self.build_paths(paths, timing)
+            elif action == "full":
+                self.build_full(timing)
+            elif action == "status":
+                return self.status()
+            elif action == "stop":
+                # shutdown() waits for serve_forever, which is waiting for this request
+                threading.Thread(target=self.shutdown).start()
+                return {"ok": True}
+            else:
+                raise ValueError(f"Unknown action: {action}")
+        except Exception as error:
+            return {"ok": False, "error": f"{type(error).__name__}: {error}"}
+        timing["total"] = (time.perf_counter() - start) * 1000
+        return {"ok": True, "timing_ms": timing}
+
+    def build_paths(self, paths, timing):
+        """Re-renders the pages and re-copies the static files the paths touched"""
+        changed = set(
+            os.path.normpath(os.path.join(self.root, path)) for path in paths
+        )
+        start = time.perf_counter()
+        rebuild_changed(
+            changed,
+            self.content_dir,
+            self.static_dir,
+            self.template_path,
+            self.public_dir,
+            self.static_hardlink,
+        )
+        record_stage(timing, "rebuild", start)
+        if self.precompress:
+            self.precompress_public(timing)
+
+        # Only the touched pages are rescanned, unless the change may affect any page
+        start = time.perf_counter()
+        graph = refresh_dependency_graph(self.build_path("deps.json"), changed, self.root)
+        if graph is None:
+            self.update_dependency_graph()
+        record_stage(timing, "dependency_graph", start)
+        return None
+
+    def build_full(self, timing):
+        """Syncs static files and re-renders the pages whose inputs changed since the last build"""
+        # Pages rendered since the last full build are converted again if they changed
+        template.set_link_collection(self.check_links)
+        template.set_search_collection(self.search_index)
+
+        start = time.perf_counter()
+        sync_static_to_public(
+            self.static_dir,
+            self.public_dir,
+            self.build_path("static.json"),
+            self.static_hash,
+            self.static_hardlink,
+        )
+        record_stage(timing, "static_to_public", start)
+
+        if self.image_sizes:
+            start = time.perf_counter()
+            self.load_image_sizes()
+            record_stage(timing, "image_sizes", start)
+
+        start = time.perf_counter()
+        generate_pages_incrementally(
+            self.content_dir,
+            self.template_path,
+            self.public_dir,
+            self.build_path("pages.json"),
+            self.jobs,
+        )
+        record_stage(timing, "pages", start)
+
+        start = time.perf_counter()
+        self.update_dependency_graph()
+        record_stage(timing, "dependency_graph", start)
+
+        if self.check_links:
+            start = time.perf_counter()
+            targets = collect_site_targets(
+                self.content_dir,
+                self.public_dir,
+                template.link_targets,
+                self.build_path("links.json"),
+            )
+            broken = check_links(
+                targets, self.content_dir, self.public_dir, self.static_dir
+            )
+            record_stage(timing, "check_links", start)
+            if len(broken) != 0:
+                raise Exception(
+                    f"{len(broken)} broken link(s):\n{format_broken_links(broken)}"
+                )
+
+        if self.search_index:
+            start = time.perf_counter()
+            update_search_index(
+                self.content_dir,
+                self.public_dir,
+                template.search_terms,
+                self.build_path("search.json"),
+            )
+            record_stage(timing, "search_index", start)
+
+        if self.precompress:
+            self.precompress_public(timing)
+        return None
+
+    def precompress_public(self, timing):
+        """Gives changed outputs fresh .gz/.br siblings, as --precompress does"""
+        start = time.perf_counter()
+        precompress_public(
+            self.public_dir, self.build_path("precompress.json"), self.jobs
+        )
+        record_stage(timing, "precompress", start)
+        return None
+
+    def load_image_sizes(self):
+        sizes = load_image_sizes(self.static_dir, self.build_path("images.json"))
+        image_size.set_image_sizes(sizes, self.public_dir)
+        return None
+
+    def update_dependency_graph(self):
+        update_dependency_graph(
+            self.content_dir,
+            self.template_path,
+            self.static_dir,
+            self.public_dir,
+            self.build_path("deps.json"),
+            self.root,
+        )
+        return None
+
+    def status(self):
+        response = {
+            "ok": True,
+            "uptime_seconds": time.monotonic() - self.started,
+            "requests": self.requests,
+        }
+        if template.block_cache is not None:
+            response["block_cache"] = template.block_cache.stats()
+        return response
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        return None
+
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            response = {"ok": False, "error": f"Invalid request: {error}"}
+        else:
+            if isinstance(request, dict):
+                response = self.server.run(request)
+            else:
+                response = {"ok": False, "error": "Invalid request: expected an object"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        return None
+
+
+def record_stage(timing, name, start):
+    timing[name] = (time.perf_counter() - start) * 1000
+    return None
+
+
+def remove_stale_socket(socket_path):
+    """Removes a socket left behind by a daemon that died, refusing to take over a live one"""
+    if not os.path.exists(socket_path):
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        return None
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(socket_path)
+        return None
+    finally:
+        probe.close()
+    raise Exception(f"A build daemon is already listening on {socket_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve build requests over a Unix socket")
+    parser.add_argument(
+        "--socket", default=os.path.join(os.getcwd(), BUILD_DIR, "daemon.sock")
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="worker processes for full builds"
+    )
+    add_build_flags(parser)
+    args = parser.parse_args()
+
+    template.set_block_cache_size(args.block_cache)
+    daemon = BuildDaemon(
+        args.socket,
+        os.getcwd(),
+        args.jobs,
+        args.image_sizes,
+        args.check_links,
+        args.search_index,
+        args.static_hash,
+        args.static_hardlink,
+        args.precompress,
+    )
+    print(f"Build daemon listening on {args.socket}, press Ctrl+C to stop")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Persistent build state kept between runs"""
+
+import hashlib
+import json
+import os
+
+
+BUILD_DIR = ".build"
+
+
+def build_path(name):
+    return os.path.join(os.getcwd(), BUILD_DIR, name)
+
+
+def load_manifest(path, default=None):
+    """Returns the JSON manifest at path, or default when there isn't one yet"""
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def save_manifest(path, manifest):
+    """Writes the manifest atomically so an interrupted build can't corrupt it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+    return None
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_record(path, old_record=None):
+    """Returns {"mtime", "size", "hash"} for path, reusing old_record's hash when the stat is unchanged"""
+    stat = os.stat(path)
+    if (
+        old_record is not None
+        and old_record.get("mtime") == stat.st_mtime_ns
+        and old_record.get("size") == stat.st_size
+    ):
+        return dict(old_record)
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": hash_file(path)}
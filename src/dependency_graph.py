@@ -0,0 +1,218 @@
+"""Records which inputs every output was built from and answers what a change invalidates"""
+
+import argparse
+import os
+import posixpath
+
+from build_manifest import build_path, load_manifest, save_manifest
+from site_paths import resolve_url
+from template import iter_pages, is_markdown_file, page_dest_path
+from textnode import extract_markdown_images, extract_markdown_links
+
+
+# 2 records assets that didn't exist when the page was scanned
+GRAPH_VERSION = 2
+
+
+def update_dependency_graph(
+    dir_path_content, template_path, static_dir, dest_dir_path, graph_path, root=None
+):
+    """Rescans pages whose markdown changed, saves the graph and returns it."""
+    if root is None:
+        root = os.getcwd()
+    old_graph = load_manifest(graph_path, {})
+    old_pages = {}
+    if old_graph.get("version") == GRAPH_VERSION:
+        old_pages = old_graph["pages"]
+
+    pages = {}
+    for from_path, dest_path in iter_pages(dir_path_content, dest_dir_path):
+        stat = os.stat(from_path)
+        output = relative_path(dest_path, root)
+        old_page = old_pages.get(output)
+        if (
+            old_page is not None
+            and old_page["source"] == relative_path(from_path, root)
+            and old_page["mtime"] == stat.st_mtime_ns
+            and old_page["size"] == stat.st_size
+        ):
+            pages[output] = old_page
+            continue
+        pages[output] = scan_page(from_path, dest_path, dest_dir_path, static_dir, root)
+
+    graph = {
+        "version": GRAPH_VERSION,
+        "content": relative_path(dir_path_content, root),
+        "static": relative_path(static_dir, root),
+        "public": relative_path(dest_dir_path, root),
+        "template": relative_path(template_path, root),
+        "pages": pages,
+    }
+    save_manifest(graph_path, graph)
+    return graph
+
+
+def refresh_dependency_graph(graph_path, changed_paths, root=None):
+    """Rescans only the changed pages, or returns None when a full update is needed."""
+    if root is None:
+        root = os.getcwd()
+    graph = load_manifest(graph_path)
+    if graph is None or graph.get("version") != GRAPH_VERSION:
+        return None
+    content_dir = os.path.join(root, graph["content"])
+    static_dir = os.path.join(root, graph["static"])
+    dest_dir_path = os.path.join(root, graph["public"])
+
+    sources = []
+    for changed in changed_paths:
+        path = relative_path(changed, root)
+        if is_within(graph["template"], path) or os.path.isdir(changed):
+            return None
+        if is_within(path, graph["content"]):
+            if is_markdown_file(path):
+                sources.append(changed)
+            elif not os.path.exists(changed):
+                # Possibly a removed folder of pages
+                return None
+        elif is_within(path, graph["static"]):
+            # Every page records these whether or not they exist, see find_referenced_assets
+            if posixpath.splitext(path)[1] in ("", ".html"):
+                return None
+
+    for from_path in sources:
+        dest_path = page_dest_path(from_path, content_dir, dest_dir_path)
+        output = relative_path(dest_path, root)
+        if os.path.isfile(from_path):
+            graph["pages"][output] = scan_page(
+                from_path, dest_path, dest_dir_path, static_dir, root
+            )
+        else:
+            graph["pages"].pop(output, None)
+    if len(sources) != 0:
+        save_manifest(graph_path, graph)
+    return graph
+
+
+def scan_page(from_path, dest_path, dest_dir_path, static_dir, root):
+    """Returns the graph entry of the page built from from_path"""
+    stat = os.stat(from_path)
+    with open(from_path, "r") as file:
+        assets = find_referenced_assets(file, dest_path, dest_dir_path, static_dir)
+    return {
+        "source": relative_path(from_path, root),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "assets": [relative_path(asset, root) for asset in assets],
+    }
+
+
+def find_referenced_assets(lines, dest_path, dest_dir_path, static_dir):
+    """Returns the sorted static paths the images and links in the page's lines point at."""
+    page_dir = posixpath.dirname(
+        os.path.relpath(dest_path, dest_dir_path).replace(os.sep, "/")
+    )
+    assets = set()
+    for line in lines:
+        for text, url in extract_markdown_images(line):
+            add_referenced_asset(assets, url, True, page_dir, static_dir)
+        for text, url in extract_markdown_links(line):
+            add_referenced_asset(assets, url, False, page_dir, static_dir)
+    return sorted(assets)
+
+
+def add_referenced_asset(assets, url, is_image, page_dir, static_dir):
+    rel_path = resolve_url(url, page_dir)
+    if rel_path is None or rel_path == "":
+        return None
+    asset = os.path.join(static_dir, *rel_path.split("/"))
+    extension = posixpath.splitext(rel_path)[1]
+    if is_image or extension not in ("", ".html") or os.path.isfile(asset):
+        assets.add(asset)
+    return None
+
+
+def affected_outputs(graph, changed_paths):
+    """Returns the sorted outputs that must be rebuilt when changed_paths changed."""
+    outputs = set()
+    for changed in changed_paths:
+        changed = normalize_path(changed)
+        if is_within(graph["template"], changed):
+            outputs.update(graph["pages"])
+            continue
+        for output, page in graph["pages"].items():
+            if is_within(page["source"], changed) or any(
+                is_within(asset, changed) for asset in page["assets"]
+            ):
+                outputs.add(output)
+        if is_within(changed, graph["content"]) and is_markdown_file(changed):
+            outputs.add(
+                normalize_path(
+                    page_dest_path(changed, graph["content"], graph["public"])
+                )
+            )
+        elif is_within(changed, graph["static"]) and changed != graph["static"]:
+            rel_path = posixpath.relpath(changed, graph["static"])
+            outputs.add(posixpath.join(graph["public"], rel_path))
+    return sorted(outputs)
+
+
+def page_dependencies(graph, output):
+    """Returns every input output was built from, source first"""
+    page = graph["pages"].get(normalize_path(output))
+    if page is None:
+        raise Exception(f"{output} isn't a page in the dependency graph")
+    return [page["source"], graph["template"]] + page["assets"]
+
+
+def relative_path(path, root):
+    return normalize_path(os.path.relpath(path, root))
+
+
+def normalize_path(path):
+    return posixpath.normpath(path.replace(os.sep, "/"))
+
+
+def is_within(path, dir_path):
+    return path == dir_path or path.startswith(dir_path + "/")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Query the dependency graph recorded by the last build"
+    )
+    parser.add_argument(
+        "--graph",
+        default=build_path("deps.json"),
+        help="graph written by the build (default .build/deps.json)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    affected = commands.add_parser(
+        "affected", help="list the outputs to rebuild when these paths change"
+    )
+    affected.add_argument("paths", nargs="+")
+    show = commands.add_parser(
+        "show", help="list the inputs of these outputs, or of every page"
+    )
+    show.add_argument("outputs", nargs="*")
+    args = parser.parse_args(argv)
+
+    graph = load_manifest(args.graph)
+    if graph is None or graph.get("version") != GRAPH_VERSION:
+        parser.error(f"no dependency graph at {args.graph}, run a build first")
+
+    if args.command == "affected":
+        paths = [relative_path(path, os.getcwd()) for path in args.paths]
+        for output in affected_outputs(graph, paths):
+            print(output)
+        return None
+
+    outputs = args.outputs if len(args.outputs) != 0 else sorted(graph["pages"])
+    for output in outputs:
+        print(normalize_path(output))
+        for dependency in page_dependencies(graph, output):
+            print(f"  {dependency}")
+    return None
+
+
+if __name__ == "__main__":
+    main()
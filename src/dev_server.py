@@ -0,0 +1,189 @@
+"""Development server that renders pages from content/ when they're requested instead of building first"""
+
+import mimetypes
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+from build_manifest import hash_bytes
+from template import render_page
+
+
+class PageCache:
+    """Bounded LRU cache of rendered pages, each valid while its source and template mtimes are unchanged"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # render_page shares the block cache, which isn't safe to use from two threads at once
+        self.lock = threading.Lock()
+
+    def get(self, from_path, template_path):
+        """Returns (html bytes, etag) for the page, rendering it only if it changed"""
+        key = (os.stat(from_path).st_mtime_ns, os.stat(template_path).st_mtime_ns)
+        with self.lock:
+            cached = self.pages.get(from_path)
+            if cached is not None and cached[0] == key:
+                self.hits += 1
+                self.pages.move_to_end(from_path)
+                return cached[1], cached[2]
+
+            self.misses += 1
+            with open(from_path, "r") as file:
+                markdown = file.read()
+            html = render_page(markdown, template_path).encode("utf-8")
+            etag = f'"{hash_bytes(html)[:32]}"'
+            self.pages[from_path] = (key, html, etag)
+            self.pages.move_to_end(from_path)
+            if len(self.pages) > self.max_size:
+                self.pages.popitem(last=False)
+            return html, etag
+
+
+class DevServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, content_dir, static_dir, template_path, cache=None):
+        super().__init__(address, DevRequestHandler)
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.cache = cache if cache is not None else PageCache()
+
+
+class DevRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.respond(send_body=True)
+        return None
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+        return None
+
+    def respond(self, send_body):
+        url_path = unquote(urlsplit(self.path).path)
+        rel_path = posixpath.normpath(url_path.lstrip("/") or ".")
+        if rel_path == ".." or rel_path.startswith("../"):
+            self.send_text(HTTPStatus.NOT_FOUND, "Not found", send_body)
+            return None
+        if rel_path == ".":
+            rel_path = ""
+
+        from_path = find_page_source(self.server.content_dir, rel_path)
+        if from_path is not None:
+            if is_folder_page(self.server.content_dir, rel_path) and not url_path.endswith("/"):
+                # Relative links in the page resolve against its folder
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header("Location", url_path + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            try:
+                body, etag = self.server.cache.get(from_path, self.server.template_path)
+            except Exception as error:
+                message = f"Failed to render {from_path}\n{type(error).__name__}: {error}"
+                self.send_text(HTTPStatus.INTERNAL_SERVER_ERROR, message, send_body)
+                return None
+            self.send_body(body, "text/html; charset=utf-8", etag, send_body)
+            return None
+
+        static_path = os.path.join(self.server.static_dir, *rel_path.split("/"))
+        if rel_path != "" and os.path.isfile(static_path):
+            stat = os.stat(static_path)
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.not_modified(etag):
+                return None
+            content_type = mimetypes.guess_type(static_path)[0] or "application/octet-stream"
+            with open(static_path, "rb") as file:
+                self.send_body(file.read(), content_type, etag, send_body)
+            return None
+
+        self.send_text(HTTPStatus.NOT_FOUND, "Not found", send_body)
+        return None
+
+    def not_modified(self, etag):
+        """Sends 304 and returns True when the client already has etag"""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is None or not etag_matches(if_none_match, etag):
+            return False
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return True
+
+    def send_body(self, body, content_type, etag, send_body):
+        if self.not_modified(etag):
+            return None
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        # Revalidate every time, edits should show up on the next reload
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+        return None
+
+    def send_text(self, status, text, send_body):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+        return None
+
+
+def find_page_source(content_dir, rel_path):
+    """Returns the markdown file the page at rel_path (relative to the site root) is built from, or None"""
+    if rel_path.endswith(".html"):
+        candidates = [rel_path[: -len(".html")]]
+    elif rel_path == "":
+        candidates = ["index"]
+    else:
+        candidates = [posixpath.join(rel_path, "index"), rel_path]
+    for candidate in candidates:
+        for extension in (".md", ".markdown"):
+            path = os.path.join(content_dir, *candidate.split("/")) + extension
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def is_folder_page(content_dir, rel_path):
+    """Returns whether rel_path names a content folder rather than a file"""
+    return rel_path != "" and os.path.isdir(os.path.join(content_dir, *rel_path.split("/")))
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def serve(content_dir, static_dir, template_path, port=8888, host="localhost"):
+    """Serves the site until interrupted, rendering each page when it's first requested"""
+    server = DevServer((host, port), content_dir, static_dir, template_path)
+    print(f"Serving content/ and static/ on http://{host}:{server.server_port}, press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return None
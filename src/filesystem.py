@@ -0,0 +1,238 @@
+"""Filesystems the build reads and writes through"""
+
+import io
+import os
+import shutil
+import time
+
+
+class DiskFileSystem:
+    """The real filesystem, through os and shutil"""
+
+    def open(self, path, mode="r"):
+        return open(path, mode)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def isfile(self, path):
+        return os.path.isfile(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def listdir(self, path):
+        return os.listdir(path)
+
+    def scandir(self, path):
+        return os.scandir(path)
+
+    def getsize(self, path):
+        return os.path.getsize(path)
+
+    def mtime_ns(self, path):
+        return os.stat(path).st_mtime_ns
+
+    def makedirs(self, path):
+        os.makedirs(path, exist_ok=True)
+        return None
+
+    def remove(self, path):
+        os.remove(path)
+        return None
+
+    def replace(self, src, dest):
+        os.replace(src, dest)
+        return None
+
+    def rmtree(self, path):
+        shutil.rmtree(path)
+        return None
+
+    def copytree(self, src, dest):
+        shutil.copytree(src, dest, dirs_exist_ok=True)
+        return None
+
+
+disk = DiskFileSystem()
+
+
+class MemoryFileSystem:
+    """Files held in memory as bytes, keyed by normalized path."""
+
+    def __init__(self, files=None):
+        # path -> (bytes, mtime_ns)
+        self.files = {}
+        # folder path -> names of the files and folders in it
+        self.dirs = {os.path.abspath(os.sep): set()}
+        for path, data in (files or {}).items():
+            self.makedirs(os.path.dirname(self.normalize(path)))
+            self.write(path, data)
+
+    def normalize(self, path):
+        # Relative paths resolve against the working directory, as they would on disk
+        return os.path.abspath(path)
+
+    def write(self, path, data):
+        """Stores data (str or bytes) at path, whose folder must exist"""
+        path = self.normalize(path)
+        parent, name = os.path.split(path)
+        if parent not in self.dirs:
+            raise FileNotFoundError(f"No such directory: {parent}")
+        if path in self.dirs:
+            raise IsADirectoryError(f"Is a directory: {path}")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.files[path] = (data, time.time_ns())
+        self.dirs[parent].add(name)
+        return None
+
+    def read(self, path):
+        """Returns the bytes stored at path"""
+        path = self.normalize(path)
+        if path not in self.files:
+            raise FileNotFoundError(f"No such file: {path}")
+        return self.files[path][0]
+
+    def open(self, path, mode="r"):
+        if "r" in mode and "+" not in mode:
+            data = self.read(path)
+            if "b" in mode:
+                return io.BytesIO(data)
+            return io.StringIO(data.decode("utf-8"))
+        if "a" in mode or "x" in mode:
+            raise ValueError(f"Unsupported mode: {mode}")
+        # Checked on open like the disk would, not when the file is closed
+        parent = os.path.dirname(self.normalize(path))
+        if parent not in self.dirs:
+            raise FileNotFoundError(f"No such directory: {parent}")
+        if "b" in mode:
+            return MemoryBytesWriter(self, path)
+        return MemoryTextWriter(self, path)
+
+    def exists(self, path):
+        path = self.normalize(path)
+        return path in self.files or path in self.dirs
+
+    def isfile(self, path):
+        return self.normalize(path) in self.files
+
+    def isdir(self, path):
+        return self.normalize(path) in self.dirs
+
+    def listdir(self, path):
+        path = self.normalize(path)
+        if path not in self.dirs:
+            raise FileNotFoundError(f"No such directory: {path}")
+        return list(self.dirs[path])
+
+    def scandir(self, path):
+        """Returns entries with the name, path, is_dir() and is_file() of os.scandir's"""
+        return [
+            MemoryDirEntry(self, os.path.join(path, name)) for name in self.listdir(path)
+        ]
+
+    def getsize(self, path):
+        return len(self.read(path))
+
+    def mtime_ns(self, path):
+        self.read(path)
+        return self.files[self.normalize(path)][1]
+
+    def makedirs(self, path):
+        path = self.normalize(path)
+        if path in self.dirs:
+            return None
+        if path in self.files:
+            raise FileExistsError(f"Is a file: {path}")
+        parent, name = os.path.split(path)
+        self.makedirs(parent)
+        self.dirs[parent].add(name)
+        self.dirs[path] = set()
+        return None
+
+    def remove(self, path):
+        path = self.normalize(path)
+        if path not in self.files:
+            raise FileNotFoundError(f"No such file: {path}")
+        del self.files[path]
+        parent, name = os.path.split(path)
+        self.dirs[parent].discard(name)
+        return None
+
+    def replace(self, src, dest):
+        data = self.read(src)
+        self.write(dest, data)
+        self.remove(src)
+        return None
+
+    def rmtree(self, path):
+        path = self.normalize(path)
+        if path not in self.dirs:
+            raise FileNotFoundError(f"No such directory: {path}")
+        for name in self.dirs.pop(path):
+            child = os.path.join(path, name)
+            if child in self.dirs:
+                self.rmtree(child)
+            else:
+                del self.files[child]
+        parent, name = os.path.split(path)
+        if parent in self.dirs:
+            self.dirs[parent].discard(name)
+        return None
+
+    def copytree(self, src, dest):
+        src = self.normalize(src)
+        if src not in self.dirs:
+            raise FileNotFoundError(f"No such directory: {src}")
+        self.makedirs(dest)
+        for name in self.dirs[src]:
+            child = os.path.join(src, name)
+            if child in self.dirs:
+                self.copytree(child, os.path.join(dest, name))
+            else:
+                self.write(os.path.join(dest, name), self.files[child][0])
+        return None
+
+
+class MemoryDirEntry:
+    __slots__ = ("fs", "name", "path")
+
+    def __init__(self, fs, path):
+        self.fs = fs
+        self.name = os.path.basename(path)
+        self.path = path
+
+    def is_dir(self):
+        return self.fs.isdir(self.path)
+
+    def is_file(self):
+        return self.fs.isfile(self.path)
+
+
+class MemoryTextWriter(io.StringIO):
+    """A file opened for writing text on a MemoryFileSystem, stored when it's closed"""
+
+    def __init__(self, fs, path):
+        super().__init__()
+        self.fs = fs
+        self.path = path
+
+    def close(self):
+        if not self.closed:
+            self.fs.write(self.path, self.getvalue())
+        super().close()
+
+
+class MemoryBytesWriter(io.BytesIO):
+    """MemoryTextWriter for files opened in binary mode"""
+
+    def __init__(self, fs, path):
+        super().__init__()
+        self.fs = fs
+        self.path = path
+
+    def close(self):
+        if not self.closed:
+            self.fs.write(self.path, self.getvalue())
+        super().close()
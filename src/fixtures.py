@@ -0,0 +1,4 @@
+def write_file(path, data):
+    """Writes str or bytes to path, for tests building sites on disk"""
+    with open(path, "wb" if isinstance(data, bytes) else "w") as file:
+        file.write(data)
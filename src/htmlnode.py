@@ -1,15 +1,29 @@
+import sys
 from enum import Enum
 
 
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
-        self.tag = tag  # "html tag"
+        # Tags repeat across every page, interning lets nodes share one string
+        self.tag = sys.intern(tag) if type(tag) is str else tag  # "html tag"
         self.value = value  # "tag text contents"
         self.children = children  # [HTMLNode(), HTMLNode()]
         self.props = props  # {"attribute":"contents"}
 
     def __eq__(self, value):
-        return str(self) == str(value)
+        if self is value:
+            return True
+        if type(self) is not type(value):
+            return NotImplemented
+        # Cheap fields first, children last so a difference short-circuits the subtree
+        return (
+            self.tag == value.tag
+            and self.value == value.value
+            and self.props == value.props
+            and self.children == value.children
+        )
 
     def __repr__(self):
         return f"HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})"
@@ -17,6 +31,17 @@ class HTMLNode:
     def to_html(self):
         raise NotImplementedError("")
 
+    def iter_html(self):
+        """Yields the node's html in fragments, in document order"""
+        raise NotImplementedError("")
+
+    def write_html(self, file):
+        """Streams the node's html into a writable file without building the whole string"""
+        write = file.write
+        for fragment in self.iter_html():
+            write(fragment)
+        return None
+
     def props_to_html(self):
         if self.props is None:
             return ""
@@ -27,6 +52,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
 
@@ -40,22 +67,43 @@ class LeafNode(HTMLNode):
             return str(self.value)
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
 
+    def iter_html(self):
+        yield self.to_html()
+
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
     def __repr__(self):
-        return f"LeafNode({self.tag}, {self.children}, {self.props})"
+        return f"ParentNode({self.tag}, {self.children}, {self.props})"
 
     def to_html(self):
-        if self.tag is None:
-            raise ValueError("Invalid HTML: no tag")
-        if self.children is None or len(self.children) == 0:
-            raise ValueError("Invalid HTML: no children")
-        return (
-            f"<{self.tag}{self.props_to_html()}>{self.children_to_html()}</{self.tag}>"
-        )
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        # Walks the tree with an explicit stack so each fragment is yielded once,
+        # instead of being copied into every enclosing parent's string.
+        stack = [(self, 0)]
+        while len(stack) != 0:
+            node, index = stack.pop()
+            if index == 0:
+                if node.tag is None:
+                    raise ValueError("Invalid HTML: no tag")
+                if node.children is None or len(node.children) == 0:
+                    raise ValueError("Invalid HTML: no children")
+                yield f"<{node.tag}{node.props_to_html()}>"
+            if index == len(node.children):
+                yield f"</{node.tag}>"
+                continue
+            stack.append((node, index + 1))
+            child = node.children[index]
+            if isinstance(child, ParentNode):
+                stack.append((child, 0))
+            else:
+                yield from child.iter_html()
 
     def children_to_html(self):
         if self.children is None:
@@ -0,0 +1,179 @@
+"""Reads image dimensions from file headers and sizes the <img> tags that point at them"""
+
+import json
+import os
+import posixpath
+import struct
+
+from build_manifest import load_manifest, save_manifest, hash_bytes
+from site_paths import resolve_url
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = {".png", ".gif", ".jpg", ".jpeg", ".webp"}
+
+# Static image path (relative, "/" separated) -> [width, height], None when images aren't sized
+image_sizes = None
+# Folder the generated pages are written into, to find each page's URL
+public_root = None
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Start of frame markers carry the size; C4, C8 and CC are other segments
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def load_image_sizes(static_dir, manifest_path):
+    """Returns {rel_path: [width, height]} for every image under static_dir."""
+    manifest = load_manifest(manifest_path, {})
+    old_files = {}
+    old_sizes = {}
+    if manifest.get("version") == MANIFEST_VERSION:
+        old_files = manifest["files"]
+        old_sizes = manifest["sizes"]
+
+    files = {}
+    sizes = {}
+    by_path = {}
+    for dir_path, dir_names, file_names in os.walk(static_dir):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.join(dir_path, file_name)
+            rel_path = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            stat = os.stat(path)
+            record = old_files.get(rel_path)
+            if (
+                record is None
+                or record["mtime"] != stat.st_mtime_ns
+                or record["size"] != stat.st_size
+                or record["hash"] not in old_sizes
+            ):
+                with open(path, "rb") as file:
+                    data = file.read()
+                record = {
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "hash": hash_bytes(data),
+                }
+                if record["hash"] not in old_sizes:
+                    old_sizes[record["hash"]] = read_image_size(data)
+            files[rel_path] = record
+            size = old_sizes[record["hash"]]
+            sizes[record["hash"]] = size
+            if size is not None:
+                by_path[rel_path] = list(size)
+
+    save_manifest(
+        manifest_path, {"version": MANIFEST_VERSION, "files": files, "sizes": sizes}
+    )
+    return by_path
+
+
+def read_image_size(data):
+    """Returns (width, height) from the header of PNG, GIF, JPEG or WebP data, or None"""
+    try:
+        if data.startswith(PNG_SIGNATURE) and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])
+        if data.startswith(b"\xff\xd8"):
+            return read_jpeg_size(data)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return read_webp_size(data)
+    except struct.error:
+        # Truncated header
+        return None
+    return None
+
+
+def read_jpeg_size(data):
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            i += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5 : i + 9])
+            return width, height
+        (length,) = struct.unpack(">H", data[i + 2 : i + 4])
+        i += 2 + length
+    return None
+
+
+def read_webp_size(data):
+    # Slices, never indexes, so a truncated header can only raise struct.error
+    chunk = data[12:16]
+    if chunk == b"VP8 " and data[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and data[20:21] == b"\x2f":
+        (bits,) = struct.unpack("<I", data[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def set_image_sizes(sizes, public_dir=None):
+    """Sizes every image converted from now on with sizes from load_image_sizes, None stops sizing"""
+    global image_sizes, public_root
+    image_sizes = sizes
+    public_root = public_dir
+    return None
+
+
+def page_images(dest_path):
+    """Returns the PageImages for the page written to dest_path, None when images aren't sized"""
+    if image_sizes is None:
+        return None
+    page_dir = ""
+    if public_root is not None:
+        page_dir = posixpath.dirname(
+            os.path.relpath(dest_path, public_root).replace(os.sep, "/")
+        )
+    return PageImages(image_sizes, page_dir)
+
+
+class PageImages:
+    """What sizing one page's images needs: the sizes and the URL folder relative srcs resolve against"""
+
+    __slots__ = ("sizes", "page_dir")
+
+    def __init__(self, sizes, page_dir=""):
+        self.sizes = sizes
+        self.page_dir = page_dir
+
+    def attributes(self, url):
+        """Returns the extra <img> attributes for url"""
+        attributes = {}
+        path = resolve_url(url, self.page_dir)
+        size = self.sizes.get(path) if path is not None else None
+        if size is not None:
+            attributes["width"] = str(size[0])
+            attributes["height"] = str(size[1])
+        attributes["loading"] = "lazy"
+        attributes["decoding"] = "async"
+        return attributes
+
+    def cache_context(self, lines):
+        """Returns what a cached block's html depends on besides its text."""
+        for line in lines:
+            if "![" in line:
+                return self.page_dir
+        return None
+
+
+def fingerprint():
+    """Returns a hash of the image sizes, so builds can tell when pages need re-rendering"""
+    if image_sizes is None:
+        return None
+    return hash_bytes(json.dumps(image_sizes, sort_keys=True).encode("utf-8"))
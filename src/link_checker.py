@@ -0,0 +1,91 @@
+"""Checks every link and image target collected while pages were converted"""
+
+import os
+import posixpath
+from urllib.parse import urlsplit
+
+from build_manifest import load_manifest, save_manifest
+from site_paths import resolve_url
+from static_to_public import list_files
+from template import iter_pages, markdown_to_html_node
+
+
+LINKS_MANIFEST_VERSION = 1
+
+
+def collect_site_targets(dir_path_content, dest_dir_path, collected, manifest_path):
+    """Returns {from_path: [(line, tag, url)]} for every page of the site."""
+    manifest = load_manifest(manifest_path, {})
+    old_pages = {}
+    if manifest.get("version") == LINKS_MANIFEST_VERSION:
+        old_pages = manifest["pages"]
+
+    targets_by_page = {}
+    pages = {}
+    for from_path, dest_path in iter_pages(dir_path_content, dest_dir_path):
+        key = os.path.relpath(from_path, dir_path_content)
+        stat = os.stat(from_path)
+        old_page = old_pages.get(key)
+        if from_path in collected:
+            targets = collected[from_path]
+        elif (
+            old_page is not None
+            and old_page["mtime"] == stat.st_mtime_ns
+            and old_page["size"] == stat.st_size
+        ):
+            targets = [tuple(target) for target in old_page["targets"]]
+        else:
+            targets = []
+            with open(from_path, "r") as file:
+                markdown_to_html_node(file.read(), targets)
+        targets_by_page[from_path] = targets
+        pages[key] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "targets": targets,
+        }
+
+    save_manifest(manifest_path, {"version": LINKS_MANIFEST_VERSION, "pages": pages})
+    return targets_by_page
+
+
+def check_links(targets_by_page, dir_path_content, dest_dir_path, static_dir):
+    """Returns (from_path, line, tag, url) for every target that isn't a page or static file."""
+    pages = list(iter_pages(dir_path_content, dest_dir_path))
+    outputs = set(url_path(dest_path, dest_dir_path) for _, dest_path in pages)
+    if os.path.exists(static_dir):
+        outputs.update(rel_path.replace(os.sep, "/") for rel_path in list_files(static_dir))
+
+    broken = []
+    for from_path, dest_path in pages:
+        page_dir = posixpath.dirname(url_path(dest_path, dest_dir_path))
+        for line, tag, url in targets_by_page.get(from_path, []):
+            parts = urlsplit(url)
+            if parts.scheme != "" or parts.netloc != "" or parts.path == "":
+                continue
+            path = resolve_url(url, page_dir)
+            if path is None or not target_exists(path, outputs):
+                broken.append((from_path, line, tag, url))
+    return broken
+
+
+def url_path(path, dest_dir_path):
+    return os.path.relpath(path, dest_dir_path).replace(os.sep, "/")
+
+
+def target_exists(path, outputs):
+    if path == "":
+        return "index.html" in outputs
+    return (
+        path in outputs
+        or f"{path}.html" in outputs
+        or f"{path}/index.html" in outputs
+    )
+
+
+def format_broken_links(broken):
+    lines = []
+    for from_path, line, tag, url in broken:
+        kind = "image" if tag == "img" else "link"
+        lines.append(f"  {from_path}:{line}: broken {kind} {url}")
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+"""Load test for a running server, reporting requests/sec and latency"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+
+
+def run_connection(host, port, paths, headers, deadline, results):
+    """Requests paths in turn until deadline, appending (latencies, bytes, errors) to results"""
+    latencies = []
+    received = 0
+    errors = 0
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+        received += len(body)
+        if response.status >= 400:
+            errors += 1
+    connection.close()
+    results.append((latencies, received, errors))
+    return None
+
+
+def load_test(host, port, paths, connections=32, duration=10.0, headers=None):
+    """Returns {"requests", "errors", "bytes", "seconds", "requests_per_sec", "p50_ms", "p99_ms"}"""
+    results = []
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(
+            target=run_connection,
+            args=(host, port, paths, headers or {}, deadline, results),
+        )
+        for _ in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    summary = {
+        "requests": len(latencies),
+        "errors": sum(result[2] for result in results),
+        "bytes": sum(result[1] for result in results),
+        "seconds": seconds,
+        "requests_per_sec": len(latencies) / seconds,
+        "p50_ms": 0.0,
+        "p99_ms": 0.0,
+    }
+    if len(latencies) != 0:
+        summary["p50_ms"] = statistics.median(latencies) * 1000
+        p99_index = min(len(latencies) - 1, len(latencies) * 99 // 100)
+        summary["p99_ms"] = latencies[p99_index] * 1000
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure requests/sec of a running server")
+    parser.add_argument("paths", nargs="*", default=["/"])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--gzip", action="store_true", help="send Accept-Encoding: gzip with every request"
+    )
+    args = parser.parse_args()
+
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+    summary = load_test(
+        args.host, args.port, args.paths, args.connections, args.duration, headers
+    )
+    print(
+        f"{summary['requests']} requests in {summary['seconds']:.2f}s over "
+        f"{args.connections} connections, {summary['errors']} errors"
+    )
+    megabytes_per_sec = summary["bytes"] / summary["seconds"] / 1e6
+    print(f"{summary['requests_per_sec']:.0f} requests/sec, {megabytes_per_sec:.1f} MB/s")
+    print(f"latency p50 {summary['p50_ms']:.2f}ms, p99 {summary['p99_ms']:.2f}ms")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,332 @@
+import argparse
 import os
+import shutil
+from build_manifest import build_path
+from dependency_graph import update_dependency_graph
+from dev_server import serve
+import image_size
+from image_size import load_image_sizes
+from link_checker import collect_site_targets, check_links, format_broken_links
+from pipeline import build_pages_pipelined
+from precompress import precompress_public
+from profiling import BuildProfile
+from search_index import update_search_index
+from sharding import parse_shard, merge_shards
+from static_server import build_server_manifest
 from static_to_public import static_to_public
-from template import generate_pages_recursively
+import template
+from template import generate_pages_recursively, generate_pages_incrementally
+from watch import watch
 
 
 def main():
-    static_to_public()
+    args = parse_args()
+    profile = BuildProfile() if args.profile else None
+    template.set_block_cache_size(args.block_cache)
+    template.set_link_collection(args.check_links)
+    template.set_search_collection(args.search_index)
 
     from_content = os.path.join(os.getcwd(), "content")
+    static = os.path.join(os.getcwd(), "static")
     template_path = os.path.join(os.getcwd(), "template.html")
     dest_public = os.path.join(os.getcwd(), "public")
 
-    generate_pages_recursively(from_content, template_path, dest_public)
+    if args.serve:
+        serve(from_content, static, template_path, args.port)
+        return None
 
+    if args.image_sizes:
+        start = profile.start() if profile is not None else None
+        sizes = load_image_sizes(static, build_path("images.json"))
+        dest = args.shard_dest if args.shard is not None else dest_public
+        image_size.set_image_sizes(sizes, dest)
+        if profile is not None:
+            profile.record(None, "image_sizes", start)
 
-main()
+    if args.shard is not None:
+        build_shard(
+            from_content,
+            static,
+            template_path,
+            args.shard_dest,
+            args.shard,
+            args.shard_balance,
+            args.jobs,
+            profile,
+        )
+        if profile is not None:
+            report_profile(profile, args.profile_top)
+        return None
+
+    if len(args.merge_shards) == 0:
+        start = profile.start() if profile is not None else None
+        static_to_public(args.incremental, args.static_hash, args.static_hardlink)
+        if profile is not None:
+            profile.record(None, "static_to_public", start)
+
+    if len(args.merge_shards) != 0:
+        merge_shards(args.merge_shards, dest_public, build_path("shards.json"))
+    elif args.incremental:
+        generate_pages_incrementally(
+            from_content,
+            template_path,
+            dest_public,
+            build_path("pages.json"),
+            args.jobs,
+            profile,
+        )
+    elif args.pipeline:
+        build_pages_pipelined(
+            from_content,
+            template_path,
+            dest_public,
+            args.pipeline_io,
+            args.jobs,
+            args.pipeline_queue,
+        )
+    else:
+        generate_pages_recursively(
+            from_content, template_path, dest_public, args.jobs, profile
+        )
+
+    update_dependency_graph(
+        from_content, template_path, static, dest_public, build_path("deps.json")
+    )
+
+    if args.check_links:
+        start = profile.start() if profile is not None else None
+        targets = collect_site_targets(
+            from_content, dest_public, template.link_targets, build_path("links.json")
+        )
+        broken = check_links(targets, from_content, dest_public, static)
+        if profile is not None:
+            profile.record(None, "check_links", start)
+        if len(broken) != 0:
+            raise Exception(
+                f"{len(broken)} broken link(s):\n{format_broken_links(broken)}"
+            )
+
+    if args.search_index:
+        start = profile.start() if profile is not None else None
+        update_search_index(
+            from_content, dest_public, template.search_terms, build_path("search.json")
+        )
+        if profile is not None:
+            profile.record(None, "search_index", start)
+
+    if args.precompress:
+        start = profile.start() if profile is not None else None
+        precompress_public(dest_public, build_path("precompress.json"), args.jobs)
+        if profile is not None:
+            profile.record(None, "precompress", start)
+
+    if args.server_manifest:
+        build_server_manifest(dest_public, build_path("server.json"))
+
+    if profile is not None:
+        report_profile(profile, args.profile_top)
+
+    if args.watch:
+        watch(
+            from_content,
+            static,
+            template_path,
+            dest_public,
+            hardlink=args.static_hardlink,
+            precompress_manifest=(
+                build_path("precompress.json") if args.precompress else None
+            ),
+        )
+    return None
+
+
+def build_shard(
+    from_content, static, template_path, dest, shard, balance, jobs, profile
+):
+    """Builds shard (i, n) of the pages into a fresh dest; shard 1 also carries the static files"""
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    os.makedirs(dest)
+    if shard[0] == 1:
+        start = profile.start() if profile is not None else None
+        shutil.copytree(static, dest, dirs_exist_ok=True)
+        if profile is not None:
+            profile.record(None, "static_to_public", start)
+    generate_pages_recursively(
+        from_content, template_path, dest, jobs, profile, shard, balance
+    )
+    return None
+
+
+def report_profile(profile, top):
+    if template.block_cache is not None:
+        profile.counters["block_cache"] = template.block_cache.stats()
+    report_path = build_path("profile.json")
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    profile.write_report(report_path)
+    print(profile.summary(top))
+    print(f"Profile written to {report_path}")
+    return None
+
+
+def add_build_flags(parser):
+    """Adds the flags that change what a build writes, shared with src/build_daemon.py"""
+    parser.add_argument(
+        "--static-hash",
+        action="store_true",
+        help="with --incremental, compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--static-hardlink",
+        action="store_true",
+        help="with --incremental, hardlink static files into public instead of copying them",
+    )
+    parser.add_argument(
+        "--block-cache",
+        type=int,
+        default=template.BLOCK_CACHE_SIZE,
+        help="number of rendered blocks reused across pages, 0 disables the cache",
+    )
+    parser.add_argument(
+        "--image-sizes",
+        action="store_true",
+        help="give local images width and height from their headers, and lazy loading",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="fail the build if a link or image points at no generated page or static file",
+    )
+    parser.add_argument(
+        "--search-index",
+        action="store_true",
+        help="write a full-text search index sharded by term prefix into public/search",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write .gz (and .br when brotli is installed) next to changed pages and text assets",
+    )
+    return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build content/ into public/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only re-render pages whose markdown or template changed since the last build",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after building, keep rebuilding the pages and assets that are edited",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="don't build, serve static/ and render pages from content/ as they're requested",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8888,
+        help="port for --serve",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for page generation, 0 for one per CPU core",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="overlap reads, conversion (--jobs workers) and writes, for slow disks",
+    )
+    parser.add_argument(
+        "--pipeline-io",
+        type=int,
+        default=8,
+        help="concurrent reads and concurrent writes in --pipeline mode",
+    )
+    parser.add_argument(
+        "--pipeline-queue",
+        type=int,
+        default=64,
+        help="pages buffered between --pipeline stages",
+    )
+    parser.add_argument(
+        "--shard",
+        help="build only slice i of n (1 <= i <= n) of the pages into --shard-dest",
+    )
+    parser.add_argument(
+        "--shard-balance",
+        action="store_true",
+        help="with --shard, balance shards by markdown size instead of path hash",
+    )
+    parser.add_argument(
+        "--shard-dest",
+        help="output folder for --shard, default public-shard-i-of-n",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        nargs="+",
+        default=[],
+        metavar="SHARD_DIR",
+        help="verify the outputs of every --shard build and combine them into public",
+    )
+    add_build_flags(parser)
+    parser.add_argument(
+        "--server-manifest",
+        action="store_true",
+        help="record ETags, content types and sizes of public for src/static_server.py",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every stage of every page and report the slowest pages",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="number of slowest pages listed by --profile",
+    )
+    args = parser.parse_args()
+    if args.pipeline and (args.incremental or args.profile):
+        parser.error("--pipeline can't be combined with --incremental or --profile")
+    if args.shard is not None:
+        if (
+            args.incremental
+            or args.pipeline
+            or args.watch
+            or args.precompress
+            or args.server_manifest
+            or args.check_links
+            or args.search_index
+            or len(args.merge_shards) != 0
+        ):
+            parser.error(
+                "--shard can't be combined with --incremental, --pipeline, --watch, "
+                "--precompress, --server-manifest, --check-links, --search-index "
+                "or --merge-shards"
+            )
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as error:
+            parser.error(str(error))
+        if args.shard_dest is None:
+            index, count = args.shard
+            args.shard_dest = os.path.join(
+                os.getcwd(), f"public-shard-{index}-of-{count}"
+            )
+    if len(args.merge_shards) != 0 and (args.incremental or args.pipeline):
+        parser.error("--merge-shards can't be combined with --incremental or --pipeline")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Builds pages with file discovery, reads, conversion and writes overlapping"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from filesystem import disk
+import template
+from template import iter_pages, render_page, extract_title, worker_pool, write_page
+
+
+def build_pages_pipelined(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    io_workers=8,
+    convert_workers=1,
+    queue_size=64,
+    fs=disk,
+):
+    """Renders every page under dir_path_content, raising one report if any failed"""
+    failures = asyncio.run(
+        run_pipeline(
+            iter_pages(dir_path_content, dest_dir_path, fs),
+            template_path,
+            io_workers,
+            convert_workers,
+            queue_size,
+            fs,
+        )
+    )
+    if len(failures) != 0:
+        report = "\n".join(f"  {from_path}: {error}" for from_path, error in failures)
+        raise Exception(f"{len(failures)} page(s) failed to generate:\n{report}")
+    return None
+
+
+async def run_pipeline(
+    pages, template_path, io_workers, convert_workers, queue_size, fs=disk
+):
+    """Runs the stages over an iterable of (from_path, dest_path) and returns the failures"""
+    if convert_workers > 1 and fs is not disk:
+        raise Exception("Converting in worker processes needs the disk filesystem")
+    loop = asyncio.get_running_loop()
+    read_queue = asyncio.Queue(queue_size)
+    convert_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+    failures = []
+    # Links and words are collected here, converters in other processes return theirs
+    collecting_links = template.link_targets is not None
+    collecting_search = template.search_terms is not None
+
+    # Threads release the GIL while blocked on disk, but conversion is pure
+    # Python, so more than one converter needs processes.
+    if convert_workers > 1:
+        convert_pool = worker_pool(convert_workers)
+    else:
+        convert_pool = ThreadPoolExecutor(max_workers=1)
+    io_pool = ThreadPoolExecutor(max_workers=io_workers * 2)
+    discover_pool = ThreadPoolExecutor(max_workers=1)
+
+    def discover():
+        for page in pages:
+            asyncio.run_coroutine_threadsafe(read_queue.put(page), loop).result()
+
+    async def discover_stage():
+        try:
+            await loop.run_in_executor(discover_pool, discover)
+        finally:
+            for _ in range(io_workers):
+                await read_queue.put(None)
+
+    async def read(page):
+        from_path, dest_path = page
+        markdown = await loop.run_in_executor(io_pool, read_file, from_path, fs)
+        return (from_path, dest_path, markdown)
+
+    async def convert(item):
+        from_path, dest_path, markdown = item
+        html, title, targets, terms = await loop.run_in_executor(
+            convert_pool,
+            convert_page,
+            markdown,
+            template_path,
+            dest_path,
+            collecting_links,
+            collecting_search,
+            fs,
+        )
+        if targets is not None:
+            template.link_targets[from_path] = targets
+        if terms is not None:
+            template.search_terms[from_path] = (title, terms)
+        return (from_path, dest_path, html)
+
+    async def write(item):
+        from_path, dest_path, html = item
+        await loop.run_in_executor(io_pool, write_file, dest_path, html, fs)
+        print(f"Generated page {dest_path}")
+        return None
+
+    try:
+        await asyncio.gather(
+            discover_stage(),
+            run_stage(
+                read_queue, read, io_workers, convert_queue, convert_workers, failures
+            ),
+            run_stage(
+                convert_queue, convert, convert_workers, write_queue, io_workers, failures
+            ),
+            run_stage(write_queue, write, io_workers, None, 0, failures),
+        )
+    finally:
+        discover_pool.shutdown()
+        io_pool.shutdown()
+        convert_pool.shutdown()
+    return sorted(failures)
+
+
+async def run_stage(queue, handle, workers, next_queue, next_workers, failures):
+    """Runs workers that pass handled items on until each receives a None sentinel"""
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return None
+            try:
+                result = await handle(item)
+            except Exception as error:
+                failures.append((item[0], f"{type(error).__name__}: {error}"))
+                continue
+            if next_queue is not None:
+                await next_queue.put(result)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    finally:
+        # Let the next stage's workers finish once everything before them has
+        for _ in range(next_workers):
+            await next_queue.put(None)
+    return None
+
+
+def convert_page(
+    markdown, template_path, dest_path, collecting_links, collecting_search, fs=disk
+):
+    """Returns the page's (html, title, link targets, search terms), None for what isn't collected"""
+    targets = [] if collecting_links else None
+    terms = {} if collecting_search else None
+    html = render_page(markdown, template_path, dest_path, targets, terms, fs)
+    title = extract_title(markdown) if collecting_search else None
+    return (html, title, targets, terms)
+
+
+def read_file(path, fs=disk):
+    with fs.open(path, "r") as file:
+        return file.read()
+
+
+def write_file(path, text, fs=disk):
+    fs.makedirs(os.path.dirname(path))
+    write_page(path, lambda file: file.write(text), fs)
+    return None
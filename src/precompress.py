@@ -0,0 +1,159 @@
+"""Writes precompressed .gz (and .br) siblings next to public files for gzip_static"""
+
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from build_manifest import load_manifest, save_manifest, file_record
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MANIFEST_VERSION = 1
+COMPRESSIBLE_EXTENSIONS = {
+    ".html",
+    ".css",
+    ".js",
+    ".mjs",
+    ".json",
+    ".svg",
+    ".txt",
+    ".xml",
+    ".map",
+}
+ENCODING_EXTENSIONS = {"gzip": ".gz", "br": ".br"}
+# Below this size the compressed file plus its headers rarely saves anything.
+MIN_COMPRESS_BYTES = 256
+
+
+def available_encodings():
+    if brotli is None:
+        return ["gzip"]
+    return ["gzip", "br"]
+
+
+def precompress_public(public, manifest_path, jobs=1, encodings=None):
+    """Compresses new or changed text files under public and returns their paths."""
+    if encodings is None:
+        encodings = available_encodings()
+    manifest = load_manifest(manifest_path, {})
+    old_files = {}
+    if manifest.get("version") == MANIFEST_VERSION:
+        old_files = manifest["files"]
+
+    files = {}
+    changed = []
+    for rel_path in list_compressible_files(public):
+        path = os.path.join(public, rel_path)
+        old_record = old_files.get(rel_path)
+        record = file_record(path, old_record)
+        if old_record is not None and record["hash"] == old_record["hash"]:
+            record["encodings"] = old_record["encodings"]
+            if siblings_exist(path, record["encodings"]):
+                files[rel_path] = record
+                continue
+        files[rel_path] = record
+        changed.append(rel_path)
+
+    for rel_path, written in compress_files(public, changed, encodings, jobs):
+        files[rel_path]["encodings"] = written
+
+    for rel_path, old_record in old_files.items():
+        if rel_path not in files:
+            remove_siblings(os.path.join(public, rel_path), old_record["encodings"])
+
+    save_manifest(manifest_path, {"version": MANIFEST_VERSION, "files": files})
+    return changed
+
+
+def list_compressible_files(root):
+    """Returns sorted paths, relative to root, of every file worth compressing"""
+    files = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        for file_name in file_names:
+            if not is_compressible(file_name):
+                continue
+            files.append(os.path.relpath(os.path.join(dir_path, file_name), root))
+    return sorted(files)
+
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def siblings_exist(path, encodings):
+    for encoding in encodings:
+        if not os.path.exists(path + ENCODING_EXTENSIONS[encoding]):
+            return False
+    return True
+
+
+def remove_siblings(path, encodings):
+    for encoding in encodings:
+        sibling = path + ENCODING_EXTENSIONS[encoding]
+        if os.path.lexists(sibling):
+            os.remove(sibling)
+    return None
+
+
+def compress_files(public, rel_paths, encodings, jobs=1):
+    """Returns (rel_path, encodings written) for every file compressed"""
+    if jobs > 1 and len(rel_paths) > 1:
+        # Compression is CPU bound, so the files are spread over processes
+        # in a few chunks per worker.
+        chunk_size = max(1, -(-len(rel_paths) // (jobs * 4)))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                compress_file,
+                [os.path.join(public, rel_path) for rel_path in rel_paths],
+                [encodings] * len(rel_paths),
+                chunksize=chunk_size,
+            )
+            return list(zip(rel_paths, results))
+    return [
+        (rel_path, compress_file(os.path.join(public, rel_path), encodings))
+        for rel_path in rel_paths
+    ]
+
+
+def compress_file(path, encodings):
+    """Writes a sibling of path for each encoding that makes it smaller and returns those encodings"""
+    with open(path, "rb") as file:
+        data = file.read()
+    written = []
+    for encoding in ENCODING_EXTENSIONS:
+        sibling = path + ENCODING_EXTENSIONS[encoding]
+        compressed = None
+        if encoding in encodings and len(data) >= MIN_COMPRESS_BYTES:
+            compressed = compress_bytes(data, encoding)
+        if compressed is None or len(compressed) >= len(data):
+            # A stale sibling would be served in place of the new content.
+            if os.path.lexists(sibling):
+                os.remove(sibling)
+            continue
+        write_sibling(path, sibling, compressed)
+        written.append(encoding)
+    return written
+
+
+def compress_bytes(data, encoding):
+    if encoding == "gzip":
+        # mtime=0 keeps the output byte-for-byte reproducible between builds.
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
+def write_sibling(path, sibling, data):
+    temp_path = f"{sibling}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, sibling)
+    # Match the original's mtime so Last-Modified agrees whichever file is served.
+    stat = os.stat(path)
+    os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return None
@@ -0,0 +1,127 @@
+"""Per-stage timings of a build, collected when main.py runs with --profile"""
+
+import json
+import time
+
+PAGE_STAGES = (
+    "read",
+    "extract_title",
+    "block_parsing",
+    # Building each block's nodes, inline markdown included
+    "inline_parsing",
+    "rendering",
+    "template",
+    "write",
+    "streaming",
+)
+
+
+class BuildProfile:
+    def __init__(self):
+        self.pages = {}  # page -> {stage: [wall seconds, cpu seconds, bytes]}
+        self.build_stages = {}  # stage -> [wall seconds, cpu seconds, bytes]
+        self.counters = {}  # name -> {counter: value}, e.g. block cache hits
+
+    def start(self):
+        return (time.perf_counter(), time.process_time())
+
+    def page_timer(self, page):
+        return PageTimer(self, page)
+
+    def record(self, page, stage, start, size=0):
+        """Adds the time since start to page's stage, or to a build stage when page is None"""
+        wall = time.perf_counter() - start[0]
+        cpu = time.process_time() - start[1]
+        stages = self.build_stages if page is None else self.pages.setdefault(page, {})
+        total = stages.setdefault(stage, [0.0, 0.0, 0])
+        total[0] += wall
+        total[1] += cpu
+        total[2] += size
+        return None
+
+    def merge(self, pages):
+        """Adds page timings collected by another process"""
+        for page, stages in pages.items():
+            for stage, (wall, cpu, size) in stages.items():
+                total = self.pages.setdefault(page, {}).setdefault(stage, [0.0, 0.0, 0])
+                total[0] += wall
+                total[1] += cpu
+                total[2] += size
+        return None
+
+    def stage_totals(self):
+        totals = {}
+        for stages in self.pages.values():
+            for stage, (wall, cpu, size) in stages.items():
+                total = totals.setdefault(stage, [0.0, 0.0, 0])
+                total[0] += wall
+                total[1] += cpu
+                total[2] += size
+        return totals
+
+    def slowest_pages(self, top):
+        page_walls = [
+            (sum(stage[0] for stage in stages.values()), page)
+            for page, stages in self.pages.items()
+        ]
+        return sorted(page_walls, reverse=True)[:top]
+
+    def to_json(self):
+        def stage_dict(stages):
+            return {
+                stage: {"wall": wall, "cpu": cpu, "bytes": size}
+                for stage, (wall, cpu, size) in stages.items()
+            }
+
+        return {
+            "build_stages": stage_dict(self.build_stages),
+            "counters": self.counters,
+            "page_stages": stage_dict(self.stage_totals()),
+            "pages": {page: stage_dict(stages) for page, stages in self.pages.items()},
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_json(), file, indent=1, sort_keys=True)
+        return None
+
+    def summary(self, top=10):
+        lines = [f"Build profile of {len(self.pages)} page(s)"]
+        lines.append(f"  {'stage':<16} {'wall ms':>10} {'cpu ms':>10} {'MB':>10}")
+        for stage, (wall, cpu, size) in self.build_stages.items():
+            lines.append(
+                f"  {stage:<16} {wall * 1000:>10.1f} {cpu * 1000:>10.1f} {size / 1_000_000:>10.2f}"
+            )
+        totals = self.stage_totals()
+        for stage in PAGE_STAGES:
+            if stage not in totals:
+                continue
+            wall, cpu, size = totals[stage]
+            lines.append(
+                f"  {stage:<16} {wall * 1000:>10.1f} {cpu * 1000:>10.1f} {size / 1_000_000:>10.2f}"
+            )
+        for name, counters in self.counters.items():
+            values = ", ".join(f"{key} {value}" for key, value in counters.items())
+            lines.append(f"{name}: {values}")
+        lines.append(f"Slowest {top} page(s):")
+        for wall, page in self.slowest_pages(top):
+            lines.append(f"  {wall * 1000:>10.1f} ms  {page}")
+        return "\n".join(lines)
+
+
+class PageTimer:
+    """Times the stages of one page that run interleaved, a slice at a time"""
+
+    __slots__ = ("profile", "page")
+
+    def __init__(self, profile, page):
+        self.profile = profile
+        self.page = page
+
+    def start(self):
+        return self.profile.start()
+
+    def add(self, stage, start, size=0):
+        """Adds the time since start to stage and returns the start of the next slice"""
+        self.profile.record(self.page, stage, start, size)
+        return self.profile.start()
@@ -0,0 +1,187 @@
+"""Writes a full-text search index of the site, sharded by term prefix"""
+
+import json
+import os
+from collections import deque
+
+from build_manifest import load_manifest, save_manifest
+from template import iter_pages, extract_title, markdown_to_html_node
+
+
+SEARCH_MANIFEST_VERSION = 1
+PREFIX_LENGTH = 2
+SEARCH_DIR = "search"
+
+
+def update_search_index(dir_path_content, dest_dir_path, collected, manifest_path):
+    """Brings the index in dest_dir_path/search up to date and returns the prefixes rewritten."""
+    manifest = load_manifest(manifest_path, {})
+    if manifest.get("version") != SEARCH_MANIFEST_VERSION:
+        manifest = {"version": SEARCH_MANIFEST_VERSION, "pages": {}, "table": []}
+    old_pages = manifest["pages"]
+    table = manifest["table"]
+    # Ids of removed pages, handed out again before the table grows
+    free_ids = deque(manifest.get("free", []))
+
+    search_dir = os.path.join(dest_dir_path, SEARCH_DIR)
+    # A full build clears public, the whole index has to be written again
+    rewrite_all = not os.path.exists(os.path.join(search_dir, "pages.json"))
+    table_changed = rewrite_all
+    changed_prefixes = set()
+
+    site_pages = [
+        (os.path.relpath(from_path, dir_path_content), from_path, dest_path)
+        for from_path, dest_path in iter_pages(dir_path_content, dest_dir_path)
+    ]
+    # Removed pages free their ids first, so pages added by the same build reuse them
+    keys = set(key for key, _, _ in site_pages)
+    for key, old_page in old_pages.items():
+        if key in keys:
+            continue
+        table[old_page["id"]] = None
+        free_ids.append(old_page["id"])
+        table_changed = True
+        changed_prefixes.update(changed_term_prefixes(old_page["terms"], {}))
+
+    pages = {}
+    for key, from_path, dest_path in site_pages:
+        stat = os.stat(from_path)
+        old_page = old_pages.get(key)
+        if from_path in collected:
+            title, terms = collected[from_path]
+        elif (
+            old_page is not None
+            and old_page["mtime"] == stat.st_mtime_ns
+            and old_page["size"] == stat.st_size
+        ):
+            title, terms = old_page["title"], old_page["terms"]
+        else:
+            with open(from_path, "r") as file:
+                markdown = file.read()
+            title = extract_title(markdown)
+            terms = {}
+            markdown_to_html_node(markdown, terms=terms)
+
+        url = page_url(dest_path, dest_dir_path)
+        if old_page is None:
+            page_id = allocate_page_id(table, free_ids)
+            old_terms = {}
+        else:
+            page_id = old_page["id"]
+            old_terms = old_page["terms"]
+        if table[page_id] != [url, title]:
+            table[page_id] = [url, title]
+            table_changed = True
+        changed_prefixes.update(changed_term_prefixes(old_terms, terms))
+        pages[key] = {
+            "id": page_id,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "title": title,
+            "terms": terms,
+        }
+
+    if rewrite_all:
+        changed_prefixes = set()
+        for page in pages.values():
+            changed_prefixes.update(term_prefix(term) for term in page["terms"])
+        if os.path.exists(search_dir):
+            remove_shards(search_dir)
+    write_shards(search_dir, pages, changed_prefixes)
+    if table_changed:
+        write_json(
+            os.path.join(search_dir, "pages.json"),
+            {
+                "version": SEARCH_MANIFEST_VERSION,
+                "prefix_length": PREFIX_LENGTH,
+                "pages": table,
+            },
+        )
+
+    save_manifest(
+        manifest_path,
+        {
+            "version": SEARCH_MANIFEST_VERSION,
+            "pages": pages,
+            "table": table,
+            "free": list(free_ids),
+        },
+    )
+    return sorted(changed_prefixes)
+
+
+def page_url(dest_path, dest_dir_path):
+    """Returns the URL a page is served at, folder URLs for index.html"""
+    url = "/" + os.path.relpath(dest_path, dest_dir_path).replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        return url[: -len("index.html")]
+    return url
+
+
+def allocate_page_id(table, free_ids):
+    """Reuses the slot of a removed page from free_ids, or appends one"""
+    if len(free_ids) != 0:
+        page_id = free_ids.popleft()
+        table[page_id] = []
+        return page_id
+    table.append([])
+    return len(table) - 1
+
+
+def term_prefix(term):
+    return term[:PREFIX_LENGTH]
+
+
+def changed_term_prefixes(old_terms, terms):
+    prefixes = set()
+    for term, weight in terms.items():
+        if old_terms.get(term) != weight:
+            prefixes.add(term_prefix(term))
+    for term in old_terms:
+        if term not in terms:
+            prefixes.add(term_prefix(term))
+    return prefixes
+
+
+def write_shards(search_dir, pages, prefixes):
+    """Rewrites the shard of every prefix from the pages' terms, removing shards left empty"""
+    if len(prefixes) == 0:
+        return None
+    shards = {prefix: {} for prefix in prefixes}
+    for page in pages.values():
+        for term, weight in page["terms"].items():
+            shard = shards.get(term_prefix(term))
+            if shard is not None:
+                shard.setdefault(term, []).append([page["id"], weight])
+
+    terms_dir = os.path.join(search_dir, "terms")
+    os.makedirs(terms_dir, exist_ok=True)
+    for prefix, shard in shards.items():
+        path = os.path.join(terms_dir, f"{prefix}.json")
+        if len(shard) == 0:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        for postings in shard.values():
+            postings.sort(key=lambda posting: (-posting[1], posting[0]))
+        write_json(path, shard)
+    return None
+
+
+def remove_shards(search_dir):
+    terms_dir = os.path.join(search_dir, "terms")
+    if not os.path.exists(terms_dir):
+        return None
+    for file_name in os.listdir(terms_dir):
+        os.remove(os.path.join(terms_dir, file_name))
+    return None
+
+
+def write_json(path, data):
+    """Writes compact JSON atomically, so a browser never fetches a half written shard"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(data, file, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return None
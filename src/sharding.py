@@ -0,0 +1,178 @@
+"""Splits one site's pages across independent builds and merges their outputs back together"""
+
+import heapq
+import os
+import shutil
+
+from build_manifest import load_manifest, save_manifest, hash_bytes, hash_file
+from static_to_public import list_files, copy_file
+
+
+SHARD_MANIFEST_VERSION = 1
+SHARD_MANIFEST_NAME = ".shard.json"
+
+
+def parse_shard(text):
+    """Returns (index, count) for "i/n", where shards are numbered 1 to n"""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard: {text}, expected i/n") from None
+    if count < 1 or index < 1 or index > count:
+        raise ValueError(f"Invalid shard: {text}, expected 1 <= i <= n")
+    return index, count
+
+
+def shard_of(rel_path, count):
+    """Returns the 1-based shard rel_path falls in, the same on every machine"""
+    digest = hash_bytes(rel_path.replace(os.sep, "/").encode("utf-8"))
+    return int(digest[:16], 16) % count + 1
+
+
+def assign_shards(pages, dir_path_content, count, balance=False):
+    """Returns {from_path: shard} for (from_path, dest_path) pairs."""
+    if not balance:
+        return {
+            from_path: shard_of(os.path.relpath(from_path, dir_path_content), count)
+            for from_path, dest_path in pages
+        }
+    sizes = [
+        (-os.path.getsize(from_path), os.path.relpath(from_path, dir_path_content), from_path)
+        for from_path, dest_path in pages
+    ]
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    shards = {}
+    for negative_size, rel_path, from_path in sorted(sizes):
+        load, shard = heapq.heappop(loads)
+        shards[from_path] = shard
+        heapq.heappush(loads, (load - negative_size, shard))
+    return shards
+
+
+def shard_pages(pages, dir_path_content, index, count, balance=False):
+    """Returns the pairs of pages that shard index of count builds"""
+    shards = assign_shards(pages, dir_path_content, count, balance)
+    return [page for page in pages if shards[page[0]] == index]
+
+
+def write_shard_manifest(
+    dest_dir_path, shard, dir_path_content, all_pages, pages, balance=False
+):
+    """Records every file in a shard's output so merge_shards can check it."""
+    index, count = shard
+    files = {}
+    for rel_path in list_files(dest_dir_path):
+        if rel_path == SHARD_MANIFEST_NAME:
+            continue
+        path = os.path.join(dest_dir_path, rel_path)
+        files[rel_path] = {"size": os.path.getsize(path), "hash": hash_file(path)}
+    manifest = {
+        "version": SHARD_MANIFEST_VERSION,
+        "shard": [index, count],
+        "balance": balance,
+        "sources": sorted(
+            os.path.relpath(from_path, dir_path_content) for from_path, _ in all_pages
+        ),
+        "pages": {
+            os.path.relpath(from_path, dir_path_content): os.path.relpath(
+                dest_path, dest_dir_path
+            )
+            for from_path, dest_path in pages
+        },
+        "files": files,
+    }
+    save_manifest(os.path.join(dest_dir_path, SHARD_MANIFEST_NAME), manifest)
+    return manifest
+
+
+def merge_shards(shard_dirs, dest_dir_path, manifest_path=None):
+    """Replaces dest_dir_path with every shard's output once all shards are verified."""
+    manifests = []
+    problems = []
+    for shard_dir in shard_dirs:
+        manifest = load_manifest(os.path.join(shard_dir, SHARD_MANIFEST_NAME))
+        if manifest is None or manifest.get("version") != SHARD_MANIFEST_VERSION:
+            problems.append(f"{shard_dir}: no shard manifest")
+            continue
+        manifests.append((shard_dir, manifest))
+    if len(problems) == 0:
+        problems = verify_shards(manifests)
+    if len(problems) != 0:
+        report = "\n".join(f"  {problem}" for problem in problems)
+        raise Exception(f"{len(problems)} problem(s) merging shards:\n{report}")
+
+    if os.path.exists(dest_dir_path):
+        shutil.rmtree(dest_dir_path)
+    os.makedirs(dest_dir_path)
+    merged = {}
+    for shard_dir, manifest in manifests:
+        for rel_path, record in manifest["files"].items():
+            dest = os.path.join(dest_dir_path, rel_path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            copy_file(os.path.join(shard_dir, rel_path), dest)
+            merged[rel_path] = dict(record, shard=manifest["shard"][0])
+    if manifest_path is not None:
+        save_manifest(
+            manifest_path,
+            {
+                "version": SHARD_MANIFEST_VERSION,
+                "count": manifests[0][1]["shard"][1],
+                "files": merged,
+            },
+        )
+    return merged
+
+
+def verify_shards(manifests):
+    """Returns a description of everything that would make (shard_dir, manifest) pairs merge wrongly"""
+    problems = []
+    count = manifests[0][1]["shard"][1]
+    sources = manifests[0][1]["sources"]
+
+    seen_shards = {}
+    for shard_dir, manifest in manifests:
+        index, shard_count = manifest["shard"]
+        if shard_count != count:
+            problems.append(f"{shard_dir}: built as one of {shard_count} shards, not {count}")
+        if manifest["sources"] != sources:
+            problems.append(f"{shard_dir}: built from different content than the other shards")
+        if index in seen_shards:
+            problems.append(f"{shard_dir}: shard {index} is also {seen_shards[index]}")
+        seen_shards[index] = shard_dir
+    for index in range(1, count + 1):
+        if index not in seen_shards:
+            problems.append(f"shard {index}/{count} is missing")
+
+    page_shards = {}
+    file_shards = {}
+    for shard_dir, manifest in manifests:
+        for source, output in manifest["pages"].items():
+            page_shards.setdefault(source, []).append(shard_dir)
+            if output not in manifest["files"]:
+                problems.append(f"{shard_dir}: {source} has no output {output}")
+        for rel_path, record in manifest["files"].items():
+            file_shards.setdefault(rel_path, []).append(shard_dir)
+            problems.extend(check_shard_file(shard_dir, rel_path, record))
+        for rel_path in list_files(shard_dir):
+            if rel_path != SHARD_MANIFEST_NAME and rel_path not in manifest["files"]:
+                problems.append(f"{shard_dir}: {rel_path} isn't in the shard manifest")
+
+    for source in sources:
+        if source not in page_shards:
+            problems.append(f"{source} wasn't built by any shard")
+    for source, shard_dirs in sorted(page_shards.items()):
+        if len(shard_dirs) > 1:
+            problems.append(f"{source} was built by {', '.join(shard_dirs)}")
+    for rel_path, shard_dirs in sorted(file_shards.items()):
+        if len(shard_dirs) > 1:
+            problems.append(f"{rel_path} was written by {', '.join(shard_dirs)}")
+    return problems
+
+
+def check_shard_file(shard_dir, rel_path, record):
+    path = os.path.join(shard_dir, rel_path)
+    if not os.path.exists(path):
+        return [f"{shard_dir}: {rel_path} is missing"]
+    if os.path.getsize(path) != record["size"] or hash_file(path) != record["hash"]:
+        return [f"{shard_dir}: {rel_path} doesn't match the shard manifest"]
+    return []
@@ -0,0 +1,21 @@
+"""Resolves URLs written in pages to paths under the site root"""
+
+import posixpath
+from urllib.parse import urlsplit, unquote
+
+
+def resolve_url(url, page_dir):
+    """Returns url's path relative to the site root ("" for the root itself), or None if it leaves the site"""
+    parts = urlsplit(url)
+    if parts.scheme != "" or parts.netloc != "" or parts.path == "":
+        return None
+    url_path = unquote(parts.path)
+    if url_path.startswith("/"):
+        path = posixpath.normpath(url_path.lstrip("/") or ".")
+    else:
+        path = posixpath.normpath(posixpath.join(page_dir, url_path))
+    if path == ".":
+        return ""
+    if path == ".." or path.startswith("../"):
+        return None
+    return path
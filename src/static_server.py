@@ -0,0 +1,309 @@
+"""Production server for public/ that answers from a manifest of precomputed headers"""
+
+import argparse
+import email.utils
+import mimetypes
+import os
+import time
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+from build_manifest import build_path, load_manifest, save_manifest, file_record
+from dev_server import etag_matches
+from static_to_public import list_files
+
+SERVER_MANIFEST_VERSION = 1
+# Sibling extension -> Content-Encoding, in order of preference
+ENCODINGS = {".br": "br", ".gz": "gzip"}
+TEXT_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def build_server_manifest(public, manifest_path):
+    """Records the size, mtime, hash and type of every file in public."""
+    old_manifest = load_manifest(manifest_path, {})
+    old_files = {}
+    if old_manifest.get("version") == SERVER_MANIFEST_VERSION:
+        old_files = old_manifest["files"]
+
+    rel_paths = list_files(public)
+    present = set(rel_paths)
+    files = {}
+    for rel_path in rel_paths:
+        base, extension = os.path.splitext(rel_path)
+        if extension in ENCODINGS and base in present:
+            # A precompressed sibling, recorded under the original
+            continue
+        if rel_path.endswith(".tmp"):
+            continue
+        url = "/" + rel_path.replace(os.sep, "/")
+        old_entry = old_files.get(url, {})
+        entry = file_record(os.path.join(public, rel_path), old_entry.get("file"))
+        variants = {}
+        for sibling_extension, encoding in ENCODINGS.items():
+            sibling = rel_path + sibling_extension
+            if sibling not in present:
+                continue
+            variants[encoding] = file_record(
+                os.path.join(public, sibling),
+                old_entry.get("encodings", {}).get(encoding),
+            )
+        files[url] = {
+            "file": entry,
+            "type": content_type(rel_path),
+            "encodings": variants,
+        }
+
+    manifest = {"version": SERVER_MANIFEST_VERSION, "files": files}
+    save_manifest(manifest_path, manifest)
+    return manifest
+
+
+def content_type(path):
+    guessed = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if guessed.startswith(TEXT_TYPES):
+        return f"{guessed}; charset=utf-8"
+    return guessed
+
+
+class Representation:
+    """One file the server can send for a URL, with the headers every response for it shares"""
+
+    __slots__ = ("path", "size", "etag", "headers")
+
+    def __init__(self, path, record, content_type, encoding=None, vary=False):
+        self.path = path
+        self.size = record["size"]
+        self.etag = f'"{record["hash"][:32]}"'
+        last_modified = email.utils.formatdate(record["mtime"] / 1e9, usegmt=True)
+        headers = [
+            f"Content-Type: {content_type}",
+            f"ETag: {self.etag}",
+            f"Last-Modified: {last_modified}",
+            "Cache-Control: no-cache",
+            "Accept-Ranges: bytes",
+        ]
+        if encoding is not None:
+            headers.append(f"Content-Encoding: {encoding}")
+        if vary:
+            headers.append("Vary: Accept-Encoding")
+        self.headers = "".join(f"{header}\r\n" for header in headers)
+
+
+def load_routes(public, manifest):
+    """Returns {url: (identity Representation, {encoding: Representation})}"""
+    routes = {}
+    for url, entry in manifest["files"].items():
+        path = os.path.join(public, *url.lstrip("/").split("/"))
+        vary = len(entry["encodings"]) != 0
+        identity = Representation(path, entry["file"], entry["type"], vary=vary)
+        encoded = {}
+        for sibling_extension, encoding in ENCODINGS.items():
+            record = entry["encodings"].get(encoding)
+            if record is not None:
+                encoded[encoding] = Representation(
+                    path + sibling_extension, record, entry["type"], encoding, vary
+                )
+        routes[url] = (identity, encoded)
+    return routes
+
+
+class StaticServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, public, manifest):
+        super().__init__(address, StaticRequestHandler)
+        self.routes = load_routes(public, manifest)
+
+
+class StaticRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Drop idle keep-alive connections instead of holding their threads forever
+    timeout = 30
+    # The headers and the sendfile body go out as separate writes, Nagle would hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.respond(send_body=True)
+        return None
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+        return None
+
+    def log_message(self, format, *args):
+        # Logging every request costs more than serving it
+        return None
+
+    def respond(self, send_body):
+        url = unquote(urlsplit(self.path).path)
+        if url.endswith("/"):
+            url += "index.html"
+        route = self.server.routes.get(url)
+        if route is None:
+            if url + "/index.html" in self.server.routes:
+                self.send_status(HTTPStatus.MOVED_PERMANENTLY, {"Location": url + "/"})
+            else:
+                self.send_status(HTTPStatus.NOT_FOUND)
+            return None
+
+        representation = self.choose_representation(*route)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None and etag_matches(if_none_match, representation.etag):
+            self.write_head(HTTPStatus.NOT_MODIFIED, representation.headers)
+            return None
+
+        byte_range = None
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header is not None and (if_range is None or if_range == representation.etag):
+            byte_range = parse_range(range_header, representation.size)
+            if byte_range == "unsatisfiable":
+                self.send_status(
+                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                    {"Content-Range": f"bytes */{representation.size}"},
+                )
+                return None
+
+        try:
+            file = open(representation.path, "rb")
+        except OSError:
+            self.send_status(HTTPStatus.NOT_FOUND)
+            return None
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            if size != representation.size:
+                # public changed since the manifest was written
+                self.send_status(HTTPStatus.SERVICE_UNAVAILABLE)
+                return None
+            if byte_range is None:
+                start, length = 0, size
+                self.write_head(
+                    HTTPStatus.OK, representation.headers, f"Content-Length: {size}\r\n"
+                )
+            else:
+                start, end = byte_range
+                length = end - start + 1
+                self.write_head(
+                    HTTPStatus.PARTIAL_CONTENT,
+                    representation.headers,
+                    f"Content-Length: {length}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n",
+                )
+            if send_body and length > 0:
+                # socket.sendfile uses os.sendfile, the body goes straight from the page cache
+                self.connection.sendfile(file, start, length)
+        return None
+
+    def choose_representation(self, identity, encoded):
+        if len(encoded) == 0:
+            return identity
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding", ""))
+        for encoding in ENCODINGS.values():
+            if encoding in encoded and encoding in accepted:
+                return encoded[encoding]
+        return identity
+
+    def write_head(self, status, headers, extra=""):
+        """Writes the status line and headers in one go, skipping send_header's per-line overhead"""
+        connection = "close" if self.close_connection else "keep-alive"
+        head = (
+            f"{self.protocol_version} {status.value} {status.phrase}\r\n"
+            f"Date: {http_date()}\r\n"
+            f"Connection: {connection}\r\n"
+            f"{headers}{extra}\r\n"
+        )
+        self.log_request(status.value)
+        self.wfile.write(head.encode("latin-1"))
+        return None
+
+    def send_status(self, status, headers=None):
+        extra = "".join(f"{key}: {value}\r\n" for key, value in (headers or {}).items())
+        self.write_head(status, extra, "Content-Length: 0\r\n")
+        return None
+
+
+def accepted_encodings(accept_encoding):
+    """Returns the content codings the client accepts (q > 0)"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        coding = parts[0].lower()
+        quality = 1.0
+        for parameter in parts[1:]:
+            if parameter.startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        if coding != "" and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def parse_range(range_header, size):
+    """Returns (first, last) byte of a single bytes range, None to ignore it, or "unsatisfiable"."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if dash == "":
+        return None
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                return "unsatisfiable"
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = size - 1 if last == "" else min(int(last), size - 1)
+    except ValueError:
+        return None
+    if start < 0 or start >= size or end < start:
+        return "unsatisfiable"
+    return start, end
+
+
+date_cache = [0, ""]
+
+
+def http_date():
+    """Returns the current Date header value, formatted at most once a second"""
+    now = int(time.time())
+    if date_cache[0] != now:
+        date_cache[0] = now
+        date_cache[1] = email.utils.formatdate(now, usegmt=True)
+    return date_cache[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve public/ from a precomputed manifest")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--public", default=os.path.join(os.getcwd(), "public"))
+    parser.add_argument("--manifest", default=build_path("server.json"))
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    if manifest is None or manifest.get("version") != SERVER_MANIFEST_VERSION:
+        print(f"No server manifest at {args.manifest}, writing one")
+        manifest = build_server_manifest(args.public, args.manifest)
+
+    server = StaticServer((args.host, args.port), args.public, manifest)
+    print(
+        f"Serving {len(server.routes)} files from {args.public} on "
+        f"http://{args.host}:{server.server_port}, press Ctrl+C to stop"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return None
+
+
+if __name__ == "__main__":
+    main()
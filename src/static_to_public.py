@@ -1,31 +1,160 @@
 import os
 import shutil
 
+from build_manifest import build_path, load_manifest, save_manifest, hash_file
+from filesystem import disk
 
-def static_to_public():
-    clear_public_folder()
-    copy_static_to_public()
+
+def static_to_public(
+    incremental=False, use_hash=False, hardlink=False, root=None, fs=disk
+):
+    """Copies root/static (the working directory by default) into root/public through fs"""
+    if root is None:
+        root = os.getcwd()
+    static = os.path.join(root, "static")
+    public = os.path.join(root, "public")
+    if incremental:
+        if fs is not disk:
+            raise Exception("Incremental static sync needs the disk filesystem")
+        sync_static_to_public(
+            static, public, build_path("static.json"), use_hash, hardlink
+        )
+        return None
+    clear_public_folder(public, fs)
+    copy_static_to_public(static, public, fs)
     # Logging the path of each file you copy, so you can see what's happening as you run and debug your code.
     return None
 
 
-def clear_public_folder():
+def clear_public_folder(path=None, fs=disk):
     """Clears the public folder and returns that it exists"""
-    path = os.path.join(os.getcwd(), "public")
-    if os.path.exists(path):
-        shutil.rmtree(path)
-    os.mkdir(path)
+    if path is None:
+        path = os.path.join(os.getcwd(), "public")
+    if fs.exists(path):
+        fs.rmtree(path)
+    fs.makedirs(path)
     return None
 
 
-def copy_static_to_public():
-    static = os.path.join(os.getcwd(), "static")
-    public = os.path.join(os.getcwd(), "public")
+def copy_static_to_public(static=None, public=None, fs=disk):
+    if static is None:
+        static = os.path.join(os.getcwd(), "static")
+    if public is None:
+        public = os.path.join(os.getcwd(), "public")
 
-    if not os.path.exists(static):
+    if not fs.exists(static):
         raise Exception("Static folder doesn't exist")
-    if not os.path.exists(public):
+    if not fs.exists(public):
         raise Exception("Public folder doesn't exist")
 
-    shutil.copytree(static, public, dirs_exist_ok=True)
+    fs.copytree(static, public)
+    return None
+
+
+def sync_static_to_public(static, public, manifest_path, use_hash=False, hardlink=False):
+    """Copies new or changed static files into public and removes deleted ones."""
+    if not os.path.exists(static):
+        raise Exception("Static folder doesn't exist")
+    os.makedirs(public, exist_ok=True)
+
+    old_files = load_manifest(manifest_path, {"files": []})["files"]
+    files = list_files(static)
+    copied = []
+    for rel_path in files:
+        src = os.path.join(static, rel_path)
+        dest = os.path.join(public, rel_path)
+        if not asset_changed(src, dest, use_hash):
+            continue
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if hardlink:
+            link_file(src, dest)
+        else:
+            copy_file(src, dest)
+        copied.append(rel_path)
+
+    current = set(files)
+    for rel_path in old_files:
+        if rel_path in current:
+            continue
+        remove_orphan(public, rel_path)
+
+    save_manifest(manifest_path, {"files": files})
+    return copied
+
+
+def list_files(root):
+    """Returns sorted paths of every file under root, relative to root"""
+    files = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        for file_name in file_names:
+            files.append(os.path.relpath(os.path.join(dir_path, file_name), root))
+    return sorted(files)
+
+
+def asset_changed(src, dest, use_hash=False):
+    if not os.path.exists(dest):
+        return True
+    src_stat = os.stat(src)
+    dest_stat = os.stat(dest)
+    if src_stat.st_size != dest_stat.st_size:
+        return True
+    if src_stat.st_ino == dest_stat.st_ino and src_stat.st_dev == dest_stat.st_dev:
+        return False
+    if use_hash:
+        return hash_file(src) != hash_file(dest)
+    return src_stat.st_mtime_ns != dest_stat.st_mtime_ns
+
+
+def copy_file(src, dest):
+    """Copies src to dest atomically, sharing extents (reflinks) where the kernel can."""
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return None
+    temp_path = f"{dest}.tmp"
+    try:
+        try:
+            copy_file_range(src, temp_path)
+        except (AttributeError, OSError):
+            shutil.copyfile(src, temp_path)
+        shutil.copystat(src, temp_path)
+        os.replace(temp_path, dest)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return None
+
+
+def copy_file_range(src, dest):
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        remaining = os.fstat(src_file.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(
+                src_file.fileno(), dest_file.fileno(), remaining
+            )
+            if copied == 0:
+                break
+            remaining -= copied
+    return None
+
+
+def link_file(src, dest):
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        # Hardlinks don't work across filesystems
+        copy_file(src, dest)
+    return None
+
+
+def remove_orphan(public, rel_path):
+    path = os.path.join(public, rel_path)
+    if os.path.lexists(path):
+        print(f"Removing deleted static file: {path}")
+        os.remove(path)
+    # Clean up directories the removal left empty
+    parent = os.path.dirname(path)
+    while parent != public and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
     return None
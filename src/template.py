@@ -2,9 +2,42 @@
 
 import re
 import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 
-from block_handling import markdown_to_text_blocks, block_to_html_node
-from htmlnode import ParentNode
+from block_handling import (
+    BlockCache,
+    iter_blocks,
+    iter_numbered_blocks,
+    block_lines_to_html_node,
+    block_link_targets,
+    block_search_terms,
+    add_search_terms,
+)
+from build_manifest import load_manifest, save_manifest, file_record
+from filesystem import disk
+from htmlnode import HTMLNode, LeafNode, ParentNode
+import image_size
+from profiling import BuildProfile
+from sharding import shard_pages, write_shard_manifest
+
+MANIFEST_VERSION = 1
+TEMPLATE_SLOT_REGEX = re.compile(r"\{\{ (Title|Content) \}\}")
+
+# fs -> {template_path: (mtime, plan)}, dropped with the filesystem it was read from
+template_plans = weakref.WeakKeyDictionary()
+
+# Pages bigger than this are converted block by block straight to disk
+STREAM_PAGE_BYTES = 16 * 1024 * 1024
+
+BLOCK_CACHE_SIZE = 4096
+# Rendered blocks shared by every page of a build, None when disabled
+block_cache = BlockCache(BLOCK_CACHE_SIZE)
+
+# from_path -> [(line, tag, url)] for every page generated, None when not collecting
+link_targets = None
+# from_path -> (title, {term: weight}) for every page generated, None when not collecting
+search_terms = None
 
 
 def extract_title(markdown):
@@ -15,48 +48,453 @@ def extract_title(markdown):
     return titles[0]
 
 
+def extract_title_from_lines(lines):
+    """extract_title for markdown read one line at a time"""
+    title = None
+    count = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("# ") and len(line) > 2:
+            count += 1
+            if title is None:
+                title = line[2:]
+    if count != 1:
+        raise Exception("Title was not found")
+    return title
+
+
 def convert_markdown_to_html(markdown):
-    blocks = markdown_to_text_blocks(markdown)
-    html_node = ParentNode("div", [block_to_html_node(block) for block in blocks])
+    html_node = markdown_to_html_node(markdown)
     html = html_node.to_html()
     return html
 
 
-def generate_page(from_path, template_path, dest_path):
+def markdown_to_html_node(markdown, targets=None, terms=None, images=None, timer=None):
+    """Converts markdown to a div node, collecting its links and words when asked."""
+    if timer is not None:
+        start = timer.start()
+        blocks = list(iter_numbered_blocks(markdown.split("\n")))
+        timer.add("block_parsing", start, len(markdown))
+        return ParentNode(
+            "div", numbered_blocks_to_html_nodes(blocks, targets, terms, images, timer)
+        )
+    if targets is not None or terms is not None:
+        blocks = iter_numbered_blocks(markdown.split("\n"))
+        return ParentNode(
+            "div", numbered_blocks_to_html_nodes(blocks, targets, terms, images)
+        )
+    blocks = iter_blocks(markdown.split("\n"))
+    return ParentNode("div", blocks_to_html_nodes(blocks, images))
+
+
+def blocks_to_html_nodes(blocks, images=None):
+    """Converts (BlockType, lines) pairs to nodes, reusing cached fragments for repeated blocks"""
+    if block_cache is None:
+        return [
+            block_lines_to_html_node(block_type, lines, images)
+            for block_type, lines in blocks
+        ]
+    # Cached html is spliced in as raw text leaves instead of rebuilding node trees
+    return [
+        LeafNode(None, block_cache.render(block_type, lines, images))
+        for block_type, lines in blocks
+    ]
+
+
+def numbered_blocks_to_html_nodes(
+    blocks, targets=None, terms=None, images=None, timer=None
+):
+    """blocks_to_html_nodes for (line, BlockType, lines) blocks that also collects their links and words"""
+    nodes = []
+    for first_line, block_type, lines in blocks:
+        if block_cache is None:
+            start = timer.start() if timer is not None else None
+            node = block_lines_to_html_node(block_type, lines, images)
+            collect_block(node, first_line, block_type, lines, targets, terms)
+            if timer is not None:
+                timer.add("inline_parsing", start)
+        else:
+            html, block_targets, block_terms = block_cache.render_fragment(
+                block_type, lines, images, timer
+            )
+            node = LeafNode(None, html)
+            if targets is not None:
+                for offset, tag, url in block_targets:
+                    targets.append((first_line + offset, tag, url))
+            if terms is not None:
+                add_search_terms(terms, block_type, block_terms)
+        nodes.append(node)
+    return nodes
+
+
+def collect_block(node, first_line, block_type, lines, targets=None, terms=None):
+    """Adds an uncached block's links to targets and its words to terms"""
+    if targets is not None:
+        for offset, tag, url in block_link_targets(node, lines):
+            targets.append((first_line + offset, tag, url))
+    if terms is not None:
+        add_search_terms(terms, block_type, block_search_terms(node))
+    return None
+
+
+def set_block_cache_size(max_size):
+    """Replaces the block cache with an empty one of max_size blocks, 0 disables it"""
+    global block_cache
+    block_cache = BlockCache(max_size) if max_size > 0 else None
+    return None
+
+
+def block_cache_size():
+    return 0 if block_cache is None else block_cache.max_size
+
+
+def worker_pool(workers, mp_context=None):
+    """Returns a process pool whose workers start with this process's cache and image settings."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=start_worker,
+        initargs=(
+            block_cache_size(),
+            (image_size.image_sizes, image_size.public_root),
+        ),
+    )
+
+
+def start_worker(cache_size, image_sizes):
+    set_block_cache_size(cache_size)
+    image_size.set_image_sizes(*image_sizes)
+    return None
+
+
+def set_link_collection(enabled):
+    """Starts (or stops) recording every generated page's links and images in link_targets"""
+    global link_targets
+    link_targets = {} if enabled else None
+    return None
+
+
+def set_search_collection(enabled):
+    """Starts (or stops) recording every generated page's title and word weights in search_terms"""
+    global search_terms
+    search_terms = {} if enabled else None
+    return None
+
+
+def generate_page(from_path, template_path, dest_path, profile=None, fs=disk):
+    """Renders from_path into dest_path, reading and writing through fs"""
     print(
         f"Generating page \nfrom:  {from_path} \nto:    {dest_path} \nusing: {template_path}"
     )
 
-    if not os.path.exists(from_path):
+    if not fs.exists(from_path):
         raise Exception(f"Missing From: {from_path}")
-    if not os.path.exists(template_path):
+    if not fs.exists(template_path):
         raise Exception(f"Missing Template: {template_path}")
-    if not os.path.exists(dest_path):
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    if not fs.exists(dest_path):
+        fs.makedirs(os.path.dirname(dest_path))
+    images = image_size.page_images(dest_path)
+    targets = [] if link_targets is not None else None
+    terms = {} if search_terms is not None else None
+    size = fs.getsize(from_path)
+    if size > STREAM_PAGE_BYTES:
+        start = profile.start() if profile is not None else None
+        title = generate_page_streaming(
+            from_path, template_path, dest_path, targets, terms, fs, images
+        )
+        if profile is not None:
+            profile.record(from_path, "streaming", start, size)
+    else:
+        title = generate_page_content(
+            from_path, template_path, dest_path, targets, terms, fs, profile, images
+        )
+    if targets is not None:
+        link_targets[from_path] = targets
+    if terms is not None:
+        search_terms[from_path] = (title, terms)
+    return None
+
 
+def generate_page_content(
+    from_path,
+    template_path,
+    dest_path,
+    targets=None,
+    terms=None,
+    fs=disk,
+    profile=None,
+    images=None,
+):
+    """Writes the page and returns its title, timing each stage into profile when given"""
+    start = profile.start() if profile is not None else None
     markdown = ""
-    with open(from_path, "r") as file:
+    with fs.open(from_path, "r") as file:
         markdown = file.read()
+    if profile is not None:
+        profile.record(from_path, "read", start, len(markdown))
+
+    start = profile.start() if profile is not None else None
+    title = extract_title(markdown)
+    if profile is not None:
+        profile.record(from_path, "extract_title", start)
+
+    timer = profile.page_timer(from_path) if profile is not None else None
+    content = markdown_to_html_node(markdown, targets, terms, images, timer)
+    if profile is not None:
+        # Rendered apart from the write so the two are timed separately
+        start = profile.start()
+        content = content.to_html()
+        profile.record(from_path, "rendering", start, len(content))
+
+    start = profile.start() if profile is not None else None
+    plan = compile_template(template_path, fs)
+    if profile is not None:
+        profile.record(from_path, "template", start)
+
+    # Without a profile, rendering is streamed straight into the file
+    start = profile.start() if profile is not None else None
+    write_page(
+        dest_path,
+        lambda file: write_template(plan, {"Title": title, "Content": content}, file),
+        fs,
+    )
+    if profile is not None:
+        profile.record(from_path, "write", start, fs.getsize(dest_path))
+    return title
 
-    template = ""
-    with open(template_path, "r") as file:
-        template = file.read()
 
+def render_page(
+    markdown, template_path, dest_path=None, targets=None, terms=None, fs=disk
+):
+    """Returns the page generate_page would write for markdown, as a string."""
+    plan = compile_template(template_path, fs)
     title = extract_title(markdown)
-    content = convert_markdown_to_html(markdown)
-    title_string = "{{ Title }}"
-    content_string = "{{ Content }}"
+    images = image_size.page_images(dest_path) if dest_path is not None else None
+    content = markdown_to_html_node(markdown, targets, terms, images)
+    return render_template(plan, {"Title": title, "Content": content})
+
+
+def generate_page_streaming(
+    from_path, template_path, dest_path, targets=None, terms=None, fs=disk, images=None
+):
+    """generate_page for very large markdown files, converting them block by block."""
+    with fs.open(from_path, "r") as file:
+        title = extract_title_from_lines(file)
+
+    plan = compile_template(template_path, fs)
+
+    def write(file):
+        for i, segment in enumerate(plan):
+            if i % 2 == 0:
+                file.write(segment)
+            elif segment == "Content":
+                write_markdown_file_html(from_path, file, targets, terms, fs, images)
+            else:
+                file.write(title)
+        return None
+
+    write_page(dest_path, write, fs)
+    return title
 
-    template = title.join(template.split(title_string))
-    template = content.join(template.split(content_string))
 
-    with open(dest_path, "w+") as file:
-        file.write(template)
+def write_page(dest_path, write, fs=disk):
+    """Calls write(file) on a temporary file next to dest_path and moves it into place."""
+    temp_path = f"{dest_path}.tmp"
+    try:
+        with fs.open(temp_path, "w") as file:
+            write(file)
+        fs.replace(temp_path, dest_path)
+    finally:
+        if fs.exists(temp_path):
+            fs.remove(temp_path)
     return None
 
 
-def generate_pages_recursively(dir_path_content, template_path, dest_dir_path):
-    contents = os.scandir(dir_path_content)
+def write_markdown_file_html(
+    from_path, file, targets=None, terms=None, fs=disk, images=None
+):
+    """Writes the markdown file's content html, converting one block at a time"""
+    file.write("<div>")
+    with fs.open(from_path, "r") as markdown_file:
+        for first_line, block_type, lines in iter_numbered_blocks(markdown_file):
+            node = block_lines_to_html_node(block_type, lines, images)
+            collect_block(node, first_line, block_type, lines, targets, terms)
+            node.write_html(file)
+    file.write("</div>")
+    return None
+
+
+def compile_template(template_path, fs=disk):
+    """Returns the parsed template plan, re-reading the file only when its mtime changes"""
+    mtime = fs.mtime_ns(template_path)
+    plans = template_plans.setdefault(fs, {})
+    cached = plans.get(template_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with fs.open(template_path, "r") as file:
+        plan = parse_template(file.read())
+    plans[template_path] = (mtime, plan)
+    return plan
+
+
+def parse_template(template):
+    """Splits a template into literal segments (even indexes) and slot names (odd indexes)."""
+    return tuple(TEMPLATE_SLOT_REGEX.split(template))
+
+
+def render_template(plan, slots):
+    return "".join(
+        segment if i % 2 == 0 else slot_to_html(slots[segment])
+        for i, segment in enumerate(plan)
+    )
+
+
+def write_template(plan, slots, file):
+    """Writes the template into file, streaming any HTMLNode slots instead of rendering them first"""
+    for i, segment in enumerate(plan):
+        if i % 2 == 0:
+            file.write(segment)
+        elif isinstance(slots[segment], HTMLNode):
+            slots[segment].write_html(file)
+        else:
+            file.write(slots[segment])
+    return None
+
+
+def slot_to_html(value):
+    if isinstance(value, HTMLNode):
+        return value.to_html()
+    return value
+
+
+def generate_pages_recursively(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    jobs=1,
+    profile=None,
+    shard=None,
+    balance=False,
+    fs=disk,
+):
+    """Renders every page, or with shard=(i, n) only shard i's slice plus its shard manifest"""
+    pages = find_pages(dir_path_content, dest_dir_path, fs)
+    if shard is None:
+        generate_pages(pages, template_path, jobs, profile, fs)
+        return None
+    if fs is not disk:
+        raise Exception("Sharded builds need the disk filesystem")
+    index, count = shard
+    shard_slice = shard_pages(pages, dir_path_content, index, count, balance)
+    generate_pages(shard_slice, template_path, jobs, profile)
+    write_shard_manifest(
+        dest_dir_path, shard, dir_path_content, pages, shard_slice, balance
+    )
+    return None
+
+
+def generate_pages(pages, template_path, jobs=1, profile=None, fs=disk):
+    """Renders (from_path, dest_path) pairs, across a process pool when jobs > 1"""
+    # Worker processes can't see an in-memory filesystem, so only disk builds fan out
+    if jobs > 1 and len(pages) > 1 and fs is disk:
+        generate_pages_in_parallel(pages, template_path, jobs, profile=profile)
+        return None
+    for from_path, dest_path in pages:
+        generate_page(from_path, template_path, dest_path, profile, fs)
+    return None
+
+
+def generate_pages_in_parallel(
+    pages, template_path, workers, batch_size=None, profile=None
+):
+    """Fans pages out to worker processes in batches and raises one report if any failed"""
+    if batch_size is None:
+        # A few batches per worker keeps the pool busy when page sizes vary.
+        batch_size = max(1, -(-len(pages) // (workers * 4)))
+    batches = [pages[i : i + batch_size] for i in range(0, len(pages), batch_size)]
+
+    failures = []
+    with worker_pool(workers) as executor:
+        futures = [
+            executor.submit(
+                generate_page_batch,
+                batch,
+                template_path,
+                profile is not None,
+                link_targets is not None,
+                search_terms is not None,
+            )
+            for batch in batches
+        ]
+        for future in futures:
+            (
+                batch_failures,
+                batch_profile,
+                batch_cache_stats,
+                batch_targets,
+                batch_terms,
+            ) = future.result()
+            failures.extend(batch_failures)
+            if profile is not None:
+                profile.merge(batch_profile)
+            if block_cache is not None:
+                block_cache.merge_stats(batch_cache_stats)
+            if link_targets is not None:
+                link_targets.update(batch_targets)
+            if search_terms is not None:
+                search_terms.update(batch_terms)
+
+    if len(failures) != 0:
+        report = "\n".join(f"  {from_path}: {error}" for from_path, error in failures)
+        raise Exception(f"{len(failures)} page(s) failed to generate:\n{report}")
+    return None
+
+
+def generate_page_batch(
+    pages,
+    template_path,
+    profiling=False,
+    collecting_links=False,
+    collecting_search=False,
+):
+    """Worker entry point, returns the batch's failures, timings, cache counters and collections."""
+    profile = BuildProfile() if profiling else None
+    # Workers may be forked with the parent's collections, start from empty ones
+    set_link_collection(collecting_links)
+    set_search_collection(collecting_search)
+    cache_before = block_cache.stats() if block_cache is not None else None
+    failures = []
+    for from_path, dest_path in pages:
+        try:
+            generate_page(from_path, template_path, dest_path, profile)
+        except Exception as error:
+            failures.append((from_path, f"{type(error).__name__}: {error}"))
+
+    cache_stats = None
+    if block_cache is not None:
+        cache_after = block_cache.stats()
+        cache_stats = {
+            key: cache_after[key] - cache_before[key]
+            for key in ("hits", "misses", "evictions")
+        }
+    return (
+        failures,
+        None if profile is None else profile.pages,
+        cache_stats,
+        link_targets,
+        search_terms,
+    )
+
+
+def find_pages(dir_path_content, dest_dir_path, fs=disk):
+    """Returns sorted (from_path, dest_path) pairs for every markdown file under dir_path_content"""
+    return list(iter_pages(dir_path_content, dest_dir_path, fs))
+
+
+def iter_pages(dir_path_content, dest_dir_path, fs=disk):
+    """Yields find_pages' pairs one directory at a time"""
+    contents = sorted(fs.scandir(dir_path_content), key=lambda content: content.name)
     for content in contents:
         path_end = os.path.split(content.path)[1]
         if content.is_dir():
@@ -65,14 +503,77 @@ def generate_pages_recursively(dir_path_content, template_path, dest_dir_path):
             # content.path = /workspace/github.com/BarbarianBunny/static-site-generator/content/majesty
             # pum = /workspace/github.com/BarbarianBunny/static-site-generator/public/majesty
             new_dest_dir_path = os.path.join(dest_dir_path, path_end)
-            generate_pages_recursively(content.path, template_path, new_dest_dir_path)
+            yield from iter_pages(content.path, new_dest_dir_path, fs)
             continue
         if content.is_file() and is_markdown_file(content.path):
             path, ext = os.path.splitext(path_end)
             html_path = f"{path}.html"
             dest_path = os.path.join(dest_dir_path, html_path)
-            generate_page(content.path, template_path, dest_path)
-    return None
+            yield (content.path, dest_path)
+
+
+def page_dest_path(from_path, dir_path_content, dest_dir_path):
+    """Returns the html path find_pages would pair with from_path"""
+    path, ext = os.path.splitext(os.path.relpath(from_path, dir_path_content))
+    return os.path.join(dest_dir_path, f"{path}.html")
+
+
+def generate_pages_incrementally(
+    dir_path_content, template_path, dest_dir_path, manifest_path, jobs=1, profile=None
+):
+    """Re-renders only pages whose markdown, template or image sizes changed."""
+    manifest = load_manifest(manifest_path)
+    if manifest is None or manifest.get("version") != MANIFEST_VERSION:
+        manifest = {"version": MANIFEST_VERSION, "template": None, "pages": {}}
+
+    template = file_record(template_path, manifest["template"])
+    images = image_size.fingerprint()
+    template_changed = (
+        manifest["template"] is None
+        or manifest["template"]["hash"] != template["hash"]
+        # Pages embed image sizes, so they all change with them
+        or manifest.get("images") != images
+    )
+
+    old_pages = manifest["pages"]
+    pages = {}
+    changed = []
+    for from_path, dest_path in find_pages(dir_path_content, dest_dir_path):
+        key = os.path.relpath(from_path, dir_path_content)
+        old_page = old_pages.get(key)
+        page = file_record(from_path, old_page)
+        page["dest"] = os.path.relpath(dest_path, dest_dir_path)
+        pages[key] = page
+        if (
+            template_changed
+            or old_page is None
+            or old_page["hash"] != page["hash"]
+            or old_page["dest"] != page["dest"]
+            or not os.path.exists(dest_path)
+        ):
+            changed.append((from_path, dest_path))
+
+    current_dests = set(page["dest"] for page in pages.values())
+    for key, old_page in old_pages.items():
+        if key in pages or old_page["dest"] in current_dests:
+            continue
+        stale_path = os.path.join(dest_dir_path, old_page["dest"])
+        if os.path.exists(stale_path):
+            print(f"Removing stale page: {stale_path}")
+            os.remove(stale_path)
+
+    generate_pages(changed, template_path, jobs, profile)
+
+    save_manifest(
+        manifest_path,
+        {
+            "version": MANIFEST_VERSION,
+            "template": template,
+            "images": images,
+            "pages": pages,
+        },
+    )
+    return changed
 
 
 def is_markdown_file(path):
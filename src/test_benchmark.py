@@ -0,0 +1,47 @@
+import unittest
+
+from benchmark import CORPUS_KINDS, generate_corpus, run_benchmarks
+import template
+from template import convert_markdown_to_html, extract_title
+
+
+class TestGenerateCorpus(unittest.TestCase):
+    def test_kinds_are_valid_markdown(self):
+        for kind in CORPUS_KINDS:
+            markdown = generate_corpus(kind, 5000)
+            self.assertGreaterEqual(len(markdown), 5000)
+            self.assertEqual(extract_title(markdown), "Benchmark")
+            convert_markdown_to_html(markdown)
+
+    def test_deterministic(self):
+        self.assertEqual(generate_corpus("mixed", 2000), generate_corpus("mixed", 2000))
+
+    def test_unknown_kind(self):
+        self.assertRaises(ValueError, lambda: generate_corpus("nothing", 10))
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def test_stage_results(self):
+        results = run_benchmarks(["mixed"], 2000, repeat=1, warmup=0)
+        self.assertEqual(len(results), 7)
+        for row in results:
+            self.assertGreater(row["mb_per_second"], 0)
+            self.assertGreater(row["ops_per_second"], 0)
+
+    def test_block_cache_off_while_measuring(self):
+        results = run_benchmarks(
+            ["mixed"], 2000, repeat=2, warmup=1, stages=["convert_markdown_to_html"]
+        )
+        self.assertEqual(len(results), 1)
+        self.assertIsNotNone(template.block_cache)
+        self.assertEqual(template.block_cache.stats()["size"], 0)
+
+    def test_stage_filter(self):
+        results = run_benchmarks(
+            ["code_heavy"], 2000, repeat=1, warmup=0, stages=["text_to_textnodes"]
+        )
+        self.assertEqual([row["stage"] for row in results], ["text_to_textnodes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,6 +16,13 @@ from block_handling import (
     quote_to_html_node,
     unordered_list_to_html_node,
     ordered_list_to_html_node,
+    iter_blocks,
+    iter_numbered_blocks,
+    markdown_lines_to_html_nodes,
+    block_link_targets,
+    block_search_terms,
+    block_lines_to_html_node,
+    BlockCache,
 )
 
 
@@ -447,5 +454,173 @@ class TestBlockToBlockType(unittest.TestCase):
         self.assertEqual(result, BlockType.ORDERED_LIST)
 
 
+class TestIterBlocks(unittest.TestCase):
+    def test_reads_any_line_iterator(self):
+        lines = iter(["# Heading\n", "\n", "* One\n", "- Two\n", "\n", "Text\n"])
+        self.assertEqual(
+            list(iter_blocks(lines)),
+            [
+                (BlockType.HEADING, ["# Heading"]),
+                (BlockType.UNORDERED_LIST, ["* One", "- Two"]),
+                (BlockType.PARAGRAPH, ["Text"]),
+            ],
+        )
+
+    def test_strips_block(self):
+        blocks = list(iter_blocks([" > Quote ", ">Quote  ", "   "]))
+        self.assertEqual(blocks, [(BlockType.QUOTE, ["> Quote ", ">Quote"])])
+
+    def test_code_fence_keeps_blank_lines(self):
+        lines = ["```", "first", "", "second", "```", "", "After"]
+        self.assertEqual(
+            list(iter_blocks(lines)),
+            [
+                (BlockType.CODE, ["```", "first", "", "second", "```"]),
+                (BlockType.PARAGRAPH, ["After"]),
+            ],
+        )
+
+    def test_unclosed_code_fence(self):
+        lines = ["```", "code", "", "Text"]
+        self.assertEqual(
+            list(iter_blocks(lines)),
+            [
+                (BlockType.PARAGRAPH, ["```", "code"]),
+                (BlockType.PARAGRAPH, ["Text"]),
+            ],
+        )
+
+    def test_inline_code_opens_no_fence(self):
+        lines = [
+            "```x = 1``` is how you assign.",
+            "",
+            "Some paragraph.",
+            "",
+            "## Heading",
+            "",
+            "```print(x)```",
+        ]
+        self.assertEqual(
+            [block_type for block_type, _ in iter_blocks(lines)],
+            [
+                BlockType.PARAGRAPH,
+                BlockType.PARAGRAPH,
+                BlockType.HEADING,
+                BlockType.CODE,
+            ],
+        )
+
+    def test_ordered_list_numbers(self):
+        self.assertEqual(
+            list(iter_blocks(["1. One", "3. Three"])),
+            [(BlockType.PARAGRAPH, ["1. One", "3. Three"])],
+        )
+
+    def test_numbered(self):
+        lines = ["# Heading", "", "", "```", "a", "", "b", "```", "", "Text"]
+        self.assertEqual(
+            [(line, block_type) for line, block_type, _ in iter_numbered_blocks(lines)],
+            [(1, BlockType.HEADING), (4, BlockType.CODE), (10, BlockType.PARAGRAPH)],
+        )
+
+    def test_numbered_unclosed_code_fence(self):
+        lines = ["Intro", "", "```", "code", "", "Text"]
+        self.assertEqual(
+            [line for line, _, _ in iter_numbered_blocks(lines)], [1, 3, 6]
+        )
+
+    def test_html_nodes(self):
+        nodes = markdown_lines_to_html_nodes(["## Title", "", "1. One", "2. Two"])
+        self.assertEqual(
+            [node.to_html() for node in nodes],
+            ["<h2>Title</h2>", "<ol><li>One</li><li>Two</li></ol>"],
+        )
+
+
+class TestBlockLinkTargets(unittest.TestCase):
+    def test_targets_in_order_with_line_offsets(self):
+        lines = ["* [One](/one)", "* ![Two](two.png) and [Three](/three)", "* [One](/one)"]
+        node = block_lines_to_html_node(BlockType.UNORDERED_LIST, lines)
+        self.assertEqual(
+            block_link_targets(node, lines),
+            (
+                (0, "a", "/one"),
+                (1, "img", "two.png"),
+                (1, "a", "/three"),
+                (2, "a", "/one"),
+            ),
+        )
+
+    def test_repeated_url_on_one_line(self):
+        lines = ["[a](/x) and [b](/x)", "[c](/x)"]
+        node = block_lines_to_html_node(BlockType.PARAGRAPH, lines)
+        self.assertEqual(
+            [line for line, _, _ in block_link_targets(node, lines)], [0, 0, 1]
+        )
+
+    def test_code_has_no_targets(self):
+        lines = ["```", "[Not](/a-link)", "```"]
+        node = block_lines_to_html_node(BlockType.CODE, lines)
+        self.assertEqual(block_link_targets(node, lines), ())
+
+
+class TestBlockSearchTerms(unittest.TestCase):
+    def test_words_and_alt_text(self):
+        lines = ["Rivendell **and** the *Shire*, rivendell ![Elf home](/a.png) `code_word` a"]
+        node = block_lines_to_html_node(BlockType.PARAGRAPH, lines)
+        self.assertEqual(
+            block_search_terms(node),
+            {
+                "rivendell": 2,
+                "and": 1,
+                "the": 1,
+                "shire": 1,
+                "elf": 1,
+                "home": 1,
+                "code_word": 1,
+            },
+        )
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_hit(self):
+        cache = BlockCache()
+        first = cache.render(BlockType.PARAGRAPH, ["**Test**"])
+        second = cache.render(BlockType.PARAGRAPH, ["**Test**"])
+        self.assertEqual(first, "<p><b>Test</b></p>")
+        self.assertIs(first, second)
+        self.assertEqual(
+            cache.stats(), {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+        )
+
+    def test_evicts_least_recently_used(self):
+        cache = BlockCache(max_size=2)
+        cache.render(BlockType.PARAGRAPH, ["One"])
+        cache.render(BlockType.PARAGRAPH, ["Two"])
+        cache.render(BlockType.PARAGRAPH, ["One"])
+        cache.render(BlockType.PARAGRAPH, ["Three"])
+        cache.render(BlockType.PARAGRAPH, ["One"])
+        cache.render(BlockType.PARAGRAPH, ["Two"])
+        self.assertEqual(
+            cache.stats(), {"hits": 2, "misses": 4, "evictions": 2, "size": 2}
+        )
+
+    def test_hit_keeps_targets_and_terms(self):
+        cache = BlockCache()
+        first = cache.render_fragment(BlockType.PARAGRAPH, ["[A link](/a)"])
+        second = cache.render_fragment(BlockType.PARAGRAPH, ["[A link](/a)"])
+        self.assertEqual(
+            second,
+            ('<p><a href="/a">A link</a></p>', ((0, "a", "/a"),), {"link": 1}),
+        )
+        self.assertIs(first, second)
+
+    def test_merge_stats(self):
+        cache = BlockCache()
+        cache.merge_stats({"hits": 3, "misses": 2, "evictions": 1})
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(cache.evictions, 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,174 @@
+import contextlib
+import io
+import json
+import os
+import struct
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from fixtures import write_file
+import build_daemon
+from build_client import send_request
+from build_daemon import BuildDaemon
+import image_size
+import template
+
+
+class TestBuildDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "content", "blog"))
+        os.makedirs(os.path.join(self.root, "static"))
+        write_file(self.path("template.html"), "{{ Title }}|{{ Content }}")
+        write_file(self.path("content/index.md"), "# Home")
+        write_file(self.path("content/blog/post.md"), "# Post")
+        write_file(self.path("static/index.css"), "body {}")
+        self.socket_path = os.path.join(self.root, ".build", "daemon.sock")
+        self.daemon = BuildDaemon(self.socket_path, self.root)
+        self.output = io.StringIO()
+
+    def tearDown(self):
+        self.daemon.server_close()
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.root, "public", rel_path)) as file:
+            return file.read()
+
+    def run_request(self, request):
+        with contextlib.redirect_stdout(self.output):
+            return self.daemon.run(request)
+
+    def test_full_then_paths(self):
+        response = self.run_request({"action": "full"})
+        self.assertTrue(response["ok"])
+        self.assertIn("pages", response["timing_ms"])
+        self.assertEqual(self.read("blog/post.html"), "Post|<div><h1>Post</h1></div>")
+        self.assertEqual(self.read("index.css"), "body {}")
+
+        write_file(self.path("content/blog/post.md"), "# Post 2")
+        os.remove(os.path.join(self.root, "content", "index.md"))
+        response = self.run_request(
+            {"action": "build", "paths": ["content/blog/post.md", "content/index.md"]}
+        )
+        self.assertTrue(response["ok"])
+        self.assertGreater(response["timing_ms"]["total"], 0)
+        self.assertEqual(self.read("blog/post.html"), "Post 2|<div><h1>Post 2</h1></div>")
+        self.assertFalse(os.path.exists(os.path.join(self.root, "public", "index.html")))
+
+    def test_path_build_refreshes_only_its_graph_entries(self):
+        self.run_request({"action": "full"})
+        write_file(self.path("content/index.md"), "# Home\n\n![A](/a.png)")
+        with mock.patch.object(
+            build_daemon,
+            "update_dependency_graph",
+            wraps=build_daemon.update_dependency_graph,
+        ) as update:
+            response = self.run_request(
+                {"action": "build", "paths": ["content/index.md"]}
+            )
+            self.assertEqual(update.call_count, 0)
+            self.assertIn("dependency_graph", response["timing_ms"])
+            self.run_request({"action": "build", "paths": ["template.html"]})
+            self.assertEqual(update.call_count, 1)
+        with open(os.path.join(self.root, ".build", "deps.json")) as file:
+            self.assertIn("static/a.png", file.read())
+
+    def test_unchanged_full_build_renders_nothing(self):
+        self.run_request({"action": "full"})
+        self.output = io.StringIO()
+        self.run_request({"action": "full"})
+        self.assertNotIn("Generating page", self.output.getvalue())
+
+    def test_errors_keep_the_daemon_running(self):
+        write_file(self.path("content/index.md"), "No title")
+        response = self.run_request({"action": "build", "paths": ["content/index.md"]})
+        self.assertEqual(response, {"ok": False, "error": "Exception: Title was not found"})
+        self.assertFalse(self.run_request({"action": "build", "paths": []})["ok"])
+        self.assertFalse(self.run_request({"action": "rebuild"})["ok"])
+        self.assertEqual(self.run_request({"action": "status"})["requests"], 4)
+
+    def test_socket(self):
+        thread = threading.Thread(
+            target=self.daemon.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        thread.start()
+        try:
+            with contextlib.redirect_stdout(self.output):
+                response = send_request(self.socket_path, {"action": "full"}, 10)
+                self.assertTrue(response["ok"])
+                self.assertEqual(self.read("index.html"), "Home|<div><h1>Home</h1></div>")
+                self.assertEqual(
+                    send_request(self.socket_path, {"action": "stop"}, 10), {"ok": True}
+                )
+        finally:
+            thread.join()
+
+    def test_refuses_live_socket(self):
+        with self.assertRaises(Exception):
+            BuildDaemon(self.socket_path, self.root)
+        # A socket left by a daemon that died is replaced
+        self.daemon.socket.close()
+        BuildDaemon(self.socket_path, self.root).server_close()
+
+
+class TestBuildFlags(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "content"))
+        os.makedirs(os.path.join(self.root, "static"))
+        with open(os.path.join(self.root, "static", "a.gif"), "wb") as file:
+            file.write(b"GIF89a" + struct.pack("<HH", 40, 30))
+        write_file(self.path("template.html"), "{{ Content }}")
+        write_file(self.path("content/index.md"), "# Home\n\n![A](/a.gif)")
+        self.daemon = BuildDaemon(
+            os.path.join(self.root, ".build", "daemon.sock"),
+            self.root,
+            image_sizes=True,
+            check_links=True,
+            search_index=True,
+        )
+
+    def tearDown(self):
+        self.daemon.server_close()
+        image_size.set_image_sizes(None)
+        template.set_link_collection(False)
+        template.set_search_collection(False)
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def run_request(self, request):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.daemon.run(request)
+
+    def test_full_build_applies_flags(self):
+        response = self.run_request({"action": "full"})
+        self.assertTrue(response["ok"])
+        with open(os.path.join(self.root, "public", "index.html")) as file:
+            self.assertIn('width="40" height="30"', file.read())
+        with open(os.path.join(self.root, "public", "search", "pages.json")) as file:
+            self.assertEqual(json.load(file)["pages"], [["/", "Home"]])
+        # Path builds size images too
+        write_file(self.path("content/index.md"), "# Home\n\n![B](a.gif)")
+        self.run_request({"action": "build", "paths": ["content/index.md"]})
+        with open(os.path.join(self.root, "public", "index.html")) as file:
+            self.assertIn('width="40" height="30"', file.read())
+
+    def test_broken_link_fails_full_build(self):
+        write_file(self.path("content/index.md"), "# Home\n\n[Gone](/gone)")
+        response = self.run_request({"action": "full"})
+        self.assertFalse(response["ok"])
+        self.assertIn("1 broken link(s)", response["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
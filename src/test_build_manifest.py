@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from build_manifest import load_manifest, save_manifest, file_record, hash_bytes
+
+
+class TestManifest(unittest.TestCase):
+    def test_missing_is_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            self.assertEqual(load_manifest(path, {}), {})
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "build", "manifest.json")
+            save_manifest(path, {"pages": {"index.md": 1}})
+            self.assertEqual(load_manifest(path), {"pages": {"index.md": 1}})
+
+
+class TestFileRecord(unittest.TestCase):
+    def test_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "wb") as file:
+                file.write(b"# Test")
+            self.assertEqual(file_record(path)["hash"], hash_bytes(b"# Test"))
+
+    def test_reuses_hash_when_stat_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "wb") as file:
+                file.write(b"# Test")
+            record = file_record(path)
+            record["hash"] = "cached"
+            self.assertEqual(file_record(path, record)["hash"], "cached")
+
+
+if __name__ == "__main__":
+    unittest.main()
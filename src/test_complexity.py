@@ -0,0 +1,117 @@
+"""Pathological inputs at growing sizes, asserting every recogniser stays linear"""
+
+import time
+import unittest
+
+from block_handling import (
+    block_to_block_type,
+    is_block_type_code,
+    is_block_type_heading,
+    is_block_type_ordered_list,
+    is_block_type_quote,
+    is_block_type_unordered_list,
+    markdown_to_text_blocks,
+)
+from template import convert_markdown_to_html, extract_title
+from textnode import extract_markdown_images, extract_markdown_links, text_to_textnodes
+
+SMALL = 5_000
+# Quadratic code grows 64 times over an 8 times bigger input, linear code 8 times
+GROWTH = 8
+MAX_RATIO = GROWTH * 3
+
+
+def best_time(function, argument, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            function(argument)
+        except ValueError:
+            pass
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class LinearTestCase(unittest.TestCase):
+    def assertLinear(self, function, make_input):
+        small = best_time(function, make_input(SMALL))
+        large = best_time(function, make_input(SMALL * GROWTH))
+        # Ignore timer noise when both runs are too quick to measure
+        ratio = large / max(small, 2e-5)
+        self.assertLess(
+            ratio,
+            MAX_RATIO,
+            f"{function.__name__} took {ratio:.1f} times longer on {GROWTH} times the input",
+        )
+
+
+class TestInlineComplexity(LinearTestCase):
+    def test_unclosed_brackets(self):
+        self.assertLinear(extract_markdown_links, lambda n: "[" * n)
+        self.assertLinear(text_to_textnodes, lambda n: "[" * n)
+
+    def test_unclosed_links(self):
+        self.assertLinear(extract_markdown_links, lambda n: "[a](" * (n // 4))
+        self.assertLinear(text_to_textnodes, lambda n: "[](" * (n // 3))
+
+    def test_unclosed_images(self):
+        self.assertLinear(extract_markdown_images, lambda n: "![" * (n // 2))
+        self.assertLinear(extract_markdown_images, lambda n: "![a](" * (n // 5))
+        self.assertLinear(text_to_textnodes, lambda n: "![](" * (n // 4))
+
+    def test_many_links(self):
+        self.assertLinear(text_to_textnodes, lambda n: "[a](b) " * (n // 7))
+        self.assertLinear(text_to_textnodes, lambda n: "![a](b)" * (n // 7))
+
+    def test_many_delimiters(self):
+        self.assertLinear(text_to_textnodes, lambda n: "a*" * (n // 2))
+        self.assertLinear(text_to_textnodes, lambda n: "**a" * (n // 3) + "**")
+        self.assertLinear(text_to_textnodes, lambda n: "`" * n)
+
+
+class TestBlockComplexity(LinearTestCase):
+    def test_quote_near_miss(self):
+        make_input = lambda n: ">a\n" * (n // 3) + "x"
+        self.assertLinear(is_block_type_quote, make_input)
+        self.assertLinear(block_to_block_type, make_input)
+
+    def test_unordered_list_near_miss(self):
+        make_input = lambda n: "* a\n" * (n // 4) + "*"
+        self.assertLinear(is_block_type_unordered_list, make_input)
+        self.assertLinear(block_to_block_type, make_input)
+
+    def test_ordered_list_near_miss(self):
+        make_input = lambda n: "\n".join(f"{i}. a" for i in range(1, n // 6)) + "\nx"
+        self.assertLinear(is_block_type_ordered_list, make_input)
+        self.assertLinear(block_to_block_type, make_input)
+
+    def test_code_near_miss(self):
+        make_input = lambda n: "```" + "a\n" * (n // 2) + "``"
+        self.assertLinear(is_block_type_code, make_input)
+        self.assertLinear(block_to_block_type, make_input)
+
+    def test_heading_near_miss(self):
+        self.assertLinear(is_block_type_heading, lambda n: "#" * n + "x")
+        self.assertLinear(block_to_block_type, lambda n: "#" * n + " x")
+
+    def test_blank_lines(self):
+        self.assertLinear(markdown_to_text_blocks, lambda n: " \n" * (n // 2))
+        self.assertLinear(markdown_to_text_blocks, lambda n: "a\n \n" * (n // 4))
+
+
+class TestPageComplexity(LinearTestCase):
+    def test_title(self):
+        self.assertLinear(extract_title, lambda n: "# " * (n // 2))
+
+    def test_malformed_page(self):
+        self.assertLinear(
+            convert_markdown_to_html, lambda n: "# Title\n\n" + "[![" * (n // 3)
+        )
+        self.assertLinear(
+            convert_markdown_to_html, lambda n: "# Title\n\n```\n" + "a\n\n" * (n // 3)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
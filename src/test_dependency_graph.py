@@ -0,0 +1,173 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+from fixtures import write_file
+import dependency_graph
+from dependency_graph import (
+    update_dependency_graph,
+    refresh_dependency_graph,
+    affected_outputs,
+    page_dependencies,
+)
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.graph_path = os.path.join(self.root, ".build", "deps.json")
+        for dir_path in ("content/blog", "static/images", "public"):
+            os.makedirs(os.path.join(self.root, dir_path))
+        write_file(self.path("template.html"), "{{ Title }} {{ Content }}")
+        write_file(self.path("static/images/a.png"), "png")
+        write_file(self.path("static/index.css"), "body {}")
+        write_file(self.path("content/index.md"), "# Home\n\n[Blog](/blog)")
+        write_file(
+            self.path("content/blog/index.md"),
+            "# Blog\n\n![A](../images/a.png) [Home](/) [Notes](/files/notes.pdf)",
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def update(self):
+        return update_dependency_graph(
+            os.path.join(self.root, "content"),
+            os.path.join(self.root, "template.html"),
+            os.path.join(self.root, "static"),
+            os.path.join(self.root, "public"),
+            self.graph_path,
+            self.root,
+        )
+
+    def test_records_sources_template_and_assets(self):
+        graph = self.update()
+        self.assertEqual(
+            sorted(graph["pages"]), ["public/blog/index.html", "public/index.html"]
+        )
+        self.assertEqual(
+            page_dependencies(graph, "public/blog/index.html"),
+            [
+                "content/blog/index.md",
+                "template.html",
+                "static/files/notes.pdf",
+                "static/images/a.png",
+            ],
+        )
+        self.assertEqual(
+            page_dependencies(graph, "public/index.html"),
+            ["content/index.md", "template.html"],
+        )
+
+    def test_affected_outputs(self):
+        graph = self.update()
+        self.assertEqual(
+            affected_outputs(graph, ["template.html"]),
+            ["public/blog/index.html", "public/index.html"],
+        )
+        self.assertEqual(
+            affected_outputs(graph, ["content/index.md"]), ["public/index.html"]
+        )
+        self.assertEqual(
+            affected_outputs(graph, ["static/images/a.png"]),
+            ["public/blog/index.html", "public/images/a.png"],
+        )
+        self.assertEqual(
+            affected_outputs(graph, ["static/index.css"]), ["public/index.css"]
+        )
+        self.assertEqual(
+            affected_outputs(graph, ["content/blog"]), ["public/blog/index.html"]
+        )
+        self.assertEqual(
+            affected_outputs(graph, ["content/new.md"]), ["public/new.html"]
+        )
+
+    def test_unchanged_pages_are_not_rescanned(self):
+        self.update()
+        with mock.patch.object(
+            dependency_graph, "find_referenced_assets", return_value=[]
+        ) as scan:
+            graph = self.update()
+            self.assertEqual(scan.call_count, 0)
+            write_file(self.path("content/index.md"), "# Home, edited")
+            graph = self.update()
+            self.assertEqual(scan.call_count, 1)
+        self.assertEqual(
+            graph["pages"]["public/blog/index.html"]["assets"],
+            ["static/files/notes.pdf", "static/images/a.png"],
+        )
+
+    def test_asset_added_after_page(self):
+        write_file(self.path("content/index.md"), "# Home\n\n![New](/images/new.png)")
+        self.update()
+        write_file(self.path("static/images/new.png"), "png")
+        graph = self.update()
+        self.assertEqual(
+            affected_outputs(graph, ["static/images/new.png"]),
+            ["public/images/new.png", "public/index.html"],
+        )
+
+    def test_deleted_page_is_dropped(self):
+        self.update()
+        os.remove(os.path.join(self.root, "content/index.md"))
+        self.assertEqual(sorted(self.update()["pages"]), ["public/blog/index.html"])
+
+
+    def test_large_page_scanned_line_by_line(self):
+        with open(os.path.join(self.root, "content", "index.md"), "w") as file:
+            file.write("# Home\n\n")
+            for _ in range(5000):
+                file.write("Some text with a [link](/files/a.pdf) in it. " * 4 + "\n")
+        tracemalloc.start()
+        try:
+            graph = self.update()
+            size, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 200_000)
+        self.assertEqual(
+            page_dependencies(graph, "public/index.html"),
+            ["content/index.md", "template.html", "static/files/a.pdf"],
+        )
+
+    def test_refresh_rescans_only_changed_pages(self):
+        self.update()
+        write_file(self.path("content/index.md"), "# Home\n\n![B](/images/b.png)")
+        os.remove(os.path.join(self.root, "content/blog/index.md"))
+        changed = [
+            os.path.join(self.root, "content/index.md"),
+            os.path.join(self.root, "content/blog/index.md"),
+            os.path.join(self.root, "static/index.css"),
+        ]
+        with mock.patch.object(
+            dependency_graph,
+            "find_referenced_assets",
+            wraps=dependency_graph.find_referenced_assets,
+        ) as scan:
+            graph = refresh_dependency_graph(self.graph_path, changed, self.root)
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual(graph, self.update())
+        self.assertEqual(
+            page_dependencies(graph, "public/index.html"),
+            ["content/index.md", "template.html", "static/images/b.png"],
+        )
+
+    def test_refresh_defers_wide_changes(self):
+        self.assertIsNone(refresh_dependency_graph(self.graph_path, [], self.root))
+        self.update()
+        for rel_path in ("template.html", "content/blog", "static/files/notes"):
+            self.assertIsNone(
+                refresh_dependency_graph(
+                    self.graph_path, [os.path.join(self.root, rel_path)], self.root
+                )
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
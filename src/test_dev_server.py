@@ -0,0 +1,141 @@
+import http.client
+import os
+import tempfile
+import threading
+import unittest
+
+from fixtures import write_file
+from dev_server import DevServer, find_page_source, etag_matches
+
+
+class TestDevServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        write_file(os.path.join(self.content, "about.md"), "# About")
+        write_file(os.path.join(self.content, "broken.md"), "No title")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+
+        self.server = DevServer(
+            ("localhost", 0), self.content, self.static, self.template
+        )
+        # Keep the test output free of request logs
+        self.server.RequestHandlerClass.log_message = lambda *args: None
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        del self.server.RequestHandlerClass.log_message
+        self.tmp.cleanup()
+
+    def request(self, path, headers=None, method="GET"):
+        connection = http.client.HTTPConnection("localhost", self.server.server_port)
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_renders_page_on_request(self):
+        response, body = self.request("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<title>Home</title><div><h1>Home</h1></div>")
+        self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+        response, body = self.request("/about.html")
+        self.assertEqual(body, b"<title>About</title><div><h1>About</h1></div>")
+        # Only the requested pages were rendered
+        self.assertEqual(len(self.server.cache.pages), 2)
+
+    def test_cache_until_source_or_template_changes(self):
+        self.request("/blog/")
+        self.request("/blog/index.html")
+        self.assertEqual((self.server.cache.hits, self.server.cache.misses), (1, 1))
+
+        path = os.path.join(self.content, "blog", "index.md")
+        write_file(path, "# Blog 2")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        response, body = self.request("/blog/")
+        self.assertEqual(body, b"<title>Blog 2</title><div><h1>Blog 2</h1></div>")
+
+        stat = os.stat(self.template)
+        os.utime(self.template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.request("/blog/")
+        self.assertEqual(self.server.cache.misses, 3)
+
+    def test_etag_not_modified(self):
+        response, body = self.request("/")
+        etag = response.getheader("ETag")
+        response, body = self.request("/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+        response, body = self.request("/index.css")
+        self.assertEqual(body, b"body {}")
+        self.assertEqual(response.getheader("Content-Type"), "text/css")
+        response, body = self.request(
+            "/index.css", {"If-None-Match": f'"other", W/{response.getheader("ETag")}'}
+        )
+        self.assertEqual(response.status, 304)
+
+    def test_folder_redirect(self):
+        response, body = self.request("/blog")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/blog/")
+
+    def test_head(self):
+        response, body = self.request("/", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"")
+        self.assertNotEqual(response.getheader("Content-Length"), "0")
+
+    def test_errors(self):
+        self.assertEqual(self.request("/missing")[0].status, 404)
+        self.assertEqual(self.request("/../template.html")[0].status, 404)
+        response, body = self.request("/broken.html")
+        self.assertEqual(response.status, 500)
+        self.assertIn(b"Title was not found", body)
+
+
+class TestFindPageSource(unittest.TestCase):
+    def test_paths(self):
+        with tempfile.TemporaryDirectory() as content:
+            os.makedirs(os.path.join(content, "blog"))
+            for rel_path in ("index.md", "blog/index.md", "blog/post.markdown"):
+                with open(os.path.join(content, rel_path), "w") as file:
+                    file.write("# Page")
+            self.assertEqual(find_page_source(content, ""), os.path.join(content, "index.md"))
+            self.assertEqual(
+                find_page_source(content, "blog"),
+                os.path.join(content, "blog", "index.md"),
+            )
+            self.assertEqual(
+                find_page_source(content, "blog/post.html"),
+                os.path.join(content, "blog", "post.markdown"),
+            )
+            self.assertIsNone(find_page_source(content, "blog/other.html"))
+
+
+class TestEtagMatches(unittest.TestCase):
+    def test_matches(self):
+        self.assertTrue(etag_matches('"a"', '"a"'))
+        self.assertTrue(etag_matches('"b", W/"a"', '"a"'))
+        self.assertTrue(etag_matches("*", '"a"'))
+        self.assertFalse(etag_matches('"b"', '"a"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import unittest
+
+from filesystem import MemoryFileSystem
+
+
+class TestMemoryFileSystem(unittest.TestCase):
+    def setUp(self):
+        self.fs = MemoryFileSystem(
+            {"/site/a.md": "# A", "/site/images/b.png": b"\x89PNG"}
+        )
+
+    def test_read_and_write(self):
+        self.assertEqual(self.fs.read("/site/a.md"), b"# A")
+        with self.fs.open("/site/a.md") as file:
+            self.assertEqual(file.read(), "# A")
+        with self.fs.open("/site/c.html", "w+") as file:
+            file.write("<p>")
+        with self.fs.open("/site/c.html", "rb") as file:
+            self.assertEqual(file.read(), b"<p>")
+        self.assertEqual(self.fs.getsize("/site/images/b.png"), 4)
+
+    def test_missing(self):
+        self.assertRaises(FileNotFoundError, lambda: self.fs.open("/site/none.md"))
+        self.assertRaises(FileNotFoundError, lambda: self.fs.open("/other/x.html", "w"))
+        self.assertRaises(FileNotFoundError, lambda: self.fs.listdir("/other"))
+
+    def test_folders(self):
+        self.assertEqual(sorted(self.fs.listdir("/site")), ["a.md", "images"])
+        self.assertIn("site", self.fs.listdir("/"))
+        entries = {entry.name: entry for entry in self.fs.scandir("/site")}
+        self.assertTrue(entries["images"].is_dir())
+        self.assertTrue(entries["a.md"].is_file())
+        self.assertEqual(entries["a.md"].path, os.path.join("/site", "a.md"))
+
+    def test_relative_paths(self):
+        fs = MemoryFileSystem({"content/a.md": "# A"})
+        self.assertTrue(fs.isfile(os.path.join(os.getcwd(), "content", "a.md")))
+
+    def test_copy_and_remove_trees(self):
+        self.fs.copytree("/site", "/public")
+        self.assertEqual(self.fs.read("/public/images/b.png"), b"\x89PNG")
+        self.fs.rmtree("/site")
+        self.assertFalse(self.fs.exists("/site/images/b.png"))
+        self.assertNotIn("site", self.fs.listdir("/"))
+        self.fs.replace("/public/a.md", "/public/z.md")
+        self.assertEqual(sorted(self.fs.listdir("/public")), ["images", "z.md"])
+
+    def test_modified_time_changes_on_write(self):
+        before = self.fs.mtime_ns("/site/a.md")
+        self.fs.write("/site/a.md", "# B")
+        self.assertGreaterEqual(self.fs.mtime_ns("/site/a.md"), before)
+        self.assertEqual(self.fs.read("/site/a.md"), b"# B")
+
+
+if __name__ == "__main__":
+    unittest.main()
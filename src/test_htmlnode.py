@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -132,5 +133,65 @@ class TestParentNode(unittest.TestCase):
         )
 
 
+class TestStructuralEquality(unittest.TestCase):
+    def test_uneq_children(self):
+        node = ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, "1")])
+        node2 = ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, "2")])
+        self.assertNotEqual(node, node2)
+
+    def test_uneq_types(self):
+        self.assertNotEqual(HTMLNode("b", "Bold"), LeafNode("b", "Bold"))
+        self.assertNotEqual(LeafNode("b", "Bold"), "<b>Bold</b>")
+
+    def test_props_order(self):
+        node = ParentNode("a", [LeafNode(None, "x")], {"href": "/", "title": "t"})
+        node2 = ParentNode("a", [LeafNode(None, "x")], {"title": "t", "href": "/"})
+        self.assertEqual(node, node2)
+
+    def test_unhashable(self):
+        # Nodes are mutable, so like the baseline they can't be set members or dict keys
+        self.assertRaises(TypeError, lambda: hash(LeafNode("b", "Bold")))
+
+    def test_slots(self):
+        node = LeafNode("b", "Bold")
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_interned_tag(self):
+        tag = "".join(["s", "pan"])
+        self.assertIs(LeafNode(tag, "x").tag, LeafNode("span", "x").tag)
+
+
+class TestStreamingHTML(unittest.TestCase):
+    def test_iter_html_fragments(self):
+        node = ParentNode(
+            "p", [LeafNode("b", "Bold text"), LeafNode(None, "Normal text")]
+        )
+        self.assertEqual(
+            list(node.iter_html()), ["<p>", "<b>Bold text</b>", "Normal text", "</p>"]
+        )
+
+    def test_write_html(self):
+        node = ParentNode(
+            "div",
+            [ParentNode("p", [LeafNode("i", "italic")], {"class": "x"})],
+        )
+        file = io.StringIO()
+        node.write_html(file)
+        self.assertEqual(file.getvalue(), node.to_html())
+        self.assertEqual(file.getvalue(), '<div><p class="x"><i>italic</i></p></div>')
+
+    def test_deep_nesting(self):
+        node = LeafNode(None, "x")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(len(html), 5000 * len("<span></span>") + 1)
+
+    def test_nested_error(self):
+        node = ParentNode("div", [ParentNode("p", [])])
+        self.assertRaises(ValueError, node.to_html)
+
+
 if __name__ == "__main__":
     unittest.main()
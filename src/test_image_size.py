@@ -0,0 +1,153 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from fixtures import write_file
+import image_size
+from image_size import (
+    read_image_size,
+    load_image_sizes,
+    set_image_sizes,
+    page_images,
+)
+from template import convert_markdown_to_html, markdown_to_html_node
+
+
+def png(width, height):
+    return (
+        b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+        + struct.pack(">II", width, height)
+        + b"\x08\x02\x00\x00\x00"
+    )
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc2" + struct.pack(">HBHH", 11, 8, height, width) + b"\x01\x01\x11\x00"
+    return b"\xff\xd8" + app0 + b"\xff\xff" + sof + b"\xff\xda"
+
+
+class TestReadImageSize(unittest.TestCase):
+    def test_png(self):
+        self.assertEqual(read_image_size(png(1344, 896)), (1344, 896))
+
+    def test_gif(self):
+        self.assertEqual(read_image_size(b"GIF89a" + struct.pack("<HH", 40, 30)), (40, 30))
+
+    def test_jpeg(self):
+        self.assertEqual(read_image_size(jpeg(800, 600)), (800, 600))
+
+    def test_webp(self):
+        lossy = (
+            b"RIFF\x00\x00\x00\x00WEBPVP8 \x00\x00\x00\x00"
+            + b"\x00\x00\x00\x9d\x01\x2a"
+            + struct.pack("<HH", 640, 480)
+        )
+        self.assertEqual(read_image_size(lossy), (640, 480))
+        bits = (320 - 1) | ((240 - 1) << 14)
+        lossless = (
+            b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f"
+            + struct.pack("<I", bits)
+        )
+        self.assertEqual(read_image_size(lossless), (320, 240))
+        extended = (
+            b"RIFF\x00\x00\x00\x00WEBPVP8X\x00\x00\x00\x00\x00\x00\x00\x00"
+            + (4000 - 1).to_bytes(3, "little")
+            + (3000 - 1).to_bytes(3, "little")
+        )
+        self.assertEqual(read_image_size(extended), (4000, 3000))
+
+    def test_unknown_or_truncated(self):
+        self.assertIsNone(read_image_size(b"not an image"))
+        self.assertIsNone(read_image_size(png(1, 1)[:18]))
+        self.assertIsNone(read_image_size(jpeg(1, 1)[:24]))
+        self.assertIsNone(read_image_size(b"RIFF\x00\x00\x00\x00WEBPVP8L"))
+        self.assertIsNone(read_image_size(b"RIFF\x00\x00\x00\x00WEBPVP8X\x00"))
+
+
+class TestLoadImageSizes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.manifest = os.path.join(self.tmp.name, ".build", "images.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        write_file(self.path("images/a.png"), png(10, 20))
+        write_file(self.path("images/b.jpg"), jpeg(30, 40))
+        write_file(self.path("images/broken.gif"), b"GIF")
+        write_file(self.path("index.css"), b"body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.static, rel_path)
+
+    def test_sizes(self):
+        self.assertEqual(
+            load_image_sizes(self.static, self.manifest),
+            {"images/a.png": [10, 20], "images/b.jpg": [30, 40]},
+        )
+
+    def test_unchanged_images_are_not_opened(self):
+        load_image_sizes(self.static, self.manifest)
+        with mock.patch.object(image_size, "hash_bytes") as hash_bytes:
+            sizes = load_image_sizes(self.static, self.manifest)
+        self.assertEqual(hash_bytes.call_count, 0)
+        self.assertEqual(sizes["images/a.png"], [10, 20])
+
+    def test_sizes_are_cached_by_hash(self):
+        load_image_sizes(self.static, self.manifest)
+        write_file(self.path("images/copy.png"), png(10, 20))
+        write_file(self.path("images/b.jpg"), jpeg(50, 60))
+        with mock.patch.object(
+            image_size, "read_image_size", wraps=read_image_size
+        ) as read:
+            sizes = load_image_sizes(self.static, self.manifest)
+        # The copy's hash is already known, only the changed jpeg is parsed
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(sizes["images/copy.png"], [10, 20])
+        self.assertEqual(sizes["images/b.jpg"], [50, 60])
+
+
+class TestImageAttributes(unittest.TestCase):
+    def setUp(self):
+        set_image_sizes({"images/a.png": [10, 20]}, "/site/public")
+
+    def tearDown(self):
+        set_image_sizes(None)
+
+    def test_absolute_and_relative(self):
+        images = page_images("/site/public/blog/post.html")
+        expected = {"width": "10", "height": "20", "loading": "lazy", "decoding": "async"}
+        self.assertEqual(images.attributes("/images/a.png"), expected)
+        self.assertEqual(images.attributes("../images/a.png"), expected)
+        self.assertEqual(
+            images.attributes("https://example.com/a.png"),
+            {"loading": "lazy", "decoding": "async"},
+        )
+
+    def test_img_tag(self):
+        images = page_images("/site/public/index.html")
+        self.assertEqual(
+            markdown_to_html_node("![A](/images/a.png)", images=images).to_html(),
+            '<div><p><img src="/images/a.png" alt="A" width="10" height="20"'
+            ' loading="lazy" decoding="async"></img></p></div>',
+        )
+        # Without a page there's nothing to size against
+        self.assertEqual(
+            convert_markdown_to_html("![A](/images/a.png)"),
+            '<div><p><img src="/images/a.png" alt="A"></img></p></div>',
+        )
+
+    def test_cache_context(self):
+        images = page_images("/site/public/blog/post.html")
+        self.assertEqual(images.cache_context(["![A](a.png)"]), "blog")
+        self.assertIsNone(images.cache_context(["No images"]))
+        set_image_sizes(None)
+        self.assertIsNone(page_images("/site/public/blog/post.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from link_checker import collect_site_targets, check_links, format_broken_links
+
+
+class TestLinkChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.manifest = os.path.join(self.root, ".build", "links.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(os.path.join(self.static, "images"))
+        write_file(self.path("static/images/a.png"), "png")
+        write_file(
+            self.path("content/index.md"),
+            "# Home\n\n[Blog](/blog) [Post](blog/post) [Me](/)\n\n"
+            "[Out](https://example.com) [Top](#top) [Mail](mailto:me@example.com)",
+        )
+        write_file(
+            self.path("content/blog/index.md"), "# Blog\n\n![A](../images/a.png)"
+        )
+        write_file(
+            self.path("content/blog/post.md"),
+            "# Post\n\n[Up](..)\n\n![Gone](/images/gone.png)\n\n[Nope](/nope#section)",
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def check(self, collected=None):
+        targets = collect_site_targets(
+            self.content, self.public, collected or {}, self.manifest
+        )
+        return check_links(targets, self.content, self.public, self.static)
+
+    def test_reports_broken_targets_with_lines(self):
+        broken = self.check()
+        post = self.path("content/blog/post.md")
+        self.assertEqual(
+            broken,
+            [(post, 5, "img", "/images/gone.png"), (post, 7, "a", "/nope#section")],
+        )
+        self.assertEqual(
+            format_broken_links(broken).split("\n"),
+            [
+                f"  {post}:5: broken image /images/gone.png",
+                f"  {post}:7: broken link /nope#section",
+            ],
+        )
+
+    def test_uses_collected_targets(self):
+        post = self.path("content/blog/post.md")
+        broken = self.check({post: [(1, "a", "/elsewhere")]})
+        self.assertEqual(broken, [(post, 1, "a", "/elsewhere")])
+
+    def test_reuses_recorded_targets_of_unchanged_pages(self):
+        post = self.path("content/blog/post.md")
+        self.check({post: [(1, "a", "/elsewhere")]})
+        # Not generated this time and unchanged, so last build's targets are used
+        self.assertEqual(self.check(), [(post, 1, "a", "/elsewhere")])
+        write_file(self.path("content/blog/post.md"), "# Post\n\n[Blog](/blog/)")
+        self.assertEqual(self.check(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
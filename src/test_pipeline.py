@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from filesystem import MemoryFileSystem
+import image_size
+import template
+from pipeline import build_pages_pipelined, run_pipeline
+
+
+class TestBuildPagesPipelined(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "sub"))
+        with open(self.template, "w") as file:
+            file.write("{{ Title }}|{{ Content }}")
+        for i in range(10):
+            directory = self.content if i % 2 == 0 else os.path.join(self.content, "sub")
+            with open(os.path.join(directory, f"page{i}.md"), "w") as file:
+                file.write(f"# Page {i}\n\nText {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, *path):
+        with open(os.path.join(self.public, *path)) as file:
+            return file.read()
+
+    def test_builds_every_page(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_pages_pipelined(
+                self.content, self.template, self.public, io_workers=3, queue_size=2
+            )
+        self.assertEqual(
+            self.read("page0.html"), "Page 0|<div><h1>Page 0</h1><p>Text 0</p></div>"
+        )
+        self.assertEqual(
+            self.read("sub", "page9.html"),
+            "Page 9|<div><h1>Page 9</h1><p>Text 9</p></div>",
+        )
+
+    def test_process_converters(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_pages_pipelined(
+                self.content, self.template, self.public, convert_workers=2
+            )
+        self.assertEqual(len(os.listdir(os.path.join(self.public, "sub"))), 5)
+
+    def test_collects_links_and_words(self):
+        with open(os.path.join(self.content, "page0.md"), "w") as file:
+            file.write("# Page 0\n\n[Home](/)")
+        template.set_link_collection(True)
+        template.set_search_collection(True)
+        try:
+            for convert_workers in (1, 2):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    build_pages_pipelined(
+                        self.content,
+                        self.template,
+                        self.public,
+                        convert_workers=convert_workers,
+                    )
+                page = os.path.join(self.content, "page0.md")
+                self.assertEqual(template.link_targets[page], [(3, "a", "/")])
+                title, terms = template.search_terms[page]
+                self.assertEqual(title, "Page 0")
+                self.assertIn("home", terms)
+                self.assertEqual(len(template.search_terms), 10)
+        finally:
+            template.set_link_collection(False)
+            template.set_search_collection(False)
+
+    def test_sizes_images(self):
+        with open(os.path.join(self.content, "sub", "page1.md"), "w") as file:
+            file.write("# Page 1\n\n![A](../a.png)")
+        image_size.set_image_sizes({"a.png": [4, 3]}, self.public)
+        try:
+            for convert_workers in (1, 2):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    build_pages_pipelined(
+                        self.content,
+                        self.template,
+                        self.public,
+                        convert_workers=convert_workers,
+                    )
+                self.assertIn('width="4" height="3"', self.read("sub", "page1.html"))
+        finally:
+            image_size.set_image_sizes(None)
+
+    def test_memory_filesystem(self):
+        root = os.path.join(self.tmp.name, "memory")
+        fs = MemoryFileSystem(
+            {
+                os.path.join(root, "content", "index.md"): "# Home",
+                os.path.join(root, "template.html"): "{{ Title }}|{{ Content }}",
+            }
+        )
+        public = os.path.join(root, "public")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_pages_pipelined(
+                os.path.join(root, "content"),
+                os.path.join(root, "template.html"),
+                public,
+                fs=fs,
+            )
+        self.assertEqual(
+            fs.read(os.path.join(public, "index.html")), b"Home|<div><h1>Home</h1></div>"
+        )
+        self.assertEqual(fs.listdir(public), ["index.html"])
+        self.assertFalse(os.path.exists(root))
+
+    def test_failure_report(self):
+        with open(os.path.join(self.content, "page4.md"), "w") as file:
+            file.write("No title")
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(Exception) as context:
+                build_pages_pipelined(self.content, self.template, self.public)
+        self.assertIn("1 page(s) failed", str(context.exception))
+        self.assertIn("page4.md", str(context.exception))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "page6.html")))
+
+    def test_missing_source(self):
+        missing = os.path.join(self.content, "missing.md")
+        pages = [(missing, os.path.join(self.public, "x.html"))]
+        with contextlib.redirect_stdout(io.StringIO()):
+            failures = asyncio.run(run_pipeline(pages, self.template, 2, 1, 4))
+        self.assertEqual(len(failures), 1)
+        self.assertIn("FileNotFoundError", failures[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from precompress import precompress_public, compress_file
+
+
+PAGE = "<html><body>" + "<p>Some repeated page text.</p>" * 40 + "</body></html>"
+
+
+class TestPrecompressPublic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.public = os.path.join(root, "public")
+        self.manifest = os.path.join(root, ".build", "precompress.json")
+        os.makedirs(os.path.join(self.public, "blog"))
+        write_file(self.path("index.html"), PAGE)
+        write_file(self.path(os.path.join("blog", "index.html")), PAGE)
+        write_file(self.path("index.css"), "body { color: red; }\n" * 30)
+        write_file(self.path("image.png"), "png" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.public, rel_path)
+
+    def precompress(self, jobs=1):
+        return precompress_public(self.public, self.manifest, jobs, ["gzip"])
+
+    def test_compresses_text_files(self):
+        self.assertEqual(
+            self.precompress(),
+            [os.path.join("blog", "index.html"), "index.css", "index.html"],
+        )
+        with gzip.open(self.path("index.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), PAGE)
+        self.assertFalse(os.path.exists(self.path("image.png.gz")))
+
+    def test_parallel_matches_serial(self):
+        self.precompress(jobs=2)
+        with open(self.path("index.html.gz"), "rb") as file:
+            parallel = file.read()
+        os.remove(self.path("index.html.gz"))
+        self.precompress()
+        with open(self.path("index.html.gz"), "rb") as file:
+            self.assertEqual(file.read(), parallel)
+
+    def test_unchanged_content_is_skipped(self):
+        self.precompress()
+        self.assertEqual(self.precompress(), [])
+        # Rewriting a page with the same content only changes its mtime
+        write_file(self.path("index.html"), PAGE)
+        self.assertEqual(self.precompress(), [])
+
+    def test_changed_content_is_recompressed(self):
+        self.precompress()
+        write_file(self.path("index.html"), PAGE + "<!-- edited -->")
+        self.assertEqual(self.precompress(), ["index.html"])
+        with gzip.open(self.path("index.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), PAGE + "<!-- edited -->")
+
+    def test_missing_sibling_is_rewritten(self):
+        self.precompress()
+        os.remove(self.path("index.css.gz"))
+        self.assertEqual(self.precompress(), ["index.css"])
+        self.assertTrue(os.path.exists(self.path("index.css.gz")))
+
+    def test_deleted_file_removes_siblings(self):
+        self.precompress()
+        os.remove(self.path("index.css"))
+        self.precompress()
+        self.assertFalse(os.path.exists(self.path("index.css.gz")))
+
+    def test_file_that_shrinks_loses_stale_sibling(self):
+        self.precompress()
+        write_file(self.path("index.html"), "<p>tiny</p>")
+        self.assertEqual(self.precompress(), ["index.html"])
+        self.assertFalse(os.path.exists(self.path("index.html.gz")))
+
+
+class TestCompressFile(unittest.TestCase):
+    def test_output_is_reproducible(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.html")
+            with open(path, "w") as file:
+                file.write(PAGE)
+            self.assertEqual(compress_file(path, ["gzip"]), ["gzip"])
+            with open(path + ".gz", "rb") as file:
+                first = file.read()
+            compress_file(path, ["gzip"])
+            with open(path + ".gz", "rb") as file:
+                self.assertEqual(file.read(), first)
+            self.assertEqual(
+                os.stat(path + ".gz").st_mtime_ns, os.stat(path).st_mtime_ns
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from profiling import BuildProfile, PAGE_STAGES
+import template
+from template import generate_pages_recursively, markdown_to_html_node
+
+
+class TestBuildProfile(unittest.TestCase):
+    def test_record_and_totals(self):
+        profile = BuildProfile()
+        profile.record("a.md", "read", profile.start(), 10)
+        profile.record("b.md", "read", profile.start(), 5)
+        profile.record(None, "static_to_public", profile.start())
+        self.assertEqual(profile.stage_totals()["read"][2], 15)
+        self.assertIn("static_to_public", profile.build_stages)
+
+    def test_merge(self):
+        profile = BuildProfile()
+        profile.merge({"a.md": {"read": [1.0, 0.5, 10]}})
+        profile.merge({"a.md": {"read": [1.0, 0.5, 10]}, "b.md": {"write": [3.0, 0, 1]}})
+        self.assertEqual(profile.pages["a.md"]["read"], [2.0, 1.0, 20])
+        self.assertEqual(profile.slowest_pages(1), [(3.0, "b.md")])
+
+
+class TestProfiledBuild(unittest.TestCase):
+    def test_pages_profiled(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            public = os.path.join(tmp, "public")
+            template_path = os.path.join(tmp, "template.html")
+            os.makedirs(content)
+            with open(template_path, "w") as file:
+                file.write("<h1>{{ Title }}</h1>{{ Content }}")
+            with open(os.path.join(content, "index.md"), "w") as file:
+                file.write("# Index\n\nSome **text**")
+
+            profile = BuildProfile()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursively(
+                    content, template_path, public, profile=profile
+                )
+
+            with open(os.path.join(public, "index.html")) as file:
+                self.assertEqual(
+                    file.read(),
+                    "<h1>Index</h1><div><h1>Index</h1><p>Some <b>text</b></p></div>",
+                )
+            stages = profile.pages[os.path.join(content, "index.md")]
+            self.assertEqual(set(stages), set(PAGE_STAGES) - {"streaming"})
+            report = os.path.join(tmp, "profile.json")
+            profile.write_report(report)
+            with open(report) as file:
+                self.assertIn("page_stages", json.load(file))
+            self.assertIn("index.md", profile.summary())
+
+    def test_stages_without_block_cache(self):
+        profile = BuildProfile()
+        timer = profile.page_timer("a.md")
+        template.set_block_cache_size(0)
+        try:
+            node = markdown_to_html_node("# A\n\nSome *text*", timer=timer)
+        finally:
+            template.set_block_cache_size(template.BLOCK_CACHE_SIZE)
+        self.assertEqual(node.to_html(), "<div><h1>A</h1><p>Some <i>text</i></p></div>")
+        self.assertEqual(set(profile.pages["a.md"]), {"block_parsing", "inline_parsing"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fixtures import write_file
+import template
+from search_index import update_search_index
+from template import find_pages, generate_pages
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, ".build", "search.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.public)
+        write_file(self.template, "{{ Title }}{{ Content }}")
+        write_file(
+            os.path.join(self.content, "index.md"),
+            "# Home\n\nWelcome to the shire. The shire is green.",
+        )
+        write_file(
+            os.path.join(self.content, "blog", "index.md"),
+            "# Rivendell\n\nElves live in rivendell.\n\n![Elf house](/a.png)",
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, rel_path):
+        with open(os.path.join(self.public, "search", rel_path)) as file:
+            return json.load(file)
+
+    def update(self, collected=None):
+        return update_search_index(
+            self.content, self.public, collected or {}, self.manifest
+        )
+
+    def test_index(self):
+        self.update()
+        self.assertEqual(
+            self.read("pages.json"),
+            {
+                "version": 1,
+                "prefix_length": 2,
+                "pages": [["/blog/", "Rivendell"], ["/", "Home"]],
+            },
+        )
+        self.assertEqual(self.read("terms/sh.json"), {"shire": [[1, 2]]})
+        # The heading counts more than the body
+        self.assertEqual(self.read("terms/ri.json"), {"rivendell": [[0, 6]]})
+        self.assertEqual(self.read("terms/el.json"), {"elf": [[0, 1]], "elves": [[0, 1]]})
+
+    def test_collected_terms_match_conversion(self):
+        self.update()
+        expected = self.read("terms/sh.json")
+        shutil.rmtree(os.path.join(self.public, "search"))
+        os.remove(self.manifest)
+        template.set_search_collection(True)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages(find_pages(self.content, self.public), self.template)
+            collected = template.search_terms
+        finally:
+            template.set_search_collection(False)
+        self.assertEqual(len(collected), 2)
+        self.update(collected)
+        self.assertEqual(self.read("terms/sh.json"), expected)
+
+    def test_unchanged_rewrites_nothing(self):
+        self.update()
+        self.assertEqual(self.update(), [])
+
+    def test_changed_page_rewrites_its_prefixes(self):
+        self.update()
+        write_file(
+            os.path.join(self.content, "index.md"),
+            "# Home\n\nWelcome to the shire. Hobbits live here.",
+        )
+        self.assertEqual(
+            self.update(), ["gr", "he", "ho", "is", "li", "sh", "th"]
+        )
+        self.assertEqual(self.read("terms/li.json"), {"live": [[0, 1], [1, 1]]})
+        self.assertFalse(os.path.exists(os.path.join(self.public, "search", "terms", "gr.json")))
+
+    def test_removed_page_keeps_ids(self):
+        self.update()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        self.update()
+        self.assertEqual(self.read("pages.json")["pages"], [None, ["/", "Home"]])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "search", "terms", "ri.json")))
+        # A new page takes the free id
+        write_file(os.path.join(self.content, "new.md"), "# New")
+        self.update()
+        self.assertEqual(
+            self.read("pages.json")["pages"], [["/new.html", "New"], ["/", "Home"]]
+        )
+
+    def test_page_added_with_removal_takes_its_id(self):
+        self.update()
+        os.remove(os.path.join(self.content, "index.md"))
+        write_file(os.path.join(self.content, "new.md"), "# New")
+        self.update()
+        self.assertEqual(
+            self.read("pages.json")["pages"], [["/blog/", "Rivendell"], ["/new.html", "New"]]
+        )
+
+    def test_cleared_public_rewrites_everything(self):
+        self.update()
+        shutil.rmtree(os.path.join(self.public, "search"))
+        self.update()
+        self.assertEqual(self.read("terms/sh.json"), {"shire": [[1, 2]]})
+
+
+if __name__ == "__main__":
+    unittest.main()
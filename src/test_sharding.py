@@ -0,0 +1,150 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from sharding import (
+    parse_shard,
+    shard_of,
+    assign_shards,
+    merge_shards,
+    SHARD_MANIFEST_NAME,
+)
+from template import find_pages, generate_pages_recursively
+
+
+class TestParseShard(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+
+    def test_invalid(self):
+        for text in ("0/4", "5/4", "1", "a/b", "1/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+
+class TestAssignShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = self.tmp.name
+        self.pages = []
+        for i in range(40):
+            path = os.path.join(self.content, f"page{i}.md")
+            with open(path, "w") as file:
+                file.write("# Page\n" + "x" * (i * 100))
+            self.pages.append((path, f"page{i}.html"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stable_hash(self):
+        shards = assign_shards(self.pages, self.content, 4)
+        self.assertEqual(set(shards.values()), {1, 2, 3, 4})
+        # Removing a page doesn't move the others
+        fewer = assign_shards(self.pages[1:], self.content, 4)
+        for from_path, shard in fewer.items():
+            self.assertEqual(shards[from_path], shard)
+        self.assertEqual(shard_of(os.path.join("blog", "a.md"), 4), shard_of("blog/a.md", 4))
+
+    def test_balanced_by_size(self):
+        shards = assign_shards(self.pages, self.content, 4, balance=True)
+        loads = {shard: 0 for shard in range(1, 5)}
+        for from_path, shard in shards.items():
+            loads[shard] += os.path.getsize(from_path)
+        self.assertLess(max(loads.values()) - min(loads.values()), 4000)
+        self.assertEqual(shards, assign_shards(self.pages, self.content, 4, True))
+
+
+class TestShardedBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(self.template, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        for i in range(12):
+            dir_path = self.content if i % 2 == 0 else os.path.join(self.content, "blog")
+            with open(os.path.join(dir_path, f"post{i}.md"), "w") as file:
+                file.write(f"# Post {i}\n\nBody {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def shard_dir(self, index, balance=False):
+        suffix = "-balanced" if balance else ""
+        return os.path.join(self.root, f"shard{index}{suffix}")
+
+    def build(self, count, balance=False):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for index in range(1, count + 1):
+                generate_pages_recursively(
+                    self.content,
+                    self.template,
+                    self.shard_dir(index, balance),
+                    shard=(index, count),
+                    balance=balance,
+                )
+        return [self.shard_dir(index, balance) for index in range(1, count + 1)]
+
+    def test_merge_matches_full_build(self):
+        public = os.path.join(self.root, "public")
+        full = os.path.join(self.root, "full")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursively(self.content, self.template, full)
+        for balance in (False, True):
+            merged = merge_shards(self.build(3, balance), public)
+            self.assertEqual(len(merged), 12)
+            for from_path, dest_path in find_pages(self.content, full):
+                rel_path = os.path.relpath(dest_path, full)
+                with open(dest_path) as expected, open(
+                    os.path.join(public, rel_path)
+                ) as actual:
+                    self.assertEqual(actual.read(), expected.read())
+            self.assertFalse(os.path.exists(os.path.join(public, SHARD_MANIFEST_NAME)))
+
+    def test_missing_shard(self):
+        shard_dirs = self.build(3)
+        with self.assertRaisesRegex(Exception, "shard 2/3 is missing"):
+            merge_shards([shard_dirs[0], shard_dirs[2]], os.path.join(self.root, "public"))
+
+    def test_unlisted_file(self):
+        shard_dirs = self.build(2)
+        with open(os.path.join(shard_dirs[0], "extra.html"), "w") as file:
+            file.write("extra")
+        with self.assertRaisesRegex(Exception, "extra.html isn't in the shard manifest"):
+            merge_shards(shard_dirs, os.path.join(self.root, "public"))
+
+    def test_shards_from_different_content(self):
+        first = self.build(2)
+        os.remove(os.path.join(self.content, "post0.md"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursively(
+                self.content,
+                self.template,
+                os.path.join(self.root, "other"),
+                shard=(2, 2),
+            )
+        with self.assertRaisesRegex(Exception, "different content"):
+            merge_shards(
+                [first[0], os.path.join(self.root, "other")],
+                os.path.join(self.root, "public"),
+            )
+
+    def test_tampered_file(self):
+        shard_dirs = self.build(2)
+        page = next(
+            name
+            for name in os.listdir(shard_dirs[0])
+            if name.endswith(".html")
+        )
+        with open(os.path.join(shard_dirs[0], page), "a") as file:
+            file.write("tampered")
+        with self.assertRaisesRegex(Exception, "doesn't match the shard manifest"):
+            merge_shards(shard_dirs, os.path.join(self.root, "public"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from site_paths import resolve_url
+
+
+class TestResolveUrl(unittest.TestCase):
+    def test_absolute(self):
+        self.assertEqual(resolve_url("/images/a.png", "blog"), "images/a.png")
+
+    def test_relative(self):
+        self.assertEqual(resolve_url("../images/a.png?v=2", "blog"), "images/a.png")
+        self.assertEqual(resolve_url("a.png#top", "blog"), "blog/a.png")
+
+    def test_site_root(self):
+        self.assertEqual(resolve_url("/", "blog"), "")
+        self.assertEqual(resolve_url("..", "blog"), "")
+
+    def test_escaped(self):
+        self.assertEqual(resolve_url("/images/my%20cat.png", ""), "images/my cat.png")
+
+    def test_outside_site(self):
+        self.assertIsNone(resolve_url("https://example.com/a.png", ""))
+        self.assertIsNone(resolve_url("//example.com/a.png", ""))
+        self.assertIsNone(resolve_url("mailto:me@example.com", ""))
+        self.assertIsNone(resolve_url("#top", "blog"))
+        self.assertIsNone(resolve_url("../../a.png", "blog"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import gzip
+import http.client
+import os
+import tempfile
+import threading
+import unittest
+
+from fixtures import write_file
+from load_test import load_test
+from static_server import (
+    StaticServer,
+    build_server_manifest,
+    parse_range,
+    accepted_encodings,
+)
+
+
+class TestStaticServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.public = os.path.join(root, "public")
+        self.manifest_path = os.path.join(root, ".build", "server.json")
+        os.makedirs(os.path.join(self.public, "blog"))
+        self.page = b"<h1>Home</h1>" * 100
+        write_file(self.path("index.html"), self.page)
+        write_file(self.path("index.html.gz"), gzip.compress(self.page, mtime=0))
+        write_file(self.path("blog/index.html"), b"<h1>Blog</h1>")
+        write_file(self.path("index.css"), b"body {}")
+        write_file(self.path("a.png"), b"\x89PNG")
+
+        manifest = build_server_manifest(self.public, self.manifest_path)
+        self.server = StaticServer(("localhost", 0), self.public, manifest)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+        self.connection = http.client.HTTPConnection("localhost", self.server.server_port)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp.cleanup()
+
+    def path(self, rel_path):
+        return os.path.join(self.public, rel_path)
+
+    def request(self, path, headers=None, method="GET"):
+        self.connection.request(method, path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_manifest(self):
+        manifest = build_server_manifest(self.public, self.manifest_path)
+        self.assertEqual(
+            sorted(manifest["files"]),
+            ["/a.png", "/blog/index.html", "/index.css", "/index.html"],
+        )
+        entry = manifest["files"]["/index.html"]
+        self.assertEqual(entry["type"], "text/html; charset=utf-8")
+        self.assertEqual(list(entry["encodings"]), ["gzip"])
+        self.assertEqual(manifest["files"]["/a.png"]["type"], "image/png")
+
+    def test_serves_files_over_one_connection(self):
+        response, body = self.request("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.page)
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(response.getheader("Connection"), "keep-alive")
+        response, body = self.request("/index.css")
+        self.assertEqual(body, b"body {}")
+        self.assertEqual(response.getheader("Content-Type"), "text/css; charset=utf-8")
+        self.assertIsNone(response.getheader("Vary"))
+        response, body = self.request("/blog/")
+        self.assertEqual(body, b"<h1>Blog</h1>")
+
+    def test_gzip_sibling(self):
+        response, body = self.request("/", {"Accept-Encoding": "br;q=0, gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), self.page)
+        plain = self.request("/")[0]
+        self.assertNotEqual(response.getheader("ETag"), plain.getheader("ETag"))
+        response, body = self.request("/", {"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+
+    def test_not_modified(self):
+        etag = self.request("/index.css")[0].getheader("ETag")
+        response, body = self.request("/index.css", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("ETag"), etag)
+
+    def test_range(self):
+        response, body = self.request("/index.html", {"Range": "bytes=4-7"})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, b"Home")
+        self.assertEqual(
+            response.getheader("Content-Range"), f"bytes 4-7/{len(self.page)}"
+        )
+        response, body = self.request("/index.html", {"Range": "bytes=-5"})
+        self.assertEqual(body, b"</h1>")
+        response, body = self.request("/index.html", {"Range": "bytes=5000-"})
+        self.assertEqual(response.status, 416)
+        # A stale If-Range gets the whole file
+        response, body = self.request(
+            "/index.html", {"Range": "bytes=4-7", "If-Range": '"old"'}
+        )
+        self.assertEqual((response.status, body), (200, self.page))
+
+    def test_head_redirect_and_missing(self):
+        response, body = self.request("/index.html", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Length"), str(len(self.page)))
+        self.assertEqual(body, b"")
+        response, body = self.request("/blog")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/blog/")
+        self.assertEqual(self.request("/missing")[0].status, 404)
+        self.assertEqual(self.request("/../server.json")[0].status, 404)
+
+    def test_inverted_range(self):
+        response, body = self.request("/index.css", {"Range": "bytes=5-2"})
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.getheader("Content-Range"), "bytes */7")
+
+    def test_changed_since_manifest(self):
+        write_file(self.path("index.css"), b"body { color: red }")
+        self.assertEqual(self.request("/index.css")[0].status, 503)
+
+    def test_load_test(self):
+        summary = load_test(
+            "localhost", self.server.server_port, ["/", "/index.css"], 4, 0.2
+        )
+        self.assertGreater(summary["requests"], 0)
+        self.assertEqual(summary["errors"], 0)
+
+
+class TestManifestReuse(unittest.TestCase):
+    def test_unchanged_files_are_not_hashed(self):
+        with tempfile.TemporaryDirectory() as root:
+            public = os.path.join(root, "public")
+            manifest_path = os.path.join(root, "server.json")
+            os.makedirs(public)
+            with open(os.path.join(public, "index.html"), "w") as file:
+                file.write("<p>a</p>")
+            first = build_server_manifest(public, manifest_path)
+            with open(os.path.join(public, "index.html"), "w") as file:
+                file.write("<p>b</p>")
+            os.utime(
+                os.path.join(public, "index.html"),
+                ns=(0, first["files"]["/index.html"]["file"]["mtime"]),
+            )
+            # Same size and mtime, the old hash stands
+            second = build_server_manifest(public, manifest_path)
+            self.assertEqual(first, second)
+
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-200", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-", 100), (50, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 99))
+        self.assertEqual(parse_range("bytes=100-", 100), "unsatisfiable")
+        self.assertEqual(parse_range("bytes=-0", 100), "unsatisfiable")
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertEqual(parse_range("bytes=9-1", 100), "unsatisfiable")
+        self.assertEqual(parse_range("bytes=--5", 100), "unsatisfiable")
+        self.assertIsNone(parse_range("items=0-1", 100))
+        self.assertIsNone(parse_range("bytes=a-b", 100))
+
+    def test_empty_file(self):
+        self.assertEqual(parse_range("bytes=-5", 0), "unsatisfiable")
+        self.assertEqual(parse_range("bytes=0-", 0), "unsatisfiable")
+
+
+class TestAcceptedEncodings(unittest.TestCase):
+    def test_quality(self):
+        self.assertEqual(
+            accepted_encodings("gzip, deflate;q=0.5, br;q=0"), {"gzip", "deflate"}
+        )
+        self.assertEqual(accepted_encodings(""), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
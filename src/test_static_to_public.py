@@ -1,6 +1,16 @@
+import contextlib
+import io
+import os
+import tempfile
 import unittest
 
-from static_to_public import clear_public_folder, copy_static_to_public
+from fixtures import write_file
+from static_to_public import (
+    clear_public_folder,
+    copy_static_to_public,
+    sync_static_to_public,
+    copy_file,
+)
 
 
 class TestClearPublicFolder(unittest.TestCase):
@@ -14,3 +24,75 @@ class TestCopyStaticToPublic(unittest.TestCase):
         clear_public_folder()
         copy_static_to_public()
         self.assertTrue(True)
+
+
+class TestSyncStaticToPublic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        self.manifest = os.path.join(root, ".build", "static.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "images", "a.png"), "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sync_static_to_public(
+                self.static, self.public, self.manifest, **kwargs
+            )
+
+    def test_first_sync_copies_everything(self):
+        self.assertEqual(self.sync(), [os.path.join("images", "a.png"), "index.css"])
+        with open(os.path.join(self.public, "index.css")) as file:
+            self.assertEqual(file.read(), "body {}")
+
+    def test_unchanged_copies_nothing(self):
+        self.sync()
+        self.assertEqual(self.sync(), [])
+        self.assertEqual(self.sync(use_hash=True), [])
+
+    def test_changed_file(self):
+        self.sync()
+        write_file(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+        self.assertEqual(self.sync(), ["index.css"])
+
+    def test_removes_orphans_only(self):
+        self.sync()
+        write_file(os.path.join(self.public, "index.html"), "generated")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        self.sync()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_hardlink(self):
+        self.sync(hardlink=True)
+        src = os.stat(os.path.join(self.static, "index.css"))
+        dest = os.stat(os.path.join(self.public, "index.css"))
+        self.assertEqual(src.st_ino, dest.st_ino)
+        self.assertEqual(self.sync(hardlink=True), [])
+
+    def test_copy_onto_hardlink_keeps_source(self):
+        src = os.path.join(self.static, "index.css")
+        dest = os.path.join(self.public, "index.css")
+        os.makedirs(self.public)
+        os.link(src, dest)
+        copy_file(src, dest)
+        with open(src) as file:
+            self.assertEqual(file.read(), "body {}")
+
+    def test_copy_replaces_dest(self):
+        src = os.path.join(self.static, "index.css")
+        dest = os.path.join(self.public, "index.css")
+        self.sync()
+        before = os.stat(dest).st_ino
+        write_file(src, "body { margin: 0 }")
+        copy_file(src, dest)
+        with open(dest) as file:
+            self.assertEqual(file.read(), "body { margin: 0 }")
+        self.assertNotEqual(os.stat(dest).st_ino, before)
+        self.assertEqual(sorted(os.listdir(self.public)), ["images", "index.css"])
@@ -1,7 +1,27 @@
+import contextlib
+import gc
+import io
+import multiprocessing
+import os
+import tempfile
+import tracemalloc
 import unittest
+from unittest import mock
 
+from fixtures import write_file
 from template import extract_title
 from template import convert_markdown_to_html
+from template import generate_pages_incrementally
+from template import find_pages, generate_pages_in_parallel
+from template import compile_template, parse_template, render_template
+from template import write_template, render_page
+from template import generate_page, generate_page_streaming, extract_title_from_lines
+import template
+import image_size
+from template import generate_pages_recursively
+from filesystem import MemoryFileSystem
+from htmlnode import LeafNode, ParentNode
+from static_to_public import static_to_public
 
 
 class TestExtractTitle(unittest.TestCase):
@@ -25,6 +45,17 @@ class TestConvertMarkdownToHTML(unittest.TestCase):
         html = convert_markdown_to_html("Test")
         self.assertEqual(html, "<div><p>Test</p></div>")
 
+    def test_block_cache(self):
+        markdown = "Notice\n\n# Title\n\nNotice"
+        template.set_block_cache_size(0)
+        uncached = convert_markdown_to_html(markdown)
+        template.set_block_cache_size(16)
+        try:
+            self.assertEqual(convert_markdown_to_html(markdown), uncached)
+            self.assertEqual(template.block_cache.hits, 1)
+        finally:
+            template.set_block_cache_size(template.BLOCK_CACHE_SIZE)
+
     def test_everything(self):
         html = convert_markdown_to_html(
             "Paragraph\n\n* Unorder\n- Unorder\n\n1. Order\n2. Order\n\n```Code```\n\n> Quote\n>Quote\n\n**Bold**\n\n# Header"
@@ -33,3 +64,364 @@ class TestConvertMarkdownToHTML(unittest.TestCase):
             html,
             "<div><p>Paragraph</p><ul><li>Unorder</li><li>Unorder</li></ul><ol><li>Order</li><li>Order</li></ol><pre><code>Code</code></pre><blockquote>Quote\nQuote</blockquote><p><b>Bold</b></p><h1>Header</h1></div>",
         )
+
+
+class TestGeneratePagesIncrementally(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, ".build", "pages.json")
+        os.makedirs(os.path.join(self.content, "sub"))
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        write_file(os.path.join(self.content, "index.md"), "# Index")
+        write_file(os.path.join(self.content, "sub", "page.md"), "# Page")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            changed = generate_pages_incrementally(
+                self.content, self.template, self.public, self.manifest
+            )
+        return [os.path.relpath(dest, self.public) for _, dest in changed]
+
+    def test_first_build_renders_everything(self):
+        self.assertEqual(self.build(), ["index.html", os.path.join("sub", "page.html")])
+
+    def test_unchanged_renders_nothing(self):
+        self.build()
+        self.assertEqual(self.build(), [])
+
+    def test_changed_page(self):
+        self.build()
+        write_file(os.path.join(self.content, "index.md"), "# Index 2")
+        self.assertEqual(self.build(), ["index.html"])
+        with open(os.path.join(self.public, "index.html")) as file:
+            self.assertEqual(file.read(), "<title>Index 2</title><div><h1>Index 2</h1></div>")
+
+    def test_changed_template(self):
+        self.build()
+        write_file(self.template, "{{ Title }}")
+        self.assertEqual(len(self.build()), 2)
+
+    def test_changed_image_sizes(self):
+        self.build()
+        image_size.set_image_sizes({"a.png": [1, 2]}, self.public)
+        try:
+            self.assertEqual(len(self.build()), 2)
+            self.assertEqual(self.build(), [])
+            image_size.set_image_sizes({"a.png": [3, 4]}, self.public)
+            self.assertEqual(len(self.build()), 2)
+        finally:
+            image_size.set_image_sizes(None)
+
+    def test_removed_page(self):
+        self.build()
+        os.remove(os.path.join(self.content, "sub", "page.md"))
+        self.assertEqual(self.build(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "sub", "page.html")))
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_spawned_workers_get_cache_size(self):
+        template.set_block_cache_size(0)
+        try:
+            context = multiprocessing.get_context("spawn")
+            with template.worker_pool(1, context) as pool:
+                self.assertEqual(pool.submit(template.block_cache_size).result(), 0)
+        finally:
+            template.set_block_cache_size(template.BLOCK_CACHE_SIZE)
+
+    def test_spawned_workers_size_images(self):
+        image_size.set_image_sizes({"a.png": [4, 3]}, "/site/public")
+        try:
+            context = multiprocessing.get_context("spawn")
+            with template.worker_pool(1, context) as pool:
+                html = pool.submit(
+                    template.render_page,
+                    "# T\n\n![A](/a.png)",
+                    self.template_path(),
+                    "/site/public/index.html",
+                ).result()
+        finally:
+            image_size.set_image_sizes(None)
+        self.assertIn('width="4" height="3"', html)
+
+    def template_path(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "template.html")
+        with open(path, "w") as file:
+            file.write("{{ Content }}")
+        return path
+
+
+class TestGeneratePagesInParallel(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(self.content)
+        with open(self.template, "w") as file:
+            file.write("{{ Title }}|{{ Content }}")
+        for i in range(6):
+            with open(os.path.join(self.content, f"page{i}.md"), "w") as file:
+                file.write(f"# Page {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_serial(self):
+        pages = find_pages(self.content, self.public)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_in_parallel(pages, self.template, 2, batch_size=2)
+        for i in range(6):
+            with open(os.path.join(self.public, f"page{i}.html")) as file:
+                self.assertEqual(file.read(), f"Page {i}|<div><h1>Page {i}</h1></div>")
+
+    def test_collects_link_targets(self):
+        with open(os.path.join(self.content, "page1.md"), "w") as file:
+            file.write("# Page 1\n\nSee [two](/page2)\nand ![img](/a.png)")
+        pages = find_pages(self.content, self.public)
+        template.set_link_collection(True)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_in_parallel(pages, self.template, 2, batch_size=2)
+            targets = template.link_targets
+        finally:
+            template.set_link_collection(False)
+        self.assertEqual(len(targets), 6)
+        self.assertEqual(
+            targets[os.path.join(self.content, "page1.md")],
+            [(3, "a", "/page2"), (4, "img", "/a.png")],
+        )
+
+    def test_failure_report(self):
+        with open(os.path.join(self.content, "page3.md"), "w") as file:
+            file.write("No title")
+        pages = find_pages(self.content, self.public)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(Exception) as context:
+                generate_pages_in_parallel(pages, self.template, 2)
+        self.assertIn("1 page(s) failed", str(context.exception))
+        self.assertIn("page3.md", str(context.exception))
+
+
+class TestTemplatePlan(unittest.TestCase):
+    def test_parse(self):
+        plan = parse_template("<title>{{ Title }}</title>{{ Content }}")
+        self.assertEqual(plan, ("<title>", "Title", "</title>", "Content", ""))
+
+    def test_render(self):
+        plan = parse_template("{{ Title }}: {{ Content }} ({{ Title }})")
+        self.assertEqual(
+            render_template(plan, {"Title": "T", "Content": "C"}), "T: C (T)"
+        )
+
+    def test_write_streams_nodes(self):
+        plan = parse_template("<title>{{ Title }}</title>{{ Content }}")
+        file = io.StringIO()
+        node = ParentNode("div", [LeafNode("p", "Test")])
+        write_template(plan, {"Title": "T", "Content": node}, file)
+        self.assertEqual(file.getvalue(), "<title>T</title><div><p>Test</p></div>")
+
+    def test_render_no_slots(self):
+        plan = parse_template("Plain")
+        self.assertEqual(render_template(plan, {}), "Plain")
+
+    def test_compile_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as file:
+                file.write("{{ Title }}")
+            plan = compile_template(path)
+            self.assertIs(compile_template(path), plan)
+            with open(path, "w") as file:
+                file.write("{{ Content }}!")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(compile_template(path), ("", "Content", "!"))
+
+    def test_plans_dropped_with_filesystem(self):
+        fs = MemoryFileSystem({"/site/template.html": "{{ Title }}"})
+        compile_template("/site/template.html", fs)
+        self.assertIn(fs, template.template_plans)
+        count = len(template.template_plans)
+        del fs
+        gc.collect()
+        self.assertEqual(len(template.template_plans), count - 1)
+
+
+class TestRenderPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_path = os.path.join(self.tmp.name, "template.html")
+        with open(self.template_path, "w") as file:
+            file.write("{{ Title }}|{{ Content }}")
+        self.public = os.path.join(self.tmp.name, "public")
+        image_size.set_image_sizes({"blog/a.png": [4, 3]}, self.public)
+        template.set_block_cache_size(16)
+
+    def tearDown(self):
+        image_size.set_image_sizes(None)
+        template.set_block_cache_size(template.BLOCK_CACHE_SIZE)
+        self.tmp.cleanup()
+
+    def test_images_sized_for_dest_path(self):
+        markdown = "# T\n\n![A](a.png)"
+        html = render_page(markdown, self.template_path, self.public + "/blog/x.html")
+        self.assertIn('width="4" height="3"', html)
+        # The same block on a page in another folder resolves to another image
+        html = render_page(markdown, self.template_path, self.public + "/index.html")
+        self.assertNotIn("width=", html)
+        self.assertIn('loading="lazy"', html)
+        html = render_page(markdown, self.template_path)
+        self.assertEqual(html, 'T|<div><h1>T</h1><p><img src="a.png" alt="A"></img></p></div>')
+
+
+class TestGeneratePageStreaming(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.source = os.path.join(root, "page.md")
+        self.template = os.path.join(root, "template.html")
+        with open(self.template, "w") as file:
+            file.write("<title>{{ Title }}</title><main>{{ Content }}</main>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def generate(self, function, markdown):
+        with open(self.source, "w") as file:
+            file.write(markdown)
+        dest = os.path.join(self.tmp.name, "out", f"{function.__name__}.html")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            function(self.source, self.template, dest)
+        with open(dest) as file:
+            return file.read()
+
+    def test_matches_generate_page(self):
+        markdown = "# Title\n\n> Quote\n\n```\ncode\n```\n\n* A\n* B\n\nEnd *here*\n"
+        self.assertEqual(
+            self.generate(generate_page_streaming, markdown),
+            self.generate(generate_page, markdown),
+        )
+
+    def test_failure_leaves_no_output(self):
+        with self.assertRaises(ValueError):
+            self.generate(generate_page_streaming, "# Title\n\nBroken *italic")
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, "out")), [])
+
+    def test_failed_write_keeps_previous_page(self):
+        dest = os.path.join(self.tmp.name, "page.html")
+        with open(dest, "w") as file:
+            file.write("previous")
+
+        def fail_halfway(plan, slots, file):
+            file.write("<title>")
+            raise ValueError("broken")
+
+        with open(self.source, "w") as file:
+            file.write("# Title")
+        with mock.patch("template.write_template", fail_halfway):
+            with self.assertRaises(ValueError):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_page(self.source, self.template, dest)
+        with open(dest) as file:
+            self.assertEqual(file.read(), "previous")
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)), ["page.html", "page.md", "template.html"]
+        )
+
+    def test_memory_follows_largest_block(self):
+        paragraph = "Some **bold** text and a [link](/somewhere). " * 20
+        with open(self.source, "w") as file:
+            file.write("# Title\n\n")
+            for _ in range(600):
+                file.write(paragraph + "\n\n")
+        dest = os.path.join(self.tmp.name, "large.html")
+        tracemalloc.start()
+        try:
+            generate_page_streaming(self.source, self.template, dest)
+            size, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(os.path.getsize(self.source), 500_000)
+        self.assertLess(peak, 200_000)
+
+
+class TestMemoryBuild(unittest.TestCase):
+    def setUp(self):
+        # Paths under a folder that doesn't exist, so a disk access would fail
+        self.root = os.path.join(tempfile.gettempdir(), "memory-build-missing")
+        self.fs = MemoryFileSystem(
+            {
+                os.path.join(self.root, "content", "index.md"): "# Home\n\nHi *there*",
+                os.path.join(self.root, "content", "blog", "post.md"): "# Post",
+                os.path.join(self.root, "static", "index.css"): "body {}",
+                os.path.join(self.root, "template.html"): "{{ Title }}|{{ Content }}",
+            }
+        )
+
+    def build(self, jobs=1):
+        public = os.path.join(self.root, "public")
+        static_to_public(root=self.root, fs=self.fs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursively(
+                os.path.join(self.root, "content"),
+                os.path.join(self.root, "template.html"),
+                public,
+                jobs,
+                fs=self.fs,
+            )
+        return public
+
+    def test_site(self):
+        public = self.build()
+        self.assertFalse(os.path.exists(self.root))
+        self.assertEqual(
+            self.fs.read(os.path.join(public, "index.html")),
+            b"Home|<div><h1>Home</h1><p>Hi <i>there</i></p></div>",
+        )
+        self.assertEqual(
+            self.fs.read(os.path.join(public, "blog", "post.html")),
+            b"Post|<div><h1>Post</h1></div>",
+        )
+        self.assertEqual(self.fs.read(os.path.join(public, "index.css")), b"body {}")
+
+    def test_jobs_stay_in_process(self):
+        public = self.build(jobs=4)
+        self.assertTrue(self.fs.isfile(os.path.join(public, "blog", "post.html")))
+
+    def test_streaming(self):
+        dest = os.path.join(self.root, "out.html")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page_streaming(
+                os.path.join(self.root, "content", "index.md"),
+                os.path.join(self.root, "template.html"),
+                dest,
+                fs=self.fs,
+            )
+        self.assertEqual(
+            self.fs.read(dest), b"Home|<div><h1>Home</h1><p>Hi <i>there</i></p></div>"
+        )
+        self.assertFalse(self.fs.exists(dest + ".tmp"))
+
+
+class TestExtractTitleFromLines(unittest.TestCase):
+    def test_matches_extract_title(self):
+        self.assertEqual(extract_title_from_lines(["## Sub\n", "# Title\n"]), "Title")
+
+    def test_no_title(self):
+        with self.assertRaises(Exception):
+            extract_title_from_lines(["# \n", "Text\n"])
+
+    def test_two_titles(self):
+        with self.assertRaises(Exception):
+            extract_title_from_lines(["# One\n", "# Two\n"])
@@ -9,6 +9,7 @@ from textnode import (
     split_nodes_images,
     split_nodes_links,
     text_to_textnodes,
+    scan_text_nodes,
 )
 from htmlnode import LeafNode
 
@@ -29,6 +30,20 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.ITALIC)
         self.assertNotEqual(node, node2)
 
+    def test_uneq_url(self):
+        node = TextNode("Link", TextType.LINK, "/a")
+        node2 = TextNode("Link", TextType.LINK, "/b")
+        self.assertNotEqual(node, node2)
+
+    def test_slots(self):
+        node = TextNode("Link", TextType.LINK, "/a")
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_unhashable(self):
+        # Fields are mutable, like HTMLNode's
+        with self.assertRaises(TypeError):
+            hash(TextNode("Link", TextType.LINK, "/a"))
+
     def test_empty_url_none(self):
         node = TextNode("This is a text node", TextType.BOLD)
         self.assertEqual(node.url, None)
@@ -213,6 +228,17 @@ class TestExtractMarkdownLinks(unittest.TestCase):
 
 
 class TestSplitNodesImages(unittest.TestCase):
+    def test_repeated_image(self):
+        node = TextNode("![a](b) x ![a](b)", TextType.TEXT)
+        self.assertEqual(
+            split_nodes_images([node]),
+            [
+                TextNode("a", TextType.IMAGE, "b"),
+                TextNode(" x ", TextType.TEXT),
+                TextNode("a", TextType.IMAGE, "b"),
+            ],
+        )
+
     def test_no_image(self):
         node = TextNode(
             "This is a False Test Image https://www.test.com/image between words.",
@@ -445,5 +471,42 @@ class TestTextToTextNode(unittest.TestCase):
         )
 
 
+class TestScanTextNodes(unittest.TestCase):
+    def old_extract_text_nodes(self, text):
+        nodes = split_nodes_images([TextNode(text, TextType.TEXT)])
+        nodes = split_nodes_links(nodes)
+        nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+        nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+        nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
+        return nodes
+
+    def test_matches_split_passes(self):
+        texts = [
+            "",
+            "Plain text",
+            "Test ![Test](Image) [Test](Link) `Code` **Bold** *Italic*",
+            "**bold *italic* bold** and `code **not bold**`",
+            "[![image](src)](link) [a](b)[c](d)",
+            "[x ![a](b) y](c) *i* **b**",
+            "****empty `` **bold**",
+        ]
+        for text in texts:
+            self.assertEqual(scan_text_nodes(text), self.old_extract_text_nodes(text))
+
+    def test_link_heavy(self):
+        text = " ".join(f"[link {i}](/page/{i})" for i in range(1000))
+        nodes = scan_text_nodes(text)
+        self.assertEqual(len(nodes), 1999)
+        self.assertEqual(nodes[-1], TextNode("link 999", TextType.LINK, "/page/999"))
+
+    def test_unclosed_delimiters(self):
+        for text in ["`code", "**bold", "*italic", "*italic **bold** italic*"]:
+            self.assertRaises(ValueError, lambda: scan_text_nodes(text))
+
+    def test_non_text_is_unchanged(self):
+        node = TextNode("*Code*", TextType.CODE)
+        self.assertEqual(node.extract_text_nodes(), [node])
+
+
 if __name__ == "__main__":
     unittest.main()
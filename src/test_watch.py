@@ -0,0 +1,133 @@
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from watch import PollingWatcher, InotifyWatcher, rebuild_changed
+
+
+class WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(self.content)
+        os.makedirs(self.static)
+        os.makedirs(self.public)
+        write_file(self.template, "{{ Content }}")
+        write_file(os.path.join(self.content, "index.md"), "# Index")
+        write_file(os.path.join(self.content, "other.md"), "# Other")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def rebuild(self, changed, hardlink=False, precompress_manifest=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            rebuild_changed(
+                set(changed),
+                self.content,
+                self.static,
+                self.template,
+                self.public,
+                hardlink,
+                precompress_manifest,
+            )
+
+
+class TestRebuildChanged(WatchTestCase):
+    def test_only_touched_page(self):
+        self.rebuild([os.path.join(self.content, "index.md")])
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "other.html")))
+
+    def test_template_rebuilds_all(self):
+        self.rebuild([self.template])
+        self.assertEqual(
+            self.read(os.path.join(self.public, "other.html")),
+            "<div><h1>Other</h1></div>",
+        )
+
+    def test_deleted_page(self):
+        self.rebuild([os.path.join(self.content, "index.md")])
+        os.remove(os.path.join(self.content, "index.md"))
+        self.rebuild([os.path.join(self.content, "index.md")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_static_file(self):
+        path = os.path.join(self.static, "index.css")
+        write_file(path, "body {}")
+        self.rebuild([path])
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+        os.remove(path)
+        self.rebuild([path])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+
+    def test_hardlinked_static_file_edited_in_place(self):
+        path = os.path.join(self.static, "index.css")
+        dest = os.path.join(self.public, "index.css")
+        write_file(path, "body {}")
+        os.link(path, dest)
+        with open(path, "a") as file:
+            file.write("\np {}")
+        for hardlink in (False, True):
+            self.rebuild([path], hardlink)
+            self.assertEqual(self.read(path), "body {}\np {}")
+            self.assertEqual(self.read(dest), "body {}\np {}")
+        self.assertTrue(os.path.samefile(path, dest))
+
+    def test_recompresses_rebuilt_page(self):
+        path = os.path.join(self.content, "index.md")
+        manifest = os.path.join(self.tmp.name, "precompress.json")
+        for text in ("first", "second"):
+            write_file(path, f"# Index\n\n{text} " * 100)
+            self.rebuild([path], precompress_manifest=manifest)
+            with gzip.open(os.path.join(self.public, "index.html.gz"), "rt") as file:
+                self.assertIn(text, file.read())
+
+
+class TestPollingWatcher(WatchTestCase):
+    def test_reports_changes(self):
+        watcher = PollingWatcher([self.content, self.template])
+        path = os.path.join(self.content, "index.md")
+        write_file(path, "# Index changed")
+        self.assertEqual(watcher.wait(0), {path})
+        self.assertEqual(watcher.wait(0), set())
+
+    def test_reports_deletes(self):
+        watcher = PollingWatcher([self.content])
+        path = os.path.join(self.content, "other.md")
+        os.remove(path)
+        self.assertEqual(watcher.wait(0), {path})
+
+
+class TestInotifyWatcher(WatchTestCase):
+    def setUp(self):
+        super().setUp()
+        try:
+            self.watcher = InotifyWatcher([self.content, self.template])
+        except (AttributeError, OSError):
+            self.skipTest("inotify is not available")
+
+    def tearDown(self):
+        self.watcher.close()
+        super().tearDown()
+
+    def test_reports_changes(self):
+        path = os.path.join(self.content, "index.md")
+        write_file(path, "# Index changed")
+        self.assertEqual(self.watcher.wait(1), {path})
+
+    def test_file_root_ignores_siblings(self):
+        write_file(os.path.join(self.tmp.name, "notes.txt"), "ignored")
+        write_file(self.template, "{{ Title }}")
+        self.assertEqual(self.watcher.wait(1), {self.template})
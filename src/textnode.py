@@ -16,18 +16,29 @@ class TextType(Enum):
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
         self.url = url
 
     def __eq__(self, value):
-        return str(self) == str(value)
+        if self is value:
+            return True
+        if type(self) is not type(value):
+            return NotImplemented
+        return (
+            self.text_type is value.text_type
+            and self.url == value.url
+            and self.text == value.text
+        )
 
     def __repr__(self):
         return f'TextNode("{self.text}", {self.text_type.value}, "{self.url}")'
 
-    def to_html_node(self):
+    def to_html_node(self, images=None):
+        """images is the page's PageImages when <img> tags get sizes"""
         match self.text_type:
             case TextType.TEXT:
                 return LeafNode(None, self.text)
@@ -38,23 +49,103 @@ class TextNode:
             case TextType.IMAGE:
                 if self.url is None:
                     raise ValueError("Invalid IMAGE: no src url")
-                return LeafNode(
-                    str(self.text_type), "", {"src": self.url, "alt": self.text}
-                )
+                props = {"src": self.url, "alt": self.text}
+                if images is not None:
+                    props.update(images.attributes(self.url))
+                return LeafNode(str(self.text_type), "", props)
         return LeafNode(str(self.text_type), self.text)
 
-    def to_html_nodes(self):
+    def to_html_nodes(self, images=None):
         nodes = self.extract_text_nodes()
-        return [node.to_html_node() for node in nodes]
+        return [node.to_html_node(images) for node in nodes]
 
     def extract_text_nodes(self):
         """Seperates TextNode's text into a list of categorized TextNodes according to Markdown."""
-        nodes = split_nodes_images([self])
-        nodes = split_nodes_links(nodes)
-        nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-        nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-        nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-        return nodes
+        if self.text_type != TextType.TEXT:
+            return [self]
+        return scan_text_nodes(self.text)
+
+
+DELIMITER_REGEX = re.compile(r"`|\*\*?")
+DELIMITER_TEXT_TYPES = {"`": TextType.CODE, "**": TextType.BOLD, "*": TextType.ITALIC}
+
+
+def scan_text_nodes(text):
+    """Splits text into image, link, code, bold, italic and text nodes in one pass."""
+    nodes = []
+    position = 0
+    for image_start, image_end, alt, url in iter_bracket_spans(text, "!["):
+        scan_links(text, position, image_start, nodes)
+        nodes.append(TextNode(alt, TextType.IMAGE, url))
+        position = image_end
+    scan_links(text, position, len(text), nodes)
+    return nodes
+
+
+def scan_links(text, start, end, nodes):
+    position = start
+    for link_start, link_end, link_text, url in iter_bracket_spans(
+        text, "[", start, end
+    ):
+        scan_delimiters(text, position, link_start, nodes)
+        nodes.append(TextNode(link_text, TextType.LINK, url))
+        position = link_end
+    scan_delimiters(text, position, end, nodes)
+    return None
+
+
+def iter_bracket_spans(text, opener, start=0, end=None):
+    """Yields (start, end, text, url) for each "[text](url)" span in linear time."""
+    if end is None:
+        end = len(text)
+    position = start
+    line_end = -1
+    while True:
+        open_at = text.find(opener, position, end)
+        if open_at == -1:
+            return
+        if open_at > line_end:
+            line_end = text.find("\n", open_at, end)
+            if line_end == -1:
+                line_end = end
+        text_start = open_at + len(opener)
+        middle = text.find("](", text_start, line_end)
+        if middle != -1:
+            close = text.find(")", middle + 2, line_end)
+            if close != -1:
+                span_text = text[text_start:middle]
+                yield (open_at, close + 1, span_text, text[middle + 2 : close])
+                position = close + 1
+                continue
+        position = line_end + 1
+
+
+def scan_delimiters(text, start, end, nodes):
+    position = start
+    while True:
+        match = DELIMITER_REGEX.search(text, position, end)
+        if match is None:
+            break
+        if match.start() > position:
+            nodes.append(TextNode(text[position : match.start()], TextType.TEXT))
+        delimiter = match.group(0)
+        close = text.find(delimiter, match.end(), end)
+        # A single "*" can't close on the first half of a "**"
+        if close == -1 or (
+            delimiter == "*" and close + 1 < end and text[close + 1] == "*"
+        ):
+            raise ValueError(
+                f'Invalid Markdown: Odd count of "{delimiter}" in "{text[start:end]}"'
+            )
+        if close > match.end():
+            nodes.append(
+                TextNode(text[match.end() : close], DELIMITER_TEXT_TYPES[delimiter])
+            )
+        position = close + len(delimiter)
+
+    if position < end:
+        nodes.append(TextNode(text[position:end], TextType.TEXT))
+    return None
 
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -80,63 +171,41 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
 
 def split_nodes_images(old_nodes):
-    new_nodes = []
-    for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
-            new_nodes.append(old_node)
-            continue
+    return split_nodes_bracket_spans(old_nodes, "![", TextType.IMAGE)
 
-        image_tuples = extract_markdown_images(old_node.text)
-        old_text = old_node.text
-        for image in image_tuples:
-            split_on_image = old_text.split(f"![{image[0]}]({image[1]})")
-            if split_on_image == []:
-                continue
-            old_text = split_on_image[1]
-            if split_on_image[0] != "":
-                new_nodes.append(TextNode(split_on_image[0], TextType.TEXT))
-            new_nodes.append(TextNode(image[0], TextType.IMAGE, image[1]))
 
-        if old_text == "":
-            continue
-        new_nodes.append(TextNode(old_text, TextType.TEXT))
-
-    return new_nodes
+def split_nodes_links(old_nodes):
+    return split_nodes_bracket_spans(old_nodes, "[", TextType.LINK)
 
 
-def split_nodes_links(old_nodes):
+def split_nodes_bracket_spans(old_nodes, opener, text_type):
     new_nodes = []
     for old_node in old_nodes:
         if old_node.text_type != TextType.TEXT:
             new_nodes.append(old_node)
             continue
 
-        link_tuples = extract_markdown_links(old_node.text)
         old_text = old_node.text
-        for link in link_tuples:
-            split_on_link = old_text.split(f"[{link[0]}]({link[1]})")
-            if split_on_link == []:
-                continue
-            old_text = split_on_link[1]
-            if split_on_link[0] != "":
-                new_nodes.append(TextNode(split_on_link[0], TextType.TEXT))
-            new_nodes.append(TextNode(link[0], TextType.LINK, link[1]))
-
-        if old_text == "":
+        position = 0
+        for start, end, text, url in iter_bracket_spans(old_text, opener):
+            if start > position:
+                new_nodes.append(TextNode(old_text[position:start], TextType.TEXT))
+            new_nodes.append(TextNode(text, text_type, url))
+            position = end
+
+        if position == len(old_text):
             continue
-        new_nodes.append(TextNode(old_text, TextType.TEXT))
+        new_nodes.append(TextNode(old_text[position:], TextType.TEXT))
 
     return new_nodes
 
 
 def extract_markdown_images(text):
-    image_regex = re.compile(r"!\[(.*?)\]\((.*?)\)")
-    return image_regex.findall(text)
+    return [(alt, url) for _, _, alt, url in iter_bracket_spans(text, "![")]
 
 
 def extract_markdown_links(text):
-    image_regex = re.compile(r"\[(.*?)\]\((.*?)\)")
-    return image_regex.findall(text)
+    return [(link_text, url) for _, _, link_text, url in iter_bracket_spans(text, "[")]
 
 
 def text_to_textnodes(text):
@@ -0,0 +1,257 @@
+"""Rebuilds only what changed while content/, static/ and template.html are edited"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from precompress import precompress_public
+from static_to_public import copy_file, link_file
+from template import (
+    find_pages,
+    generate_page,
+    generate_pages,
+    is_markdown_file,
+    page_dest_path,
+)
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def watch(
+    content_dir,
+    static_dir,
+    template_path,
+    public_dir,
+    interval=0.1,
+    debounce=0.05,
+    hardlink=False,
+    precompress_manifest=None,
+):
+    """Waits for edits and rebuilds what they touched until interrupted"""
+    watcher = make_watcher([content_dir, static_dir, template_path])
+    print(f"Watching for changes with {type(watcher).__name__}, press Ctrl+C to stop")
+    try:
+        while True:
+            changed = watcher.wait(interval)
+            if len(changed) == 0:
+                continue
+            # Editors save in bursts (truncate, write, rename), wait for them to settle
+            while True:
+                more = watcher.wait(debounce)
+                if len(more) == 0:
+                    break
+                changed |= more
+
+            start = time.perf_counter()
+            try:
+                rebuild_changed(
+                    changed,
+                    content_dir,
+                    static_dir,
+                    template_path,
+                    public_dir,
+                    hardlink,
+                    precompress_manifest,
+                )
+            except Exception as error:
+                print(f"Rebuild failed: {type(error).__name__}: {error}")
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"Rebuilt {len(changed)} changed path(s) in {elapsed:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return None
+
+
+def rebuild_changed(
+    changed,
+    content_dir,
+    static_dir,
+    template_path,
+    public_dir,
+    hardlink=False,
+    precompress_manifest=None,
+):
+    """Re-renders touched pages, re-copies touched assets, or everything if the template changed."""
+    if template_path in changed:
+        generate_pages(find_pages(content_dir, public_dir), template_path)
+        changed = [path for path in changed if not is_under(path, content_dir)]
+
+    for path in sorted(changed):
+        if is_under(path, content_dir):
+            rebuild_content(path, content_dir, template_path, public_dir)
+        elif is_under(path, static_dir):
+            rebuild_static(path, static_dir, public_dir, hardlink)
+    if precompress_manifest is not None:
+        # Only files whose size or mtime changed are hashed and compressed again
+        precompress_public(public_dir, precompress_manifest)
+    return None
+
+
+def rebuild_content(path, content_dir, template_path, public_dir):
+    if os.path.isdir(path):
+        dest_dir = os.path.join(public_dir, os.path.relpath(path, content_dir))
+        generate_pages(find_pages(path, dest_dir), template_path)
+        return None
+    if not is_markdown_file(path):
+        return None
+    dest_path = page_dest_path(path, content_dir, public_dir)
+    if os.path.exists(path):
+        generate_page(path, template_path, dest_path)
+    elif os.path.exists(dest_path):
+        print(f"Removing deleted page: {dest_path}")
+        os.remove(dest_path)
+    return None
+
+
+def rebuild_static(path, static_dir, public_dir, hardlink=False):
+    dest = os.path.join(public_dir, os.path.relpath(path, static_dir))
+    if os.path.isdir(path):
+        for dir_path, dir_names, file_names in os.walk(path):
+            for file_name in file_names:
+                rebuild_static(
+                    os.path.join(dir_path, file_name), static_dir, public_dir, hardlink
+                )
+        return None
+    if os.path.exists(path):
+        print(f"Copying static file: {path}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if hardlink:
+            link_file(path, dest)
+        else:
+            copy_file(path, dest)
+    elif os.path.isfile(dest):
+        print(f"Removing deleted static file: {dest}")
+        os.remove(dest)
+    return None
+
+
+def is_under(path, directory):
+    return path == directory or path.startswith(directory + os.sep)
+
+
+def make_watcher(roots):
+    """Returns an inotify watcher on Linux, falling back to polling elsewhere"""
+    try:
+        return InotifyWatcher(roots)
+    except (AttributeError, OSError):
+        return PollingWatcher(roots)
+
+
+class PollingWatcher:
+    def __init__(self, roots):
+        self.roots = roots
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        snapshot = {}
+        for root in self.roots:
+            if os.path.isfile(root):
+                stat = os.stat(root)
+                snapshot[root] = (stat.st_mtime_ns, stat.st_size)
+                continue
+            for dir_path, dir_names, file_names in os.walk(root):
+                for file_name in file_names:
+                    path = os.path.join(dir_path, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout):
+        """Sleeps for timeout and returns the paths created, modified or deleted meanwhile"""
+        time.sleep(timeout)
+        old = self.snapshot
+        self.snapshot = self.take_snapshot()
+        changed = set(
+            path for path, stat in self.snapshot.items() if old.get(path) != stat
+        )
+        changed.update(path for path in old if path not in self.snapshot)
+        return changed
+
+    def close(self):
+        return None
+
+
+class InotifyWatcher:
+    def __init__(self, roots):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.watches = {}  # watch descriptor -> directory path
+        self.files = {}  # watch descriptor -> names reported for file roots
+        for root in roots:
+            if os.path.isdir(root):
+                self.add_tree(root)
+            else:
+                directory, name = os.path.split(root)
+                wd = self.add_watch(directory)
+                self.files.setdefault(wd, set()).add(name)
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        self.watches[wd] = directory
+        return wd
+
+    def add_tree(self, root):
+        for dir_path, dir_names, file_names in os.walk(root):
+            self.add_watch(dir_path)
+
+    def wait(self, timeout):
+        """Blocks up to timeout and returns the paths created, modified or deleted meanwhile"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if len(ready) == 0:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size : offset + INOTIFY_EVENT.size + length]
+                offset += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped, treat everything as changed
+                    changed.update(self.roots)
+                    continue
+                if wd not in self.watches:
+                    continue
+                name = os.fsdecode(name.rstrip(b"\0"))
+                if wd in self.files and name not in self.files[wd]:
+                    continue
+                path = os.path.join(self.watches[wd], name)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+        return None